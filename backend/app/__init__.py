@@ -1 +1,5 @@
 # Personal Health Dashboard Backend
+from . import startup
+
+# Time the imports that follow, starting with app.main and its dependencies
+startup.install()
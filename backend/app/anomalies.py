@@ -0,0 +1,225 @@
+"""
+Precomputed anomaly scores for daily and intraday metrics.
+
+Every day and metric in daily_summary gets a robust z-score against the
+WINDOW_DAYS days before it: 0.6745 * (value - median) / MAD, which a few
+outliers in the window barely move. Intraday heart rate is scored per minute
+against the median and MAD of that UTC day's per-minute averages, leaving
+out minutes during workouts; a run of minutes above SPIKE_THRESHOLD is stored
+as one spike at its peak.
+
+Daily scores and spikes are persisted (anomaly_scores, heart_rate_spikes),
+so reads are indexed range scans that filter on the score. Scoring is
+incremental: each daily score keeps the value it scored, and a metric is
+rescored from the first day whose value changed, appeared or disappeared.
+Heart rate days are fingerprinted in heart_rate_days by minute count, sample
+count and bpm sum, and only days whose fingerprint changed are rescored.
+Reimporting a newer export therefore only scores the new tail.
+
+Uses NumPy; import this module lazily.
+"""
+
+import warnings
+from bisect import bisect_left
+from datetime import date, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import database, engine
+
+
+# Trailing days each daily value is compared against
+WINDOW_DAYS = 28
+
+# Fewest values in the window for a day to be scored
+MIN_HISTORY = 14
+
+# Robust z-score from which a heart rate minute counts as a spike
+SPIKE_THRESHOLD = 5.0
+
+# Spike minutes this close together belong to the same spike
+SPIKE_GAP_MINUTES = 5
+
+# Fewest non-workout minutes for a day's heart rate to be scored
+MIN_DAY_MINUTES = 60
+
+# Scales the MAD to the standard deviation of a normal distribution
+MAD_SCALE = 0.6745
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def robust_scores(series: np.ndarray, window: int = WINDOW_DAYS, min_history: int = MIN_HISTORY) -> tuple:
+    """Score each day of a daily series against the `window` days before it.
+
+    Returns (median, mad, score) arrays; entries are NaN where the window
+    has fewer than `min_history` values or a MAD of zero.
+    """
+    padded = np.concatenate([np.full(window, np.nan), series])
+    windows = sliding_window_view(padded, window)[:len(series)]
+    history = np.count_nonzero(~np.isnan(windows), axis=1)
+    with warnings.catch_warnings():
+        # Windows with no values at all yield NaN, which is what we want
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(windows, axis=1)
+        mad = np.nanmedian(np.abs(windows - median[:, None]), axis=1)
+    enough = (history >= min_history) & (mad > 0)
+    median = np.where(history >= min_history, median, np.nan)
+    mad = np.where(history >= min_history, mad, np.nan)
+    score = np.where(enough, MAD_SCALE * (series - median) / np.where(enough, mad, 1.0), np.nan)
+    return median, mad, score
+
+
+def _first_change(current: list, stored: list):
+    """Earliest date at which two date-ordered (date, value) lists differ, or None."""
+    for new, old in zip(current, stored):
+        if new != old:
+            return min(new[0], old[0])
+    if len(current) == len(stored):
+        return None
+    longer = current if len(current) > len(stored) else stored
+    return longer[min(len(current), len(stored))][0]
+
+
+def _optional(value: float):
+    return None if value != value else float(value)
+
+
+def score_daily(cursor) -> int:
+    """Rescore each metric from its first changed day; return the rows written."""
+    written = 0
+    for metric, column in database.METRIC_COLUMNS.items():
+        cursor.execute(f"SELECT date, {column} FROM daily_summary WHERE {column} IS NOT NULL ORDER BY date")
+        current = [tuple(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT date, value FROM anomaly_scores WHERE metric = ? ORDER BY date", (metric,))
+        stored = [tuple(row) for row in cursor.fetchall()]
+
+        since = _first_change(current, stored)
+        if since is None:
+            continue
+        cursor.execute("DELETE FROM anomaly_scores WHERE metric = ? AND date >= ?", (metric, since))
+
+        # Only the window before the first changed day is needed as history
+        dates = [day for day, _ in current]
+        first = bisect_left(dates, (date.fromisoformat(since) - timedelta(days=WINDOW_DAYS)).isoformat())
+        tail = bisect_left(dates, since)
+        if tail == len(dates):
+            continue
+        start, end = date.fromisoformat(dates[first]), date.fromisoformat(dates[-1])
+        series = engine.daily_series(dates[first:], [value for _, value in current[first:]], start, end)
+        median, mad, score = robust_scores(series)
+
+        rows = []
+        for day, value in current[tail:]:
+            offset = date.fromisoformat(day).toordinal() - start.toordinal()
+            rows.append((metric, day, value, _optional(median[offset]), _optional(mad[offset]), _optional(score[offset])))
+        cursor.executemany("""
+            INSERT INTO anomaly_scores (metric, date, value, baseline, spread, score)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        written += len(rows)
+    return written
+
+
+def _group_medians(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Median of `values` within each run of equal, sorted `groups`, one per element."""
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    _, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    medians = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+    return np.repeat(medians, counts)
+
+
+def _workout_mask(cursor, minutes: np.ndarray) -> np.ndarray:
+    """True for minutes that fall inside a workout."""
+    cursor.execute("""
+        SELECT CAST(STRFTIME('%s', start_date) AS INTEGER) / 60, CAST(STRFTIME('%s', end_date) AS INTEGER) / 60
+        FROM workouts WHERE STRFTIME('%s', start_date) IS NOT NULL AND STRFTIME('%s', end_date) IS NOT NULL
+        ORDER BY 1
+    """)
+    intervals = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    if not len(intervals) or not len(minutes):
+        return np.zeros(len(minutes), dtype=bool)
+    # Running maximum of the end minutes covers overlapping workouts
+    ends = np.maximum.accumulate(intervals[:, 1])
+    index = np.searchsorted(intervals[:, 0], minutes, side="right") - 1
+    return (index >= 0) & (minutes <= ends[np.maximum(index, 0)])
+
+
+def score_heart_rate(cursor) -> int:
+    """Rescore the heart rate days whose minutes changed; return the days rescored."""
+    cursor.execute("""
+        SELECT minute / 1440 as day, COUNT(*), SUM(samples), SUM(sum_bpm)
+        FROM heart_rate_minutes GROUP BY day
+    """)
+    current = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+    cursor.execute("SELECT day, minutes, samples, sum_bpm FROM heart_rate_days")
+    stored = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+    changed = sorted(day for day, fingerprint in current.items() if stored.get(day) != fingerprint)
+    removed = [day for day in stored if day not in current]
+    for day in removed + changed:
+        cursor.execute("DELETE FROM heart_rate_spikes WHERE minute >= ? AND minute < ?", (day * 1440, (day + 1) * 1440))
+    cursor.executemany("DELETE FROM heart_rate_days WHERE day = ?", [(day,) for day in removed])
+    if not changed:
+        return 0
+
+    cursor.execute("""
+        SELECT minute, max_bpm, sum_bpm / samples FROM heart_rate_minutes
+        WHERE minute >= ? ORDER BY minute
+    """, (changed[0] * 1440,))
+    rows = np.array(cursor.fetchall(), dtype=float).reshape(-1, 3)
+    minutes = rows[:, 0].astype(np.int64)
+    days = minutes // 1440
+    keep = np.isin(days, changed) & ~_workout_mask(cursor, minutes)
+    minutes, days, max_bpm, bpm = minutes[keep], days[keep], rows[keep, 1], rows[keep, 2]
+
+    # Per-day baselines over the days with enough minutes
+    _, counts = np.unique(days, return_counts=True)
+    enough = np.repeat(counts >= MIN_DAY_MINUTES, counts)
+    minutes, days, max_bpm, bpm = minutes[enough], days[enough], max_bpm[enough], bpm[enough]
+    baselines = {}
+    spikes = []
+    if len(minutes):
+        median = _group_medians(days, bpm)
+        mad = _group_medians(days, np.abs(bpm - median))
+        score = np.where(mad > 0, MAD_SCALE * (bpm - median) / np.where(mad > 0, mad, 1.0), 0.0)
+        _, starts = np.unique(days, return_index=True)
+        baselines = {int(days[i]): (float(median[i]), float(mad[i])) for i in starts}
+
+        flagged = np.flatnonzero(score >= SPIKE_THRESHOLD)
+        if len(flagged):
+            # Consecutive flagged minutes of the same day form one spike
+            breaks = (np.diff(minutes[flagged]) > SPIKE_GAP_MINUTES) | (np.diff(days[flagged]) != 0)
+            runs = np.concatenate([[0], np.cumsum(breaks)])
+            peaks = np.lexsort((score[flagged], runs))
+            last = np.flatnonzero(np.append(np.diff(runs[peaks]) != 0, True))
+            first_minute = minutes[flagged][np.flatnonzero(np.insert(breaks, 0, True))]
+            last_minute = minutes[flagged][np.flatnonzero(np.append(breaks, True))]
+            for run, index in enumerate(flagged[peaks[last]]):
+                spikes.append((
+                    int(minutes[index]), date.fromordinal(_EPOCH_ORDINAL + int(days[index])).isoformat(),
+                    round(float(bpm[index]), 1), float(max_bpm[index]), round(float(median[index]), 1),
+                    round(float(mad[index]), 2), round(float(score[index]), 2),
+                    int(last_minute[run] - first_minute[run] + 1),
+                ))
+
+    cursor.executemany("""
+        INSERT INTO heart_rate_spikes (minute, date, bpm, max_bpm, baseline, spread, score, duration_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, spikes)
+    cursor.executemany("""
+        INSERT OR REPLACE INTO heart_rate_days (day, minutes, samples, sum_bpm, median, mad)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(day, *current[day], *baselines.get(day, (None, None))) for day in changed])
+    return len(changed)
+
+
+def compute_anomalies() -> dict:
+    """Bring the anomaly scores up to date with daily_summary and heart_rate_minutes."""
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        result = {"daily_scores": score_daily(cursor), "heart_rate_days": score_heart_rate(cursor)}
+        conn.commit()
+    return result
@@ -0,0 +1,162 @@
+"""
+Response cache keyed by import generation.
+
+Health data only changes when an import completes or data is cleared, and
+both bump the import generation. GET responses under the cached prefixes
+are stored with the generation in their key, so a new import makes every
+older entry unreachable without explicit invalidation. Entries carry a
+strong ETag, letting the dashboard revalidate with If-None-Match and get a
+304 without the handler or SQLite being touched. Keys include the profile's
+database file, so profiles share the cache without seeing each other's data.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from . import database
+
+
+# Path prefixes whose GET responses depend only on imported data
+CACHED_PREFIXES = ("/api/health/", "/api/insights/")
+
+MAX_ENTRIES = 512
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache:
+    """LRU cache of encoded responses bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, etag: str, headers: list, body: bytes, route=None):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key)[2])
+            self._entries[key] = (etag, headers, body, route)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    return any(tag.strip() in (etag, "*") for tag in header.split(","))
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving cached GET responses with ETag/304 support."""
+
+    def __init__(self, app, cache: ResponseCache = response_cache, prefixes: tuple = CACHED_PREFIXES):
+        self.app = app
+        self.cache = cache
+        self.prefixes = prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        query = "&".join(sorted(scope["query_string"].decode("latin-1").split("&")))
+        request_headers = dict(scope["headers"])
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1") or None
+        # Series endpoints negotiate their encoding on Accept, endpoints
+        # without explicit dates default to today, and each profile has its
+        # own database
+        accept = request_headers.get(b"accept", b"").decode("latin-1")
+        key = (
+            str(database.database_path()), scope["path"], query, accept,
+            database.get_import_generation(), date.today()
+        )
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            etag, headers, body, route = entry
+            # Let outer middleware label the hit with the route that served it
+            if route is not None:
+                scope["route"] = route
+            if if_none_match and _etag_matches(if_none_match, etag):
+                await self._send_not_modified(send, etag)
+            else:
+                await self._send(send, 200, headers, body)
+            return
+
+        status = None
+        headers = []
+        chunks = []
+
+        async def capture(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+
+        if status != 200:
+            await self._send(send, status, headers, body)
+            return
+
+        etag = make_etag(body)
+        headers = [
+            (name, value) for name, value in headers if name not in (b"etag", b"cache-control", b"vary")
+        ] + [(b"etag", etag.encode("latin-1")), (b"cache-control", b"no-cache"), (b"vary", b"Accept")]
+        self.cache.put(key, etag, headers, body, scope.get("route"))
+
+        if if_none_match and _etag_matches(if_none_match, etag):
+            await self._send_not_modified(send, etag)
+        else:
+            await self._send(send, 200, headers, body)
+
+    @staticmethod
+    async def _send(send, status: int, headers: list, body: bytes):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_not_modified(send, etag: str):
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [(b"etag", etag.encode("latin-1")), (b"cache-control", b"no-cache")],
+        })
+        await send({"type": "http.response.body", "body": b""})
@@ -1,491 +1,1054 @@
 import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import Optional
 import os
 
+from . import events, metrics, migrations, sleep, timeseries
+
 DATABASE_PATH = Path(__file__).parent.parent.parent / "data" / "health.db"
 
+# SECURITY: Whitelist of metric names to daily_summary columns. Column names are
+# interpolated into SQL, so only names from this map may ever reach a query.
+METRIC_COLUMNS = {
+    "steps": "steps",
+    "calories": "active_calories",
+    "heart_rate": "resting_heart_rate",
+    "weight": "weight",
+    "sleep": "sleep_hours",
+    "workouts": "workout_minutes",
+    "distance": "distance_km",
+    "flights": "flights_climbed",
+    "blood_pressure_systolic": "blood_pressure_systolic",
+    "blood_pressure_diastolic": "blood_pressure_diastolic",
+    "caffeine": "caffeine_mg",
+    "water": "water_ml"
+}
+
+# Metrics available in the hourly rollup. Heart rate is the mean of all
+# HeartRate samples in the hour rather than the daily resting value.
+HOURLY_METRIC_COLUMNS = {
+    "steps": "steps",
+    "calories": "active_calories",
+    "heart_rate": "heart_rate",
+    "flights": "flights_climbed",
+    "caffeine": "caffeine_mg",
+    "water": "water_ml",
+}
+
+# Summary resolutions from finest to coarsest: (table, key column, bucket hours)
+RESOLUTIONS = {
+    "hour": ("hourly_summary", "period", 1),
+    "day": ("daily_summary", "date", 24),
+    "week": ("weekly_summary", "period", 24 * 7),
+    "month": ("monthly_summary", "period", 24 * 30),
+    "year": ("yearly_summary", "period", 24 * 365),
+}
+
+# SQL expressions mapping a daily_summary date to the start of its bucket
+ROLLUP_PERIODS = {
+    "week": "DATE(date, '-6 days', 'weekday 1')",
+    "month": "STRFTIME('%Y-%m-01', date)",
+    "year": "STRFTIME('%Y-01-01', date)",
+}
+
+# Tables holding imported data and what is built from it, dropped on every clear
+IMPORTED_TABLES = (
+    "health_records", "workouts", "sleep_records", "daily_summary",
+    *(table for table, _, _ in RESOLUTIONS.values() if table != "daily_summary"),
+    "heart_rate_minutes", "sample_blocks", "sample_series", "record_catalog", "heatmaps", "sleep_sessions",
+)
+
+# Derived tables a reimport updates in place, kept by clear_database(keep_derived=True)
+DERIVED_TABLES = ("anomaly_scores", "heart_rate_spikes", "heart_rate_days", "goal_streaks", "goal_progress")
+
+SUMMARY_COLUMNS = [
+    "steps", "active_calories", "resting_heart_rate", "weight", "sleep_hours",
+    "workout_minutes", "distance_km", "flights_climbed", "blood_pressure_systolic",
+    "blood_pressure_diastolic", "caffeine_mg", "water_ml",
+]
+
+
+# Idle connections kept per database file
+POOL_SIZE = 4
+
+# Seconds a database may go unused before its pool is closed
+POOL_IDLE_SECONDS = 300
+
+# Database file of the profile being served; None selects DATABASE_PATH
+_current_database: ContextVar[Optional[Path]] = ContextVar("current_database", default=None)
+
+
+def database_path() -> Path:
+    """Get the database file for the current request or task."""
+    return _current_database.get() or DATABASE_PATH
+
+
+@contextmanager
+def use_database(path: Path):
+    """Route connections opened in this context (and tasks it starts) to `path`."""
+    token = _current_database.set(path)
+    try:
+        yield
+    finally:
+        _current_database.reset(token)
+
+
+class PooledConnection(metrics.InstrumentedConnection):
+    """Connection whose close() hands it back to its pool.
+
+    Used as a context manager it is handed back when the block exits, even
+    on an exception; unlike a plain sqlite3 connection it does not commit,
+    so work the block did not commit is rolled back.
+    """
 
-def get_connection() -> sqlite3.Connection:
-    """Get a database connection with row factory."""
-    DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DATABASE_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+    pool = None
+    idle = False
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursors = weakref.WeakSet()
 
-def init_database():
-    """Initialize database tables."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    def cursor(self, factory=metrics.InstrumentedCursor):
+        cursor = super().cursor(factory)
+        self.cursors.add(cursor)
+        return cursor
 
-    # Health records table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS health_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT NOT NULL,
-            value REAL,
-            unit TEXT,
-            start_date DATETIME,
-            end_date DATETIME,
-            source_name TEXT,
-            device TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
 
-    # Workouts table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS workouts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            workout_type TEXT,
-            duration_minutes REAL,
-            total_distance REAL,
-            total_energy_burned REAL,
-            start_date DATETIME,
-            end_date DATETIME,
-            source_name TEXT
-        )
-    """)
+    def discard(self):
+        super().close()
 
-    # Sleep records table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sleep_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sleep_type TEXT,
-            start_date DATETIME,
-            end_date DATETIME,
-            source_name TEXT
-        )
-    """)
+    def __enter__(self):
+        return self
 
-    # Daily summary table (pre-aggregated for fast queries)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS daily_summary (
-            date DATE PRIMARY KEY,
-            steps INTEGER,
-            active_calories REAL,
-            resting_heart_rate REAL,
-            weight REAL,
-            sleep_hours REAL,
-            workout_minutes REAL,
-            distance_km REAL,
-            flights_climbed INTEGER,
-            blood_pressure_systolic REAL,
-            blood_pressure_diastolic REAL,
-            caffeine_mg REAL,
-            water_ml REAL
-        )
-    """)
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+        return False
 
-    # Import status table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS import_status (
-            id INTEGER PRIMARY KEY CHECK (id = 1),
-            status TEXT DEFAULT 'idle',
-            progress REAL DEFAULT 0,
-            records_imported INTEGER DEFAULT 0,
-            last_import DATETIME,
-            error_message TEXT
-        )
-    """)
 
-    # Units table - stores detected units from import
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS units (
-            metric TEXT PRIMARY KEY,
-            unit TEXT NOT NULL
-        )
-    """)
+class ConnectionPool:
+    """Idle connections to one database file, reused across threads.
+
+    Connections are created with check_same_thread=False; a connection is
+    only ever used by whoever checked it out, one thread at a time.
+    """
+
+    def __init__(self, path: Path, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.checked_out = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self.checked_out += 1
+            self.last_used = time.monotonic()
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, factory=PooledConnection)
+            conn.pool = self
+        conn.idle = False
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def release(self, conn: PooledConnection):
+        if conn.idle:
+            return
+        # A cursor left mid-result would pin its read snapshot, and an open
+        # transaction its writes, onto the next user of the connection
+        for cursor in list(conn.cursors):
+            cursor.close()
+        if conn.in_transaction:
+            conn.rollback()
+        conn.idle = True
+        with self._lock:
+            self.checked_out -= 1
+            self.last_used = time.monotonic()
+            if self.closed or len(self._idle) >= self.size:
+                conn.discard()
+            else:
+                self._idle.append(conn)
+
+    def close(self):
+        """Close idle connections; checked-out ones close when released."""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_last_sweep = time.monotonic()
+
+
+def _get_pool(path: Path) -> ConnectionPool:
+    """Get the pool for a database file, creating it on first use."""
+    global _last_sweep
+    key = str(path)
+    now = time.monotonic()
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(path)
+        sweep = now - _last_sweep > POOL_IDLE_SECONDS / 4
+        if sweep:
+            _last_sweep = now
+    if sweep:
+        evict_idle_pools(now)
+    return pool
+
+
+def evict_idle_pools(now: Optional[float] = None):
+    """Close pools with nothing checked out that have been unused for a while."""
+    now = time.monotonic() if now is None else now
+    with _pools_lock:
+        evicted = [
+            _pools.pop(key) for key, pool in list(_pools.items())
+            if pool.checked_out == 0 and now - pool.last_used > POOL_IDLE_SECONDS
+        ]
+    for pool in evicted:
+        pool.close()
+
+
+def close_pools():
+    """Close every pool, e.g. before a database file is deleted."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats() -> list:
+    """Get open pools with their idle and checked-out connection counts."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [
+        {"database": pool.path.name, "idle": len(pool._idle), "checked_out": pool.checked_out}
+        for pool in pools
+    ]
 
-    # Initialize import status if not exists
-    cursor.execute("""
-        INSERT OR IGNORE INTO import_status (id, status, progress, records_imported)
-        VALUES (1, 'idle', 0, 0)
-    """)
 
-    # Create indexes for faster queries
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_health_type ON health_records(type)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_health_start_date ON health_records(start_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_health_type_date ON health_records(type, start_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_workouts_start_date ON workouts(start_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sleep_start_date ON sleep_records(start_date)")
+def get_connection() -> sqlite3.Connection:
+    """Get a pooled connection to the current database with row factory.
+
+    Closing the connection, or leaving a `with get_connection() as conn:`
+    block, returns it to the pool. Pooled connections may be
+    used from any thread, so a streaming response can advance a generator
+    holding one from worker threads, one step at a time.
+    """
+    return _get_pool(database_path()).acquire()
+
+
+def fetch_dicts(cursor) -> list:
+    """Fetch remaining rows of a tuple cursor as plain dicts.
 
-    conn.commit()
-    conn.close()
+    Column names are read once per query, which is cheaper than building a
+    sqlite3.Row per row and converting it with dict().
+    """
+    fields = [column[0] for column in cursor.description]
+    return [dict(zip(fields, row)) for row in cursor.fetchall()]
+
+
+def init_database():
+    """Create the schema or upgrade it to the current version."""
+    with get_connection() as conn:
+        migrations.migrate(conn)
 
 
-def clear_database():
+def clear_database(keep_derived: bool = False):
     """Clear all health data from database.
 
-    Uses DROP TABLE instead of DELETE for performance with large datasets.
+    Uses DROP TABLE instead of DELETE for performance with large datasets,
+    then recreates the dropped tables from their current definitions.
+    With keep_derived the anomaly scores and goal streaks survive, so
+    reimporting a newer export only rewrites the days that changed. Goals
+    themselves are settings and are always kept.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    tables = IMPORTED_TABLES if keep_derived else IMPORTED_TABLES + DERIVED_TABLES
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    # Drop and recreate tables - much faster than DELETE for millions of rows
-    cursor.execute("DROP TABLE IF EXISTS health_records")
-    cursor.execute("DROP TABLE IF EXISTS workouts")
-    cursor.execute("DROP TABLE IF EXISTS sleep_records")
-    cursor.execute("DROP TABLE IF EXISTS daily_summary")
+        # Drop and recreate tables - much faster than DELETE for millions of rows
+        for table in tables:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        migrations.create_tables(cursor, tables)
 
-    # Reset import status
-    cursor.execute("UPDATE import_status SET status='idle', progress=0, records_imported=0")
-    conn.commit()
-    conn.close()
+        # Reset import status
+        cursor.execute("""
+            UPDATE import_status
+            SET status='idle', progress=0, records_imported=0, generation=generation + 1
+        """)
+
+        # Nothing is left for pending backfills to work through
+        cursor.execute("DELETE FROM backfill_progress")
+        conn.commit()
 
-    # Recreate the tables
-    init_database()
+        # Return the freed pages to the filesystem while the database is nearly
+        # empty; this also switches older databases to incremental auto-vacuum
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+
+    _import_generations.pop(str(database_path()), None)
 
 
 def get_import_status() -> dict:
     """Get current import status."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM import_status WHERE id = 1")
-    row = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM import_status WHERE id = 1")
+        row = cursor.fetchone()
     if row:
         return dict(row)
     return {"status": "idle", "progress": 0, "records_imported": 0, "last_import": None, "error_message": None}
 
 
+# In-process copy of import_status.generation per database file, so
+# response caches can check freshness without querying SQLite
+_import_generations = {}
+
+
+def get_import_generation() -> int:
+    """Get the counter that changes whenever imported data changes."""
+    key = str(database_path())
+    if key not in _import_generations:
+        with get_connection() as conn:
+            row = conn.execute("SELECT generation FROM import_status WHERE id = 1").fetchone()
+        _import_generations[key] = row[0] if row else 0
+    return _import_generations[key]
+
+
+def bump_import_generation():
+    """Mark imported data as changed."""
+    with get_connection() as conn:
+        conn.execute("UPDATE import_status SET generation = generation + 1 WHERE id = 1")
+        conn.commit()
+    _import_generations.pop(str(database_path()), None)
+
+
 def set_unit(metric: str, unit: str):
     """Store the unit for a metric."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR REPLACE INTO units (metric, unit) VALUES (?, ?)",
-        (metric, unit)
-    )
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO units (metric, unit) VALUES (?, ?)",
+            (metric, unit)
+        )
+        conn.commit()
 
 
 def get_unit(metric: str) -> str | None:
     """Get the stored unit for a metric."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT unit FROM units WHERE metric = ?", (metric,))
-    row = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT unit FROM units WHERE metric = ?", (metric,))
+        row = cursor.fetchone()
     return row[0] if row else None
 
 
 def get_all_units() -> dict:
     """Get all stored units."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT metric, unit FROM units")
-    rows = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT metric, unit FROM units")
+        rows = cursor.fetchall()
     return {row[0]: row[1] for row in rows}
 
 
 def detect_units_from_data():
     """Detect and store units from existing health_records data."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    metric_name_map = {
-        "HKQuantityTypeIdentifierBodyMass": "weight",
-        "HKQuantityTypeIdentifierStepCount": "steps",
-        "HKQuantityTypeIdentifierDistanceWalkingRunning": "distance",
-        "HKQuantityTypeIdentifierActiveEnergyBurned": "calories",
-        "HKQuantityTypeIdentifierHeartRate": "heart_rate",
-        "HKQuantityTypeIdentifierRestingHeartRate": "resting_heart_rate",
-        "HKQuantityTypeIdentifierHeight": "height",
-        "HKQuantityTypeIdentifierFlightsClimbed": "flights",
-        "HKQuantityTypeIdentifierBloodPressureSystolic": "blood_pressure_systolic",
-        "HKQuantityTypeIdentifierBloodPressureDiastolic": "blood_pressure_diastolic",
-        "HKQuantityTypeIdentifierDietaryCaffeine": "caffeine",
-        "HKQuantityTypeIdentifierDietaryWater": "water",
-    }
-
-    # Get first non-null unit for each type
-    cursor.execute("""
-        SELECT type, unit FROM health_records
-        WHERE unit IS NOT NULL
-        GROUP BY type
-    """)
-    rows = cursor.fetchall()
-
-    for row in rows:
-        hk_type, unit = row[0], row[1]
-        metric_name = metric_name_map.get(hk_type, hk_type)
-        cursor.execute(
-            "INSERT OR REPLACE INTO units (metric, unit) VALUES (?, ?)",
-            (metric_name, unit)
-        )
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        metric_name_map = {
+            "HKQuantityTypeIdentifierBodyMass": "weight",
+            "HKQuantityTypeIdentifierStepCount": "steps",
+            "HKQuantityTypeIdentifierDistanceWalkingRunning": "distance",
+            "HKQuantityTypeIdentifierActiveEnergyBurned": "calories",
+            "HKQuantityTypeIdentifierHeartRate": "heart_rate",
+            "HKQuantityTypeIdentifierRestingHeartRate": "resting_heart_rate",
+            "HKQuantityTypeIdentifierHeight": "height",
+            "HKQuantityTypeIdentifierFlightsClimbed": "flights",
+            "HKQuantityTypeIdentifierBloodPressureSystolic": "blood_pressure_systolic",
+            "HKQuantityTypeIdentifierBloodPressureDiastolic": "blood_pressure_diastolic",
+            "HKQuantityTypeIdentifierDietaryCaffeine": "caffeine",
+            "HKQuantityTypeIdentifierDietaryWater": "water",
+        }
+
+        # The catalog holds a unit per type and source, including block-stored samples
+        cursor.execute("""
+            SELECT type, MIN(unit) FROM record_catalog
+            WHERE unit IS NOT NULL
+            GROUP BY type
+        """)
+        rows = cursor.fetchall()
+
+        for row in rows:
+            hk_type, unit = row[0], row[1]
+            metric_name = metric_name_map.get(hk_type, hk_type)
+            cursor.execute(
+                "INSERT OR REPLACE INTO units (metric, unit) VALUES (?, ?)",
+                (metric_name, unit)
+            )
 
-    conn.commit()
-    conn.close()
+        conn.commit()
+    bump_import_generation()
     return get_all_units()
 
 
 def update_import_status(status: str, progress: float = 0, records_imported: int = 0, error_message: str = None):
     """Update import status."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if status == "complete":
+            cursor.execute("""
+                UPDATE import_status
+                SET status=?, progress=?, records_imported=?, last_import=?, error_message=?,
+                    generation=generation + 1
+                WHERE id=1
+            """, (status, progress, records_imported, datetime.now().isoformat(), error_message))
+        else:
+            cursor.execute("""
+                UPDATE import_status
+                SET status=?, progress=?, records_imported=?, error_message=?
+                WHERE id=1
+            """, (status, progress, records_imported, error_message))
+        conn.commit()
     if status == "complete":
-        cursor.execute("""
-            UPDATE import_status
-            SET status=?, progress=?, records_imported=?, last_import=?, error_message=?
-            WHERE id=1
-        """, (status, progress, records_imported, datetime.now().isoformat(), error_message))
-    else:
-        cursor.execute("""
-            UPDATE import_status
-            SET status=?, progress=?, records_imported=?, error_message=?
-            WHERE id=1
-        """, (status, progress, records_imported, error_message))
-    conn.commit()
-    conn.close()
+        _import_generations.pop(str(database_path()), None)
+    events.import_events.publish({
+        "status": status,
+        "progress": progress,
+        "records_imported": records_imported,
+        "error_message": error_message,
+    }, topic=str(database_path()))
 
 
 def insert_health_records(records: list):
-    """Batch insert health records."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Batch insert health records, counting them in the catalog in the same transaction."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO health_records (type, value, unit, start_date, end_date, source_name, device)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, records)
+        merge_catalog(cursor, catalog_rows(records))
+        conn.commit()
+
+
+def catalog_rows(records: list) -> list:
+    """Summarize records into (type, source, unit, count, first, last) catalog rows.
+
+    First and last dates are stored in UTC, the form block-stored samples
+    are counted in, so MIN/MAX over the catalog stay chronological.
+    """
+    stats = {}
+    for record_type, _, unit, start_date, _, source_name, _ in records:
+        key = (record_type, source_name or "")
+        entry = stats.get(key)
+        if entry is None:
+            entry = stats[key] = [unit, 0, {}]
+        entry[1] += 1
+        if entry[0] is None:
+            entry[0] = unit
+        if start_date is not None:
+            # Dates with the same UTC offset suffix compare chronologically as
+            # strings, so only each offset's extremes need converting
+            bounds = entry[2].get(start_date[-6:])
+            if bounds is None:
+                entry[2][start_date[-6:]] = [start_date, start_date]
+            elif start_date < bounds[0]:
+                bounds[0] = start_date
+            elif start_date > bounds[1]:
+                bounds[1] = start_date
+    rows = []
+    for key, (unit, count, offsets) in stats.items():
+        firsts = [timeseries.utc_date(bounds[0]) for bounds in offsets.values()]
+        lasts = [timeseries.utc_date(bounds[1]) for bounds in offsets.values()]
+        rows.append((*key, unit, count, min(firsts, default=None), max(lasts, default=None)))
+    return rows
+
+
+def merge_catalog(cursor, rows: list):
+    """Add (type, source, unit, count, first, last) rows to record_catalog."""
     cursor.executemany("""
-        INSERT INTO health_records (type, value, unit, start_date, end_date, source_name, device)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, records)
-    conn.commit()
-    conn.close()
+        INSERT INTO record_catalog (type, source_name, unit, records, first_date, last_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (type, source_name) DO UPDATE SET
+            unit = IFNULL(unit, excluded.unit),
+            records = records + excluded.records,
+            first_date = MIN(IFNULL(first_date, excluded.first_date), IFNULL(excluded.first_date, first_date)),
+            last_date = MAX(IFNULL(last_date, excluded.last_date), IFNULL(excluded.last_date, last_date))
+    """, rows)
 
 
 def insert_workouts(workouts: list):
     """Batch insert workout records."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.executemany("""
-        INSERT INTO workouts (workout_type, duration_minutes, total_distance, total_energy_burned, start_date, end_date, source_name)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, workouts)
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO workouts (workout_type, duration_minutes, total_distance, total_energy_burned, start_date, end_date, source_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, workouts)
+        conn.commit()
 
 
 def insert_sleep_records(records: list):
     """Batch insert sleep records."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.executemany("""
-        INSERT INTO sleep_records (sleep_type, start_date, end_date, source_name)
-        VALUES (?, ?, ?, ?)
-    """, records)
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO sleep_records (sleep_type, start_date, end_date, source_name)
+            VALUES (?, ?, ?, ?)
+        """, records)
+        conn.commit()
 
 
 def compute_daily_summaries():
     """Compute daily summaries from raw health records using efficient batch queries."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    # Clear existing summaries
-    cursor.execute("DELETE FROM daily_summary")
+        # Clear existing summaries
+        cursor.execute("DELETE FROM daily_summary")
 
-    # Aggregate all health metrics in a single query with GROUP BY
-    # This is much faster than per-day queries for large datasets
-    cursor.execute("""
-        INSERT INTO daily_summary (date, steps, active_calories, resting_heart_rate, distance_km, flights_climbed,
-                                   blood_pressure_systolic, blood_pressure_diastolic, caffeine_mg, water_ml)
-        SELECT
-            DATE(start_date) as date,
-            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierStepCount' THEN value END) as steps,
-            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierActiveEnergyBurned' THEN value END) as active_calories,
-            AVG(CASE WHEN type = 'HKQuantityTypeIdentifierRestingHeartRate' THEN value END) as resting_heart_rate,
-            CASE
-                WHEN SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDistanceWalkingRunning' THEN value END) > 1000
-                THEN SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDistanceWalkingRunning' THEN value END) / 1000.0
-                ELSE SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDistanceWalkingRunning' THEN value END)
-            END as distance_km,
-            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierFlightsClimbed' THEN value END) as flights_climbed,
-            AVG(CASE WHEN type = 'HKQuantityTypeIdentifierBloodPressureSystolic' THEN value END) as blood_pressure_systolic,
-            AVG(CASE WHEN type = 'HKQuantityTypeIdentifierBloodPressureDiastolic' THEN value END) as blood_pressure_diastolic,
-            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDietaryCaffeine' THEN value END) as caffeine_mg,
-            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDietaryWater' THEN value END) as water_ml
-        FROM health_records
-        WHERE DATE(start_date) IS NOT NULL
-        GROUP BY DATE(start_date)
-    """)
+        # Aggregate all health metrics in a single query with GROUP BY
+        # This is much faster than per-day queries for large datasets
+        cursor.execute("""
+            INSERT INTO daily_summary (date, steps, active_calories, resting_heart_rate, distance_km, flights_climbed,
+                                       blood_pressure_systolic, blood_pressure_diastolic, caffeine_mg, water_ml)
+            SELECT
+                DATE(start_date) as date,
+                SUM(CASE WHEN type = 'HKQuantityTypeIdentifierStepCount' THEN value END) as steps,
+                SUM(CASE WHEN type = 'HKQuantityTypeIdentifierActiveEnergyBurned' THEN value END) as active_calories,
+                AVG(CASE WHEN type = 'HKQuantityTypeIdentifierRestingHeartRate' THEN value END) as resting_heart_rate,
+                CASE
+                    WHEN SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDistanceWalkingRunning' THEN value END) > 1000
+                    THEN SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDistanceWalkingRunning' THEN value END) / 1000.0
+                    ELSE SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDistanceWalkingRunning' THEN value END)
+                END as distance_km,
+                SUM(CASE WHEN type = 'HKQuantityTypeIdentifierFlightsClimbed' THEN value END) as flights_climbed,
+                AVG(CASE WHEN type = 'HKQuantityTypeIdentifierBloodPressureSystolic' THEN value END) as blood_pressure_systolic,
+                AVG(CASE WHEN type = 'HKQuantityTypeIdentifierBloodPressureDiastolic' THEN value END) as blood_pressure_diastolic,
+                SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDietaryCaffeine' THEN value END) as caffeine_mg,
+                SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDietaryWater' THEN value END) as water_ml
+            FROM health_records
+            WHERE DATE(start_date) IS NOT NULL
+            GROUP BY DATE(start_date)
+        """)
+
+        # Update with weight (most recent per day) - use a subquery to get latest per day
+        cursor.execute("""
+            UPDATE daily_summary
+            SET weight = (
+                SELECT value FROM health_records hr
+                WHERE hr.type = 'HKQuantityTypeIdentifierBodyMass'
+                AND DATE(hr.start_date) = daily_summary.date
+                ORDER BY hr.start_date DESC
+                LIMIT 1
+            )
+            WHERE EXISTS (
+                SELECT 1 FROM health_records hr
+                WHERE hr.type = 'HKQuantityTypeIdentifierBodyMass'
+                AND DATE(hr.start_date) = daily_summary.date
+            )
+        """)
 
-    # Update with weight (most recent per day) - use a subquery to get latest per day
-    cursor.execute("""
-        UPDATE daily_summary
-        SET weight = (
-            SELECT value FROM health_records hr
-            WHERE hr.type = 'HKQuantityTypeIdentifierBodyMass'
-            AND DATE(hr.start_date) = daily_summary.date
-            ORDER BY hr.start_date DESC
-            LIMIT 1
-        )
-        WHERE EXISTS (
-            SELECT 1 FROM health_records hr
-            WHERE hr.type = 'HKQuantityTypeIdentifierBodyMass'
-            AND DATE(hr.start_date) = daily_summary.date
-        )
-    """)
+        # Update with workout minutes
+        cursor.execute("""
+            UPDATE daily_summary
+            SET workout_minutes = (
+                SELECT SUM(duration_minutes) FROM workouts
+                WHERE DATE(workouts.start_date) = daily_summary.date
+            )
+            WHERE EXISTS (
+                SELECT 1 FROM workouts
+                WHERE DATE(workouts.start_date) = daily_summary.date
+            )
+        """)
 
-    # Update with workout minutes
-    cursor.execute("""
-        UPDATE daily_summary
-        SET workout_minutes = (
-            SELECT SUM(duration_minutes) FROM workouts
-            WHERE DATE(workouts.start_date) = daily_summary.date
-        )
-        WHERE EXISTS (
-            SELECT 1 FROM workouts
-            WHERE DATE(workouts.start_date) = daily_summary.date
-        )
-    """)
+        # Insert any dates that only have workout data (no health_records)
+        cursor.execute("""
+            INSERT OR IGNORE INTO daily_summary (date, workout_minutes)
+            SELECT DATE(start_date), SUM(duration_minutes)
+            FROM workouts
+            WHERE DATE(start_date) NOT IN (SELECT date FROM daily_summary)
+            GROUP BY DATE(start_date)
+        """)
+
+        # Sleep comes from the reconstructed sessions, dated by wake day
+        apply_sleep_sessions(cursor)
+
+        conn.commit()
 
-    # Update with sleep hours
+
+def _update_sleep_hours(cursor):
+    """Set every day's sleep_hours to the sleep of the sessions ending that day."""
     cursor.execute("""
         UPDATE daily_summary
         SET sleep_hours = (
-            SELECT SUM((JULIANDAY(end_date) - JULIANDAY(start_date)) * 24)
-            FROM sleep_records
-            WHERE sleep_type IN (
-                'HKCategoryValueSleepAnalysisAsleepCore',
-                'HKCategoryValueSleepAnalysisAsleepDeep',
-                'HKCategoryValueSleepAnalysisAsleepREM',
-                'HKCategoryValueSleepAnalysisAsleep'
-            )
-            AND DATE(sleep_records.start_date) = daily_summary.date
-        )
-        WHERE EXISTS (
-            SELECT 1 FROM sleep_records
-            WHERE sleep_type IN (
-                'HKCategoryValueSleepAnalysisAsleepCore',
-                'HKCategoryValueSleepAnalysisAsleepDeep',
-                'HKCategoryValueSleepAnalysisAsleepREM',
-                'HKCategoryValueSleepAnalysisAsleep'
-            )
-            AND DATE(sleep_records.start_date) = daily_summary.date
+            SELECT SUM(asleep_minutes) / 60.0 FROM sleep_sessions
+            WHERE sleep_sessions.date = daily_summary.date
         )
     """)
 
-    # Insert any dates that only have workout or sleep data (no health_records)
-    cursor.execute("""
-        INSERT OR IGNORE INTO daily_summary (date, workout_minutes)
-        SELECT DATE(start_date), SUM(duration_minutes)
-        FROM workouts
-        WHERE DATE(start_date) NOT IN (SELECT date FROM daily_summary)
-        GROUP BY DATE(start_date)
-    """)
 
+def _insert_sleep_days(cursor):
+    """Add summary rows for wake dates that have no other data."""
     cursor.execute("""
         INSERT OR IGNORE INTO daily_summary (date, sleep_hours)
-        SELECT DATE(start_date), SUM((JULIANDAY(end_date) - JULIANDAY(start_date)) * 24)
-        FROM sleep_records
-        WHERE sleep_type IN (
-            'HKCategoryValueSleepAnalysisAsleepCore',
-            'HKCategoryValueSleepAnalysisAsleepDeep',
-            'HKCategoryValueSleepAnalysisAsleepREM',
-            'HKCategoryValueSleepAnalysisAsleep'
-        )
-        AND DATE(start_date) NOT IN (SELECT date FROM daily_summary)
-        GROUP BY DATE(start_date)
+        SELECT date, SUM(asleep_minutes) / 60.0
+        FROM sleep_sessions
+        GROUP BY date
     """)
 
-    conn.commit()
-    conn.close()
+
+def apply_sleep_sessions(cursor):
+    """Rebuild sleep sessions and set sleep_hours from them, adding days as needed."""
+    sleep.build_sleep_sessions(cursor)
+    _update_sleep_hours(cursor)
+    _insert_sleep_days(cursor)
+
+
+# Upper bound for rowid ranges that should cover the whole table
+MAX_ROWID = 2 ** 63 - 1
+
+
+def aggregate_hourly_summary(cursor, min_id: int = 0, max_id: int = MAX_ROWID):
+    """Merge health records with ids in (min_id, max_id] into hourly_summary."""
+    cursor.execute("""
+        INSERT INTO hourly_summary (period, steps, active_calories, heart_rate, heart_rate_samples,
+                                    flights_climbed, caffeine_mg, water_ml)
+        SELECT
+            STRFTIME('%Y-%m-%dT%H:00:00', start_date) as period,
+            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierStepCount' THEN value END) as steps,
+            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierActiveEnergyBurned' THEN value END) as active_calories,
+            AVG(CASE WHEN type = 'HKQuantityTypeIdentifierHeartRate' THEN value END) as heart_rate,
+            COUNT(CASE WHEN type = 'HKQuantityTypeIdentifierHeartRate' THEN value END) as heart_rate_samples,
+            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierFlightsClimbed' THEN value END) as flights_climbed,
+            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDietaryCaffeine' THEN value END) as caffeine_mg,
+            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierDietaryWater' THEN value END) as water_ml
+        FROM health_records
+        WHERE id > ? AND id <= ? AND STRFTIME('%Y-%m-%dT%H:00:00', start_date) IS NOT NULL
+        GROUP BY period
+        ON CONFLICT(period) DO UPDATE SET
+            steps = COALESCE(steps + excluded.steps, steps, excluded.steps),
+            active_calories = COALESCE(active_calories + excluded.active_calories, active_calories, excluded.active_calories),
+            heart_rate = COALESCE(
+                (heart_rate * heart_rate_samples + excluded.heart_rate * excluded.heart_rate_samples)
+                / (heart_rate_samples + excluded.heart_rate_samples),
+                heart_rate, excluded.heart_rate),
+            heart_rate_samples = heart_rate_samples + excluded.heart_rate_samples,
+            flights_climbed = COALESCE(flights_climbed + excluded.flights_climbed, flights_climbed, excluded.flights_climbed),
+            caffeine_mg = COALESCE(caffeine_mg + excluded.caffeine_mg, caffeine_mg, excluded.caffeine_mg),
+            water_ml = COALESCE(water_ml + excluded.water_ml, water_ml, excluded.water_ml)
+    """, (min_id, max_id))
+
+
+def aggregate_period_rollups(cursor):
+    """Rebuild the weekly, monthly and yearly rollups from daily_summary."""
+    columns = ", ".join(SUMMARY_COLUMNS)
+    averages = ", ".join(f"AVG({column})" for column in SUMMARY_COLUMNS)
+    for resolution, period in ROLLUP_PERIODS.items():
+        table = RESOLUTIONS[resolution][0]
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"""
+            INSERT INTO {table} (period, days, {columns})
+            SELECT {period} as period, COUNT(*), {averages}
+            FROM daily_summary
+            GROUP BY period
+        """)
+
+
+def aggregate_heart_rate_minutes(cursor, min_id: int = 0, max_id: int = MAX_ROWID):
+    """Merge heart rate records with ids in (min_id, max_id] into heart_rate_minutes."""
+    cursor.execute("""
+        INSERT INTO heart_rate_minutes (minute, min_bpm, max_bpm, sum_bpm, samples)
+        SELECT
+            CAST(STRFTIME('%s', start_date) AS INTEGER) / 60 as minute,
+            MIN(value), MAX(value), SUM(value), COUNT(*)
+        FROM health_records
+        WHERE type = 'HKQuantityTypeIdentifierHeartRate' AND id > ? AND id <= ?
+        AND value IS NOT NULL AND STRFTIME('%s', start_date) IS NOT NULL
+        GROUP BY minute
+        ON CONFLICT(minute) DO UPDATE SET
+            min_bpm = MIN(min_bpm, excluded.min_bpm),
+            max_bpm = MAX(max_bpm, excluded.max_bpm),
+            sum_bpm = sum_bpm + excluded.sum_bpm,
+            samples = samples + excluded.samples
+    """, (min_id, max_id))
+
+
+def compute_rollup_summaries():
+    """Compute hourly, weekly, monthly and yearly rollups.
+
+    The hourly rollup is aggregated from raw health records; the coarser
+    rollups average daily_summary, so compute_daily_summaries must run first.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM hourly_summary")
+        aggregate_hourly_summary(cursor)
+        aggregate_period_rollups(cursor)
+        conn.commit()
+
+
+def compute_heart_rate_minutes():
+    """Aggregate raw heart rate samples into per-minute min/max/sum/count."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM heart_rate_minutes")
+        aggregate_heart_rate_minutes(cursor)
+        conn.commit()
+
+
+def get_heart_rate_minutes(start_minute: int, end_minute: int) -> list:
+    """Get per-minute (minute, min, max, sum, samples) heart rate rows in a window."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT minute, min_bpm, max_bpm, sum_bpm, samples FROM heart_rate_minutes
+            WHERE minute >= ? AND minute <= ?
+            ORDER BY minute
+        """, (start_minute, end_minute))
+        rows = cursor.fetchall()
+    return [tuple(row) for row in rows]
+
+
+def get_last_heart_rate_minute() -> Optional[int]:
+    """Get the most recent minute with heart rate data."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(minute) FROM heart_rate_minutes")
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_anomalies(since: date, min_score: float, metric: Optional[str] = None, limit: int = 100) -> list:
+    """Get daily scores at least `min_score` from the baseline since a date, newest first."""
+    query = """
+        SELECT metric, date, value, baseline, spread, score FROM anomaly_scores
+        WHERE date >= ? AND ABS(score) >= ?
+    """
+    params = [since.isoformat(), min_score]
+    if metric is not None:
+        query += " AND metric = ?"
+        params.append(metric)
+    query += " ORDER BY date DESC, ABS(score) DESC LIMIT ?"
+    params.append(limit)
+
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = fetch_dicts(cursor)
+    return rows
+
+
+def get_heart_rate_spikes(since: date, limit: int = 100) -> list:
+    """Get intraday heart rate spikes since a date, newest first."""
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT minute, date, bpm, max_bpm, baseline, spread, score, duration_minutes
+            FROM heart_rate_spikes WHERE date >= ?
+            ORDER BY date DESC, minute DESC LIMIT ?
+        """, (since.isoformat(), limit))
+        rows = fetch_dicts(cursor)
+    return rows
+
+
+def choose_resolution(start_date: date, end_date: date, points: int) -> str:
+    """Pick the coarsest resolution that still yields at least `points` buckets."""
+    span_hours = ((end_date - start_date).days + 1) * 24
+    for resolution in reversed(list(RESOLUTIONS)):
+        if span_hours / RESOLUTIONS[resolution][2] >= points:
+            return resolution
+    return "hour"
+
+
+def resolve_resolution(metric_type: str, resolution: str, start_date: date, end_date: date, points: int) -> str:
+    """Resolve resolution=auto for a metric; other resolutions are returned as is.
+
+    Metrics without an hourly rollup fall back to daily under auto, and
+    raise ValueError when hourly resolution is asked for explicitly.
+    """
+    if resolution == "hour" and metric_type not in HOURLY_METRIC_COLUMNS:
+        raise ValueError(f"No hourly data for metric: {metric_type}")
+    if resolution != "auto":
+        return resolution
+    resolution = choose_resolution(start_date, end_date, points)
+    if resolution == "hour" and metric_type not in HOURLY_METRIC_COLUMNS:
+        return "day"
+    return resolution
+
+
+def _period_bounds(resolution: str, start_date: date, end_date: date) -> tuple:
+    """Translate a date range into key bounds for a summary table.
+
+    Coarse buckets are keyed by their first day, so the lower bound is moved
+    back to the start of the bucket containing start_date.
+    """
+    if resolution == "hour":
+        return (start_date.isoformat(), f"{end_date.isoformat()}T23:59:59")
+    if resolution == "week":
+        start_date = start_date - timedelta(days=start_date.weekday())
+    elif resolution == "month":
+        start_date = start_date.replace(day=1)
+    elif resolution == "year":
+        start_date = start_date.replace(month=1, day=1)
+    return (start_date.isoformat(), end_date.isoformat())
 
 
 def get_daily_summary(target_date: date) -> Optional[dict]:
     """Get daily summary for a specific date."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM daily_summary WHERE date = ?", (target_date.isoformat(),))
-    row = cursor.fetchone()
-    conn.close()
-    return dict(row) if row else None
-
-
-def get_summaries_in_range(start_date: date, end_date: date) -> list:
-    """Get daily summaries for a date range."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM daily_summary
-        WHERE date >= ? AND date <= ?
-        ORDER BY date
-    """, (start_date.isoformat(), end_date.isoformat()))
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
-
-
-def get_metric_history(metric_type: str, start_date: date, end_date: date) -> list:
-    """Get history of a specific metric."""
-    # SECURITY: Whitelist valid column names to prevent SQL injection
-    # Only allow known metric types - reject anything else
-    metric_map = {
-        "steps": "steps",
-        "calories": "active_calories",
-        "heart_rate": "resting_heart_rate",
-        "weight": "weight",
-        "sleep": "sleep_hours",
-        "workouts": "workout_minutes",
-        "distance": "distance_km",
-        "flights": "flights_climbed",
-        "blood_pressure_systolic": "blood_pressure_systolic",
-        "blood_pressure_diastolic": "blood_pressure_diastolic",
-        "caffeine": "caffeine_mg",
-        "water": "water_ml"
-    }
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM daily_summary WHERE date = ?", (target_date.isoformat(),))
+        rows = fetch_dicts(cursor)
+    return rows[0] if rows else None
+
+
+def get_summary_rows(
+    start_date: date,
+    end_date: date,
+    resolution: str = "day",
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+) -> tuple:
+    """Get (fields, row tuples) of summaries for a date range at the given resolution.
+
+    Rollup rows carry their period start in a leading "date" column so
+    callers can treat every resolution alike. With `after`, only rows keyed
+    after that date/period are returned (keyset pagination).
+    """
+    table, key, _ = RESOLUTIONS[resolution]
+    columns = "*" if key == "date" else f"{key} as date, *"
+    conditions = f"{key} >= ? AND {key} <= ?"
+    params = list(_period_bounds(resolution, start_date, end_date))
+    if after is not None:
+        conditions += f" AND {key} > ?"
+        params.append(after)
+    if limit is not None:
+        params.append(limit)
+
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {columns} FROM {table}
+            WHERE {conditions}
+            ORDER BY {key}
+            {"LIMIT ?" if limit is not None else ""}
+        """, params)
+        rows = cursor.fetchall()
+        fields = tuple(column[0] for column in cursor.description)
+    return fields, rows
+
+
+def get_summaries_in_range(
+    start_date: date,
+    end_date: date,
+    resolution: str = "day",
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+) -> list:
+    """Get summaries for a date range at the given resolution as dicts."""
+    fields, rows = get_summary_rows(start_date, end_date, resolution, limit, after)
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def get_metric_series(metric_type: str, start_date: date, end_date: date, resolution: str = "day") -> tuple:
+    """Get (dates, values) lists of a specific metric at the given resolution."""
+    # SECURITY: Only allow whitelisted metric types - reject anything else
+    metric_map = HOURLY_METRIC_COLUMNS if resolution == "hour" else METRIC_COLUMNS
 
     # Reject unknown metric types instead of using user input directly
     if metric_type not in metric_map:
-        return []
+        return [], []
 
     column = metric_map[metric_type]
-
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(f"""
-        SELECT date, {column} as value FROM daily_summary
-        WHERE date >= ? AND date <= ? AND {column} IS NOT NULL
-        ORDER BY date
-    """, (start_date.isoformat(), end_date.isoformat()))
-    rows = cursor.fetchall()
-    conn.close()
-    return [{"date": row["date"], "value": row["value"]} for row in rows]
-
-
-def get_all_workouts(start_date: date, end_date: date) -> list:
-    """Get all workouts in a date range."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM workouts
-        WHERE DATE(start_date) >= ? AND DATE(start_date) <= ?
-        ORDER BY start_date DESC
-    """, (start_date.isoformat(), end_date.isoformat()))
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    table, key, _ = RESOLUTIONS[resolution]
+
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {key}, {column} FROM {table}
+            WHERE {key} >= ? AND {key} <= ? AND {column} IS NOT NULL
+            ORDER BY {key}
+        """, _period_bounds(resolution, start_date, end_date))
+        rows = cursor.fetchall()
+    if not rows:
+        return [], []
+    dates, values = zip(*rows)
+    return list(dates), list(values)
+
+
+def get_metric_history(metric_type: str, start_date: date, end_date: date, resolution: str = "day") -> list:
+    """Get history of a specific metric at the given resolution."""
+    dates, values = get_metric_series(metric_type, start_date, end_date, resolution)
+    return [{"date": d, "value": v} for d, v in zip(dates, values)]
+
+
+def get_all_workouts(
+    start_date: date,
+    end_date: date,
+    limit: Optional[int] = None,
+    before: Optional[tuple] = None
+) -> list:
+    """Get workouts in a date range, newest first.
+
+    With `before` as a (start_date, id) key, only workouts sorting after it
+    in newest-first order are returned (keyset pagination).
+    """
+    # The raw start_date bounds are widened by a day to cover UTC offsets;
+    # they let the index narrow the scan before the exact DATE() filter
+    conditions = """
+        start_date >= ? AND start_date < ?
+        AND DATE(start_date) >= ? AND DATE(start_date) <= ?
+    """
+    params = [
+        (start_date - timedelta(days=1)).isoformat(),
+        (end_date + timedelta(days=2)).isoformat(),
+        start_date.isoformat(),
+        end_date.isoformat(),
+    ]
+    if before is not None:
+        conditions += " AND (start_date, id) < (?, ?)"
+        params.extend(before)
+    if limit is not None:
+        params.append(limit)
+
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM workouts
+            WHERE {conditions}
+            ORDER BY start_date DESC, id DESC
+            {"LIMIT ?" if limit is not None else ""}
+        """, params)
+        rows = fetch_dicts(cursor)
+    return rows
+
+
+def get_sleep_sessions(start_date: date, end_date: date, limit: int = 500) -> list:
+    """Get sleep sessions by wake date in a range, newest first."""
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM sleep_sessions
+            WHERE date >= ? AND date <= ?
+            ORDER BY date DESC, wake_time DESC
+            LIMIT ?
+        """, (start_date.isoformat(), end_date.isoformat(), limit))
+        rows = fetch_dicts(cursor)
+    return rows
+
+
+def get_health_records(
+    record_type: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 1000,
+    after: Optional[tuple] = None
+) -> list:
+    """Get raw records of one type in start order.
+
+    With `after` as a (start_date, id) key, only records sorting after it
+    are returned (keyset pagination). Walks idx_health_type_date, whose
+    entries are ordered by (type, start_date, id).
+
+    Dates bound the UTC date of the record start (end inclusive), like
+    block-stored samples and exports. Start dates keep their own UTC offset,
+    under a day either way, so the indexed range is widened by a day on each
+    side and DATE() picks the rows within it.
+    """
+    conditions = "type = ?"
+    params = [record_type]
+    if start_date is not None:
+        conditions += " AND start_date >= ? AND DATE(start_date) >= ?"
+        params.extend(((start_date - timedelta(days=1)).isoformat(), start_date.isoformat()))
+    if end_date is not None:
+        conditions += " AND start_date < ? AND DATE(start_date) <= ?"
+        params.extend(((end_date + timedelta(days=2)).isoformat(), end_date.isoformat()))
+    if after is not None:
+        conditions += " AND (start_date, id) > (?, ?)"
+        params.extend(after)
+    params.append(limit)
+
+    with get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT id, type, value, unit, start_date, end_date, source_name, device
+            FROM health_records
+            WHERE {conditions}
+            ORDER BY start_date, id
+            LIMIT ?
+        """, params)
+        rows = fetch_dicts(cursor)
+    return rows
 
 
 def get_records_count() -> int:
-    """Get total count of health records."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM health_records")
-    count = cursor.fetchone()[0]
-    conn.close()
+    """Get total count of health records, including block-stored samples."""
+    with get_connection() as conn:
+        count = conn.execute("SELECT IFNULL(SUM(records), 0) FROM record_catalog").fetchone()[0]
     return count
 
 
+def get_record_types() -> list:
+    """Get each record type's count, first and last start date, unit and sources."""
+    with get_connection() as conn:
+        conn.row_factory = None
+        rows = conn.execute("""
+            SELECT type, source_name, unit, records, first_date, last_date
+            FROM record_catalog ORDER BY type, records DESC
+        """).fetchall()
+
+    types = {}
+    for record_type, source_name, unit, records, first_date, last_date in rows:
+        entry = types.get(record_type)
+        if entry is None:
+            entry = types[record_type] = {
+                "type": record_type, "records": 0, "first_date": first_date,
+                "last_date": last_date, "unit": unit, "sources": [],
+            }
+        entry["records"] += records
+        if first_date is not None and (entry["first_date"] is None or first_date < entry["first_date"]):
+            entry["first_date"] = first_date
+        if last_date is not None and (entry["last_date"] is None or last_date > entry["last_date"]):
+            entry["last_date"] = last_date
+        entry["unit"] = entry["unit"] or unit
+        entry["sources"].append({"source_name": source_name or None, "records": records})
+    return list(types.values())
+
+
 def get_date_range() -> tuple:
     """Get the date range of available data."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT MIN(date), MAX(date) FROM daily_summary")
-    row = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(date), MAX(date) FROM daily_summary")
+        row = cursor.fetchone()
     return (row[0], row[1]) if row else (None, None)
@@ -0,0 +1,53 @@
+"""
+Time series downsampling.
+
+Largest-Triangle-Three-Buckets keeps the visual shape of a line chart while
+reducing it to a fixed number of points.
+"""
+
+from typing import List, Tuple
+
+Point = Tuple[float, float]
+
+
+def lttb(points: List[Point], threshold: int) -> List[Point]:
+    """Downsample (x, y) points to at most `threshold` points using LTTB.
+
+    Points must be sorted by x. The first and last points are always kept;
+    every bucket in between contributes the point forming the largest
+    triangle with the previously selected point and the next bucket's mean.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Mean of the next bucket is the third vertex of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = points[a]
+
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,50 @@
+"""
+Compact encodings for chart series.
+
+Series endpoints serve three shapes, chosen by a `format` query parameter or
+the Accept header:
+
+- json: the original list of {"date", "value"} objects
+- columnar: parallel arrays ({"dates": [...], "values": [...]}), so keys are
+  not repeated per point
+- msgpack: the columnar shape as MessagePack, encoded by the msgpack C
+  extension directly from the column lists
+"""
+
+from typing import Optional
+
+import msgpack
+from fastapi.responses import ORJSONResponse, Response
+
+
+FORMATS = ("json", "columnar", "msgpack")
+
+MEDIA_TYPES = {
+    "columnar": "application/vnd.health.columnar+json",
+    "msgpack": "application/msgpack",
+}
+
+# Accept header media types mapped to formats, in preference order
+ACCEPT_TYPES = {
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.health.columnar+json": "columnar",
+}
+
+
+def negotiate(accept: str, requested: Optional[str] = None) -> str:
+    """Pick a response format from an explicit request or the Accept header."""
+    if requested:
+        return requested
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in ACCEPT_TYPES:
+            return ACCEPT_TYPES[media_type]
+    return "json"
+
+
+def columnar_response(content: dict, fmt: str) -> Response:
+    """Build a response for a columnar payload in the "columnar" or "msgpack" format."""
+    if fmt == "msgpack":
+        return Response(msgpack.packb(content), media_type=MEDIA_TYPES["msgpack"])
+    return ORJSONResponse(content, media_type=MEDIA_TYPES["columnar"])
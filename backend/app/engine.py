@@ -0,0 +1,408 @@
+"""
+Vectorized insights engine.
+
+Loads a daily_summary window once into a float matrix (one column per
+metric, NaN where a day has no value) and computes statistics over every
+column at once. Correlations use pairwise-complete observations: each pair
+of metrics is correlated over the days on which both have a value, which
+for all pairs together is a handful of matrix products over the NaN masks.
+Lagged correlations repeat that on the day-aligned matrix shifted against
+itself, one shift per lag. Rolling series are single passes over a daily
+series: prefix sums for the mean, a recurrence for the EWMA and two heaps
+for the median.
+
+NumPy is imported on the first insights request rather than at startup;
+import this module lazily.
+"""
+
+import heapq
+import math
+from collections import Counter
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+
+from . import database
+
+
+# Fewest shared days for a correlation to be reported
+MIN_SAMPLES = 7
+
+# Continued-fraction iterations and tolerance for the incomplete beta function
+_BETA_ITERATIONS = 300
+_BETA_EPSILON = 1e-12
+_TINY = 1e-300
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+
+class SummaryMatrix:
+    """Daily summary values as a (days x metrics) float matrix."""
+
+    def __init__(self, dates: list, metrics: list, values: np.ndarray):
+        self.dates = dates
+        self.metrics = metrics
+        self.values = values
+
+    @classmethod
+    def from_rows(cls, fields: tuple, rows: list, metrics: Optional[list] = None) -> "SummaryMatrix":
+        """Build from (fields, row tuples) as returned by database.get_summary_rows."""
+        metrics = list(metrics or database.METRIC_COLUMNS)
+        index = {field: i for i, field in enumerate(fields)}
+        picks = [index[database.METRIC_COLUMNS[metric]] for metric in metrics]
+        date_index = index["date"]
+        dates = [row[date_index] for row in rows]
+        # None becomes NaN when converting to float
+        values = np.array([[row[i] for i in picks] for row in rows], dtype=float).reshape(len(rows), len(metrics))
+        return cls(dates, metrics, values)
+
+    @classmethod
+    def from_summaries(cls, summaries: list, metrics: Optional[list] = None) -> "SummaryMatrix":
+        """Build from daily summary dicts."""
+        metrics = list(metrics or database.METRIC_COLUMNS)
+        columns = [database.METRIC_COLUMNS[metric] for metric in metrics]
+        values = np.array(
+            [[summary.get(column) for column in columns] for summary in summaries], dtype=float
+        ).reshape(len(summaries), len(metrics))
+        return cls([summary["date"] for summary in summaries], metrics, values)
+
+    def daily(self) -> "SummaryMatrix":
+        """The matrix with a row for every calendar day from the first date to the last.
+
+        Days without a summary row are all NaN, so row offsets are day offsets.
+        """
+        if not self.dates:
+            return self
+        ordinals = np.array([date.fromisoformat(day).toordinal() for day in self.dates])
+        first = int(ordinals[0])
+        values = np.full((int(ordinals[-1]) - first + 1, len(self.metrics)), np.nan)
+        values[ordinals - first] = self.values
+        dates = [date.fromordinal(first + offset).isoformat() for offset in range(len(values))]
+        return SummaryMatrix(dates, self.metrics, values)
+
+
+def load_summaries(start_date: date, end_date: date, metrics: Optional[list] = None) -> SummaryMatrix:
+    """Read a daily_summary window into a SummaryMatrix with one query."""
+    fields, rows = database.get_summary_rows(start_date, end_date)
+    return SummaryMatrix.from_rows(fields, rows, metrics)
+
+
+def _betacf(a: np.ndarray, b: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Continued fraction for the incomplete beta function (modified Lentz)."""
+    qab = a + b
+    qap = a + 1.0
+    qam = a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < _TINY, _TINY, d)
+    h = d.copy()
+    for m in range(1, _BETA_ITERATIONS + 1):
+        m2 = 2 * m
+        for numerator in (
+            m * (b - m) * x / ((qam + m2) * (a + m2)),
+            -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / np.where(np.abs(d) < _TINY, _TINY, d)
+            c = 1.0 + numerator / c
+            c = np.where(np.abs(c) < _TINY, _TINY, c)
+            delta = d * c
+            h *= delta
+        if np.all(np.abs(delta - 1.0) < _BETA_EPSILON):
+            break
+    return h
+
+
+def betainc(a, b, x) -> np.ndarray:
+    """Regularized incomplete beta function I_x(a, b), elementwise."""
+    a, b, x = (np.asarray(v, dtype=float) for v in np.broadcast_arrays(a, b, x))
+    result = np.where(x >= 1.0, 1.0, 0.0)
+    inside = (x > 0.0) & (x < 1.0) & (a > 0.0) & (b > 0.0)
+    result[np.isnan(x) | np.isnan(a)] = np.nan
+    if not inside.any():
+        return result
+
+    a, b, x = a[inside], b[inside], x[inside]
+    # The continued fraction converges quickly only below this point;
+    # beyond it use I_x(a, b) = 1 - I_(1-x)(b, a)
+    swap = x > (a + 1.0) / (a + b + 2.0)
+    a, b = np.where(swap, b, a), np.where(swap, a, b)
+    x = np.where(swap, 1.0 - x, x)
+    log_front = (
+        _lgamma(a + b).astype(float) - _lgamma(a).astype(float) - _lgamma(b).astype(float)
+        + a * np.log(x) + b * np.log1p(-x)
+    )
+    value = np.exp(log_front) * _betacf(a, b, x) / a
+    result[inside] = np.where(swap, 1.0 - value, value)
+    return result
+
+
+def correlation_pvalues(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Two-sided p-values for Pearson coefficients `r` from `n` observations.
+
+    With t = r * sqrt(df / (1 - r^2)) on df = n - 2 degrees of freedom, the
+    Student's t tail probability is I_(df / (df + t^2))(df / 2, 1 / 2), and
+    df / (df + t^2) simplifies to 1 - r^2.
+    """
+    df = np.where(n > 2, n - 2.0, np.nan)
+    return betainc(df / 2.0, 0.5, np.clip(1.0 - r * r, 0.0, 1.0))
+
+
+def _centred(values: np.ndarray) -> tuple:
+    """(presence mask as floats, values minus their column means with 0 for NaN)."""
+    present = ~np.isnan(values)
+    mask = present.astype(float)
+    counts = mask.sum(axis=0)
+    sums = np.where(present, values, 0.0).sum(axis=0)
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    return mask, np.where(present, values - means, 0.0)
+
+
+def _cross_correlation(a: np.ndarray, b: np.ndarray) -> tuple:
+    """Pairwise-complete Pearson r and counts between the columns of two aligned matrices.
+
+    Entry [i, j] correlates column i of `a` with column j of `b` over the
+    rows where both have a value.
+    """
+    # Centring first keeps the sums of squares well conditioned
+    mask_a, x = _centred(a)
+    mask_b, y = _centred(b)
+
+    n = mask_a.T @ mask_b
+    sum_x = x.T @ mask_b
+    sum_y = mask_a.T @ y
+    sum_xx = (x * x).T @ mask_b
+    sum_yy = mask_a.T @ (y * y)
+    sum_xy = x.T @ y
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = sum_yy - sum_y * sum_y / n
+        r = cov / np.sqrt(var_x * var_y)
+    valid = (n >= 3) & (var_x > 1e-12 * np.maximum(sum_xx, 1.0)) & (var_y > 1e-12 * np.maximum(sum_yy, 1.0))
+    return np.where(valid, np.clip(r, -1.0, 1.0), np.nan), n
+
+
+def correlation_matrix(matrix: SummaryMatrix) -> dict:
+    """Pairwise-complete Pearson correlations between every pair of metrics.
+
+    Returns (metrics x metrics) arrays "r", "p" and "n" (shared days). Pairs
+    with fewer than three shared days, or a metric that is constant over
+    them, have NaN r and p.
+    """
+    r, n = _cross_correlation(matrix.values, matrix.values)
+    p = np.where(np.isnan(r), np.nan, correlation_pvalues(r, n))
+    return {"metrics": list(matrix.metrics), "r": r, "p": p, "n": n.astype(int)}
+
+
+def lagged_correlations(matrix: SummaryMatrix, max_lag: int = 7) -> dict:
+    """Cross-correlations between every pair of metrics at day lags -max_lag..max_lag.
+
+    Returns "lags" and (lags x metrics x metrics) arrays "r", "p" and "n",
+    where [l, i, j] correlates metric i on a day with metric j lags[l] days
+    later. The series is first spread over every calendar day, then each lag
+    is one shifted, pairwise-complete cross-correlation of the whole matrix.
+    """
+    values = matrix.daily().values
+    days, size = values.shape
+    lags = list(range(-max_lag, max_lag + 1))
+    r = np.full((len(lags), size, size), np.nan)
+    n = np.zeros((len(lags), size, size))
+    for index, lag in enumerate(lags):
+        if abs(lag) >= days:
+            continue
+        if lag >= 0:
+            r[index], n[index] = _cross_correlation(values[:days - lag], values[lag:])
+        else:
+            r[index], n[index] = _cross_correlation(values[-lag:], values[:days + lag])
+    p = np.where(np.isnan(r), np.nan, correlation_pvalues(r, n))
+    return {"metrics": list(matrix.metrics), "lags": lags, "r": r, "p": p, "n": n.astype(int)}
+
+
+def top_lagged_correlations(
+    result: dict,
+    k: Optional[int] = None,
+    min_abs: float = 0.0,
+    min_samples: int = MIN_SAMPLES
+) -> list:
+    """The k strongest (metric1, metric2, lag) combinations from lagged_correlations.
+
+    A metric is not paired with itself, and since metric1 -> metric2 at lag
+    L is metric2 -> metric1 at -L, same-day pairs are listed once and lagged
+    pairs only with a positive lag.
+    """
+    r, p, n, lags = result["r"], result["p"], result["n"], np.array(result["lags"])
+    lag_index, i, j = np.indices(r.shape)
+    lag = lags[lag_index]
+    keep = (
+        (i != j) & ((lag > 0) | ((lag == 0) & (i < j)))
+        & ~np.isnan(r) & (np.abs(np.nan_to_num(r)) >= min_abs) & (n >= min_samples)
+    )
+    order = np.argsort(-np.abs(r[keep]), kind="stable")
+    if k is not None:
+        order = order[:k]
+    metrics = result["metrics"]
+    picked = (lag_index[keep][order], i[keep][order], j[keep][order])
+    return [
+        {
+            "metric1": metrics[a],
+            "metric2": metrics[b],
+            "lag": int(lags[l]),
+            "correlation": float(r[l, a, b]),
+            "p_value": float(p[l, a, b]),
+            "samples": int(n[l, a, b]),
+        }
+        for l, a, b in zip(*picked)
+    ]
+
+
+def top_correlations(result: dict, k: Optional[int] = None, min_abs: float = 0.0, min_samples: int = MIN_SAMPLES) -> list:
+    """The k strongest metric pairs (by |r|) from a correlation_matrix result."""
+    r, p, n = result["r"], result["p"], result["n"]
+    i, j = np.triu_indices(len(result["metrics"]), k=1)
+    strength = np.abs(r[i, j])
+    keep = ~np.isnan(strength) & (strength >= min_abs) & (n[i, j] >= min_samples)
+    i, j, strength = i[keep], j[keep], strength[keep]
+    order = np.argsort(-strength, kind="stable")
+    if k is not None:
+        order = order[:k]
+    metrics = result["metrics"]
+    return [
+        {
+            "metric1": metrics[i[o]],
+            "metric2": metrics[j[o]],
+            "correlation": float(r[i[o], j[o]]),
+            "p_value": float(p[i[o], j[o]]),
+            "samples": int(n[i[o], j[o]]),
+        }
+        for o in order
+    ]
+
+
+def matrix_payload(result: dict, digits: int = 4) -> dict:
+    """A correlation_matrix result as JSON-ready lists (NaN becomes None)."""
+    def listify(array):
+        return [[None if math.isnan(v) else round(float(v), digits) for v in row] for row in array]
+
+    return {
+        "metrics": result["metrics"],
+        "r": listify(result["r"]),
+        "p": listify(result["p"]),
+        "n": result["n"].tolist(),
+    }
+
+
+def daily_series(dates: list, values: list, start_date: date, end_date: date) -> np.ndarray:
+    """Spread (date, value) pairs over every day in [start_date, end_date], NaN elsewhere."""
+    first = start_date.toordinal()
+    series = np.full(end_date.toordinal() - first + 1, np.nan)
+    if dates:
+        offsets = np.array([date.fromisoformat(day).toordinal() - first for day in dates])
+        series[offsets] = np.array(values, dtype=float)
+    return series
+
+
+def series_dates(start_date: date, days: int) -> list:
+    return [(start_date + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """Mean of the non-NaN values in each trailing `window`, from prefix sums."""
+    present = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(present)])
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    total = sums[end] - sums[start]
+    count = counts[end] - counts[start]
+    return np.where(count >= min_periods, total / np.maximum(count, 1), np.nan)
+
+
+def ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponentially weighted moving average; missing days carry the last average forward."""
+    result = np.full(len(values), np.nan)
+    average = None
+    for index, value in enumerate(values.tolist()):
+        if value == value:
+            average = value if average is None else average + alpha * (value - average)
+        if average is not None:
+            result[index] = average
+    return result
+
+
+class _SlidingMedian:
+    """Median of a sliding multiset: a max-heap of the lower half and a
+    min-heap of the upper half, with removals applied lazily when an
+    outgoing value reaches the top of its heap."""
+
+    def __init__(self):
+        self.low = []
+        self.high = []
+        self.low_size = 0
+        self.high_size = 0
+        self.pending = Counter()
+
+    def _prune(self, heap: list, sign: int):
+        while heap and self.pending[sign * heap[0]]:
+            self.pending[sign * heap[0]] -= 1
+            heapq.heappop(heap)
+
+    def _balance(self):
+        if self.low_size > self.high_size + 1:
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+            self.low_size -= 1
+            self.high_size += 1
+            self._prune(self.low, -1)
+        elif self.low_size < self.high_size:
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+            self.high_size -= 1
+            self.low_size += 1
+            self._prune(self.high, 1)
+
+    def add(self, value: float):
+        if not self.low or value <= -self.low[0]:
+            heapq.heappush(self.low, -value)
+            self.low_size += 1
+        else:
+            heapq.heappush(self.high, value)
+            self.high_size += 1
+        self._balance()
+
+    def remove(self, value: float):
+        self.pending[value] += 1
+        if value <= -self.low[0]:
+            self.low_size -= 1
+            if value == -self.low[0]:
+                self._prune(self.low, -1)
+        else:
+            self.high_size -= 1
+            if self.high and value == self.high[0]:
+                self._prune(self.high, 1)
+        self._balance()
+
+    def __len__(self):
+        return self.low_size + self.high_size
+
+    def median(self) -> float:
+        if self.low_size > self.high_size:
+            return -self.low[0]
+        return (-self.low[0] + self.high[0]) / 2
+
+
+def rolling_median(values: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """Median of the non-NaN values in each trailing `window`, in O(n log window)."""
+    result = np.full(len(values), np.nan)
+    values = values.tolist()
+    heaps = _SlidingMedian()
+    for index, value in enumerate(values):
+        if value == value:
+            heaps.add(value)
+        if index >= window:
+            outgoing = values[index - window]
+            if outgoing == outgoing:
+                heaps.remove(outgoing)
+        if len(heaps) >= min_periods and len(heaps):
+            result[index] = heaps.median()
+    return result
@@ -0,0 +1,98 @@
+"""
+In-process broadcaster for import progress.
+
+The importer runs in a worker thread and publishes each status change here.
+Connected Server-Sent Events clients each hold a small asyncio queue on the
+server's event loop; publish hands events to them with
+call_soon_threadsafe, so pushing an update touches neither SQLite nor the
+importer's write lock. Slow clients drop their oldest queued events, since
+only the latest progress matters.
+"""
+
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Optional
+
+
+# Events buffered per client before the oldest are dropped
+QUEUE_SIZE = 16
+
+# Seconds between keepalive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+
+
+def _offer(queue: asyncio.Queue, event: dict):
+    """Queue an event on the loop thread, dropping the oldest if full."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class Broadcaster:
+    """Fans events out from any thread to subscribers on event loops."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event: dict, topic: Optional[str] = None):
+        """Deliver `event` to subscribers of `topic` and to those of every topic."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue, subscribed in subscribers:
+            if subscribed is not None and subscribed != topic:
+                continue
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is going away
+                pass
+
+    def subscribe(self, topic: Optional[str] = None) -> asyncio.Queue:
+        """Register a queue on the running loop; call from a coroutine.
+
+        A queue subscribed to a topic only receives events published to it.
+        """
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue, topic))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {entry for entry in self._subscribers if entry[1] is not queue}
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+import_events = Broadcaster()
+
+
+def format_sse(event: dict) -> str:
+    return f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+async def stream(
+    broadcaster: Broadcaster,
+    initial: Optional[dict] = None,
+    keepalive: float = KEEPALIVE_INTERVAL,
+    topic: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Yield SSE messages: `initial` (if given), then each published event."""
+    queue = broadcaster.subscribe(topic)
+    try:
+        if initial is not None:
+            yield format_sse(initial)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broadcaster.unsubscribe(queue)
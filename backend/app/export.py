@@ -0,0 +1,154 @@
+"""
+Streaming export of raw records and summaries.
+
+Rows are read from a server-side cursor with fetchmany and encoded one
+batch at a time, so an export of the full history holds a single batch in
+memory rather than a list of every row. Block-stored samples are decoded
+one chunk at a time by timeseries.read_samples.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+from . import database, timeseries
+
+
+# Rows fetched and encoded per chunk
+BATCH_SIZE = 5000
+
+RECORD_FIELDS = ("type", "value", "unit", "start_date", "end_date", "source_name", "device")
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def _batched(rows: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_record_batches(
+    record_type: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    source_name: Optional[str] = None,
+    batch_size: int = BATCH_SIZE
+) -> Iterator[list]:
+    """Yield batches of raw record tuples in RECORD_FIELDS order.
+
+    Rows still in health_records come first, then block-stored samples
+    type by type. Dates bound the UTC date of the record start (end
+    inclusive), the same day DATE() gives the summaries.
+    """
+    # Stored start dates keep their own UTC offset, which is under a day
+    # either way, so the index range is widened by a day on each side and
+    # rows dated on or beyond the boundary days are checked in UTC below
+    conditions = []
+    params = []
+    if record_type is not None:
+        conditions.append("type = ?")
+        params.append(record_type)
+    if start_date is not None:
+        conditions.append("start_date >= ?")
+        params.append((start_date - timedelta(days=1)).isoformat())
+    if end_date is not None:
+        conditions.append("start_date < ?")
+        params.append((end_date + timedelta(days=2)).isoformat())
+    if source_name is not None:
+        conditions.append("source_name = ?")
+        params.append(source_name)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(RECORD_FIELDS)} FROM health_records {where}", params)
+        while rows := cursor.fetchmany(batch_size):
+            batch = [tuple(row) for row in rows if _in_utc_range(row[3], start_date, end_date)]
+            if batch:
+                yield batch
+
+        if record_type is not None:
+            block_types = [record_type] if record_type in timeseries.BLOCK_TYPES else []
+        else:
+            block_types = [row[0] for row in conn.execute("SELECT DISTINCT type FROM sample_series ORDER BY type")]
+        start = datetime.combine(start_date, time.min, tzinfo=timezone.utc) if start_date else None
+        end = datetime.combine(end_date, time.max, tzinfo=timezone.utc) if end_date else None
+        for block_type in block_types:
+            yield from _batched(timeseries.read_samples(block_type, start, end, source_name, conn=conn), batch_size)
+
+
+def _in_utc_range(start: str, start_date: Optional[date], end_date: Optional[date]) -> bool:
+    """Whether a start date string falls on a UTC day within the (inclusive) bounds."""
+    if start_date is None and end_date is None:
+        return True
+    # Days strictly inside the bounds are inside in any offset; parse the rest
+    day = start[:10]
+    first = start_date.isoformat() if start_date else None
+    last = end_date.isoformat() if end_date else None
+    if (first is None or day > first) and (last is None or day < last):
+        return True
+    day = timeseries.utc_date(start)[:10]
+    return (first is None or day >= first) and (last is None or day <= last)
+
+
+def iter_summary_batches(
+    start_date: date,
+    end_date: date,
+    resolution: str = "day",
+    batch_size: int = BATCH_SIZE
+) -> Iterator[tuple]:
+    """Yield (fields, batch) pairs of summary rows at the given resolution."""
+    table, key, _ = database.RESOLUTIONS[resolution]
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM {table}
+            WHERE {key} >= ? AND {key} <= ?
+            ORDER BY {key}
+        """, database._period_bounds(resolution, start_date, end_date))
+        fields = tuple(column[0] for column in cursor.description)
+        while rows := cursor.fetchmany(batch_size):
+            yield fields, [tuple(row) for row in rows]
+
+
+def encode_ndjson(fields: tuple, batch: list) -> bytes:
+    """Encode a batch as newline-delimited JSON objects."""
+    encode = _json_encoder.encode
+    return "".join(encode(dict(zip(fields, row))) + "\n" for row in batch).encode()
+
+
+def encode_csv(batch: list, fields: Optional[tuple] = None) -> bytes:
+    """Encode a batch as CSV rows, preceded by a header row if `fields` is given."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fields is not None:
+        writer.writerow(fields)
+    writer.writerows(batch)
+    return buffer.getvalue().encode()
+
+
+def stream_records(fmt: str, **filters) -> Iterator[bytes]:
+    """Yield encoded chunks of raw records in "ndjson" or "csv" format."""
+    if fmt == "csv":
+        yield encode_csv([], RECORD_FIELDS)
+    for batch in iter_record_batches(**filters):
+        yield encode_csv(batch) if fmt == "csv" else encode_ndjson(RECORD_FIELDS, batch)
+
+
+def stream_summaries(fmt: str, start_date: date, end_date: date, resolution: str = "day") -> Iterator[bytes]:
+    """Yield encoded chunks of summary rows in "ndjson" or "csv" format."""
+    header = fmt == "csv"
+    for fields, batch in iter_summary_batches(start_date, end_date, resolution):
+        if fmt == "csv":
+            yield encode_csv(batch, fields if header else None)
+            header = False
+        else:
+            yield encode_ndjson(fields, batch)
@@ -0,0 +1,190 @@
+"""
+Goals and their streaks.
+
+A goal is a daily target for one metric, met on days whose value is at least
+(or at most) the target. The days a goal was met are kept run-length encoded
+in goal_streaks, one row per run of consecutive calendar days; a day without
+a value ends a run. goal_progress holds the totals derived from the runs, so
+reading a goal's current streak, longest streak and completion rate is a
+primary key lookup.
+
+Runs are updated at import time and when a goal is created or changed.
+The met days are re-encoded from the metric's daily values, read once per
+metric for all its goals, and compared with the stored runs; only rows from
+the first differing run on are rewritten. A reimport that adds days touches
+the last run and the ones after it, and one that changes earlier history
+rewrites from the run where it changed.
+"""
+
+import operator
+from datetime import date
+from typing import Optional
+
+from . import database
+
+
+COMPARISONS = {"at_least": operator.ge, "at_most": operator.le}
+
+_GOAL_FIELDS = """
+    g.id, g.metric, g.target, g.comparison, g.name, g.created_at,
+    IFNULL(p.tracked_days, 0) as tracked_days, IFNULL(p.met_days, 0) as met_days,
+    IFNULL(p.current_streak, 0) as current_streak, IFNULL(p.longest_streak, 0) as longest_streak,
+    p.longest_start, p.last_met, p.through
+"""
+
+
+def encode_runs(met_dates: list) -> list:
+    """Run-length encode sorted ISO dates into (start, end, days) runs of consecutive days."""
+    runs = []
+    previous = None
+    for day in met_dates:
+        ordinal = date.fromisoformat(day).toordinal()
+        if previous is not None and ordinal == previous + 1:
+            start, _, days = runs[-1]
+            runs[-1] = (start, day, days + 1)
+        else:
+            runs.append((day, day, 1))
+        previous = ordinal
+    return runs
+
+
+def read_series(cursor, metric: str) -> list:
+    """Get a metric's (date, value) days with a value from daily_summary, in date order."""
+    column = database.METRIC_COLUMNS[metric]
+    cursor.execute(f"SELECT date, {column} FROM daily_summary WHERE {column} IS NOT NULL ORDER BY date")
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def update_goal(cursor, goal_id: int, metric: str, target: float, comparison: str, series: Optional[list] = None):
+    """Bring one goal's runs and progress up to date with daily_summary.
+
+    series is the metric's days as returned by read_series, so goals on the
+    same metric can share one read.
+    """
+    if series is None:
+        series = read_series(cursor, metric)
+    met = COMPARISONS[comparison]
+    runs = encode_runs([day for day, value in series if met(value, target)])
+    cursor.execute(
+        "SELECT start_date, end_date, days FROM goal_streaks WHERE goal_id = ? ORDER BY start_date", (goal_id,)
+    )
+    stored = [tuple(row) for row in cursor.fetchall()]
+
+    # Keep the runs both encodings share and rewrite from the first difference
+    same = 0
+    while same < min(len(runs), len(stored)) and runs[same] == stored[same]:
+        same += 1
+    if same < len(stored):
+        cursor.execute(
+            "DELETE FROM goal_streaks WHERE goal_id = ? AND start_date >= ?", (goal_id, stored[same][0])
+        )
+    cursor.executemany(
+        "INSERT INTO goal_streaks (goal_id, start_date, end_date, days) VALUES (?, ?, ?, ?)",
+        [(goal_id, *run) for run in runs[same:]]
+    )
+
+    through = series[-1][0] if series else None
+    longest = max(runs, key=lambda run: run[2], default=None)
+    # The current streak is the run reaching the metric's latest day with a
+    # value, so days imported with only other metrics do not end it
+    current = runs[-1][2] if runs and runs[-1][1] == through else 0
+    cursor.execute("""
+        INSERT OR REPLACE INTO goal_progress
+            (goal_id, tracked_days, met_days, current_streak, longest_streak, longest_start, last_met, through)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        goal_id, len(series), sum(run[2] for run in runs), current,
+        longest[2] if longest else 0, longest[0] if longest else None,
+        runs[-1][1] if runs else None, through,
+    ))
+
+
+def update_goals(cursor):
+    """Update every goal's runs and progress, reading each metric once."""
+    cursor.execute("SELECT id, metric, target, comparison FROM goals ORDER BY metric")
+    series = {}
+    for goal_id, metric, target, comparison in cursor.fetchall():
+        if metric not in series:
+            series[metric] = read_series(cursor, metric)
+        update_goal(cursor, goal_id, metric, target, comparison, series[metric])
+
+
+def update_all_goals():
+    """Update every goal's streaks; runs after the daily summaries are built."""
+    with database.get_connection() as conn:
+        update_goals(conn.cursor())
+        conn.commit()
+
+
+def _with_rate(goal: Optional[dict]) -> Optional[dict]:
+    if goal is not None:
+        goal["completion_rate"] = round(goal["met_days"] / goal["tracked_days"], 4) if goal["tracked_days"] else None
+    return goal
+
+
+def list_goals() -> list:
+    """Get every goal with its progress."""
+    with database.get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {_GOAL_FIELDS} FROM goals g LEFT JOIN goal_progress p ON p.goal_id = g.id ORDER BY g.id")
+        goals = database.fetch_dicts(cursor)
+    return [_with_rate(goal) for goal in goals]
+
+
+def get_goal(goal_id: int) -> Optional[dict]:
+    """Get one goal with its progress."""
+    with database.get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {_GOAL_FIELDS} FROM goals g LEFT JOIN goal_progress p ON p.goal_id = g.id WHERE g.id = ?", (goal_id,))
+        goals = database.fetch_dicts(cursor)
+    return _with_rate(goals[0]) if goals else None
+
+
+def save_goal(metric: str, target: float, comparison: str, name: Optional[str], goal_id: Optional[int] = None) -> int:
+    """Create a goal, or replace one when goal_id is given, and compute its streaks."""
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        if goal_id is None:
+            cursor.execute(
+                "INSERT INTO goals (metric, target, comparison, name) VALUES (?, ?, ?, ?)",
+                (metric, target, comparison, name)
+            )
+            goal_id = cursor.lastrowid
+        else:
+            cursor.execute(
+                "UPDATE goals SET metric = ?, target = ?, comparison = ?, name = ? WHERE id = ?",
+                (metric, target, comparison, name, goal_id)
+            )
+            # Runs of the old target share nothing with the new ones
+            cursor.execute("DELETE FROM goal_streaks WHERE goal_id = ?", (goal_id,))
+        update_goal(cursor, goal_id, metric, target, comparison)
+        conn.commit()
+    return goal_id
+
+
+def delete_goal(goal_id: int) -> bool:
+    """Delete a goal with its streaks; False if it did not exist."""
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
+        deleted = cursor.rowcount > 0
+        cursor.execute("DELETE FROM goal_streaks WHERE goal_id = ?", (goal_id,))
+        cursor.execute("DELETE FROM goal_progress WHERE goal_id = ?", (goal_id,))
+        conn.commit()
+    return deleted
+
+
+def get_streaks(goal_id: int, limit: int = 10, order: str = "longest") -> list:
+    """Get a goal's runs of met days, longest or most recent first."""
+    order_by = "days DESC, start_date DESC" if order == "longest" else "start_date DESC"
+    with database.get_connection() as conn:
+        conn.row_factory = None
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT start_date, end_date, days FROM goal_streaks
+            WHERE goal_id = ? ORDER BY {order_by} LIMIT ?
+        """, (goal_id, limit))
+        streaks = database.fetch_dicts(cursor)
+    return streaks
@@ -0,0 +1,84 @@
+"""
+Calendar heatmaps built at import time.
+
+For every metric and year, the quartiles of that year's daily values become
+the thresholds of four colour buckets, and each day of the year gets a bucket
+index: 0 for no value, 1-4 from the lowest quarter to the highest. The
+indices are stored as one digit per day, so a year of one metric is a single
+row and a heatmap request reads a few small rows instead of shipping daily
+values for the browser to bucket.
+"""
+
+import json
+import statistics
+from bisect import bisect_right
+from datetime import date
+from typing import Optional
+
+from . import database
+
+
+# Colour buckets for days with a value; bucket 0 is a day without one
+BUCKETS = 4
+
+
+def thresholds(values: list, buckets: int = BUCKETS) -> list:
+    """Quantile cut points splitting `values` into `buckets` equal shares."""
+    if len(values) < 2:
+        return values * (buckets - 1)
+    return statistics.quantiles(values, n=buckets, method="inclusive")
+
+
+def encode_year(year: int, values: dict, cuts: list) -> str:
+    """One bucket digit per day of `year` from a date -> value map."""
+    first = date(year, 1, 1).toordinal()
+    digits = []
+    for ordinal in range(first, date(year, 12, 31).toordinal() + 1):
+        value = values.get(date.fromordinal(ordinal).isoformat())
+        digits.append("0" if value is None else str(bisect_right(cuts, value) + 1))
+    return "".join(digits)
+
+
+def build_heatmaps(cursor):
+    """Rebuild the heatmap rows of every metric and year from daily_summary."""
+    cursor.execute("DELETE FROM heatmaps")
+    rows = []
+    for metric, column in database.METRIC_COLUMNS.items():
+        cursor.execute(f"SELECT date, {column} FROM daily_summary WHERE {column} IS NOT NULL ORDER BY date")
+        years = {}
+        for day, value in cursor.fetchall():
+            years.setdefault(int(day[:4]), {})[day] = value
+        for year, values in years.items():
+            cuts = thresholds(sorted(values.values()))
+            rows.append((metric, year, json.dumps(cuts), len(values), encode_year(year, values, cuts)))
+    cursor.executemany(
+        "INSERT INTO heatmaps (metric, year, thresholds, days, buckets) VALUES (?, ?, ?, ?, ?)", rows
+    )
+
+
+def compute_heatmaps():
+    """Rebuild all heatmaps; runs after the daily summaries are built."""
+    with database.get_connection() as conn:
+        build_heatmaps(conn.cursor())
+        conn.commit()
+
+
+def get_heatmaps(metric: str, year: Optional[int] = None) -> list:
+    """Get a metric's heatmap for one year, or for every year, oldest first."""
+    query = "SELECT year, thresholds, days, buckets FROM heatmaps WHERE metric = ?"
+    params = [metric]
+    if year is not None:
+        query += " AND year = ?"
+        params.append(year)
+    with database.get_connection() as conn:
+        rows = conn.execute(query + " ORDER BY year", params).fetchall()
+    return [
+        {
+            "year": year,
+            "start": f"{year}-01-01",
+            "thresholds": json.loads(cuts),
+            "days": days,
+            "buckets": [int(digit) for digit in buckets],
+        }
+        for year, cuts, days, buckets in rows
+    ]
@@ -1,15 +1,28 @@
+import asyncio
+import threading
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import health, insights, upload
-from . import database
+from .routers import admin, dashboard, export, goals, health, insights, upload
+from .routers import profiles as profiles_router
+from . import cache, database, maintenance, metrics, migrations, profiles, querylog, startup
 
 app = FastAPI(
     title="Personal Health Dashboard",
     description="Local API for Apple Health data visualization",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
+# Cache GET responses per import generation. Added before CORS so CORS
+# headers are computed per request rather than stored in the cache.
+app.add_middleware(cache.ResponseCacheMiddleware)
+
+# Selects the profile database; outside the cache so its key sees the profile
+app.add_middleware(profiles.ProfileMiddleware)
+
 # CORS for local development
 app.add_middleware(
     CORSMiddleware,
@@ -19,16 +32,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(startup.FirstRequestMiddleware)
+
+# Explains data queries when strict query plans are enabled
+app.add_middleware(querylog.PlanGuardMiddleware)
+
+# Outermost, so latency includes cache hits and the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(health.router)
 app.include_router(insights.router)
 app.include_router(upload.router)
+app.include_router(dashboard.router)
+app.include_router(admin.router)
+app.include_router(export.router)
+app.include_router(goals.router)
+app.include_router(profiles_router.router)
+
+
+startup.mark("imported")
 
 
 @app.on_event("startup")
-async def startup():
+async def on_startup():
     """Initialize database on startup."""
-    database.init_database()
+    with startup.phase("init_database"):
+        database.init_database()
+
+    # Data backfills from schema upgrades run in small batches in the
+    # background so the API can serve requests meanwhile
+    with startup.phase("check_backfills"):
+        if migrations.pending_backfills():
+            threading.Thread(target=migrations.run_backfills, kwargs={"pause": 0.05}, daemon=True).start()
+
+    asyncio.get_running_loop().create_task(maintenance.maintenance_loop())
+
+    startup.mark("ready")
+    startup.uninstall()
 
 
 @app.get("/")
@@ -37,6 +78,12 @@ async def root():
     return {"status": "ok", "service": "Personal Health Dashboard API"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request latency, SQL timing and import stage metrics in Prometheus text format."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/overview")
 async def get_overview():
     """Get a quick overview of the data."""
@@ -0,0 +1,125 @@
+"""
+Database maintenance.
+
+Keeps planner statistics fresh and returns freed pages to the filesystem.
+ANALYZE runs after every import so the planner can pick between
+idx_health_type and idx_health_type_date, and incremental vacuum reclaims
+the pages left behind by compaction and clearing data. Storage statistics
+come from the dbstat virtual table.
+"""
+
+import asyncio
+
+from . import database, profiles
+
+
+# Seconds between scheduled maintenance runs
+MAINTENANCE_INTERVAL = 6 * 60 * 60
+
+# Maximum free pages reclaimed per incremental vacuum run
+VACUUM_PAGES = 10000
+
+
+def optimize_database():
+    """Refresh planner statistics."""
+    with database.get_connection() as conn:
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+
+
+def incremental_vacuum(pages: int = VACUUM_PAGES) -> int:
+    """Release up to `pages` free pages and return how many were released."""
+    with database.get_connection() as conn:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # execute() steps the pragma only once, freeing a single page;
+        # executescript() runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return before - after
+
+
+def run_maintenance() -> dict:
+    """Run the scheduled maintenance tasks."""
+    optimize_database()
+    return {"analyzed": True, "pages_released": incremental_vacuum()}
+
+
+def check_integrity(full: bool = False) -> list:
+    """Run quick_check (or the slower integrity_check) and return its messages."""
+    with database.get_connection() as conn:
+        pragma = "integrity_check" if full else "quick_check"
+        rows = conn.execute(f"PRAGMA {pragma}").fetchall()
+    return [row[0] for row in rows]
+
+
+def get_storage_stats() -> dict:
+    """Get file size, free space and per-table row counts and sizes."""
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        freelist = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+        journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+
+        cursor.execute("SELECT name, tbl_name, type FROM sqlite_master WHERE type IN ('table', 'index')")
+        objects = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+        # Rows are the cells on a table b-tree's leaf pages, so the counts come
+        # from the same dbstat pass as the sizes instead of a COUNT(*) per table
+        cursor.execute("""
+            SELECT name, SUM(pgsize), SUM(unused), COUNT(*),
+                   IFNULL(SUM(CASE WHEN pagetype = 'leaf' THEN ncell END), 0)
+            FROM dbstat GROUP BY name
+        """)
+        sizes = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        tables = {}
+        for name, (table, kind) in sorted(objects.items()):
+            if kind != "table":
+                continue
+            size, unused, pages, rows = sizes.get(name, (0, 0, 0, 0))
+            tables[name] = {
+                "name": name,
+                "rows": rows,
+                "bytes": size,
+                "unused_bytes": unused,
+                "pages": pages,
+                "indexes": [],
+                "index_bytes": 0,
+            }
+
+        for name, (table, kind) in sorted(objects.items()):
+            if kind != "index" or table not in tables:
+                continue
+            size = sizes.get(name, (0, 0, 0, 0))[0]
+            tables[table]["indexes"].append({"name": name, "bytes": size})
+            tables[table]["index_bytes"] += size
+
+    return {
+        "file_bytes": page_size * page_count,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_pages": freelist,
+        "free_bytes": page_size * freelist,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(auto_vacuum, auto_vacuum),
+        "journal_mode": journal_mode,
+        "tables": sorted(tables.values(), key=lambda t: t["bytes"] + t["index_bytes"], reverse=True),
+    }
+
+
+async def maintenance_loop(interval: float = MAINTENANCE_INTERVAL):
+    """Run maintenance periodically on every profile's database, skipping
+    those with an import in progress."""
+    while True:
+        await asyncio.sleep(interval)
+        for name in profiles.list_profiles():
+            await asyncio.to_thread(profiles.ensure_ready, name)
+            with profiles.use_profile(name):
+                # to_thread copies the context, so these run against the profile's database
+                status = await asyncio.to_thread(database.get_import_status)
+                if status.get("status") in ("parsing", "computing"):
+                    continue
+                await asyncio.to_thread(run_maintenance)
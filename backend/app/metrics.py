@@ -0,0 +1,309 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Three sources feed the registry:
+
+- ASGI middleware timing each request per route template and status
+- an instrumented sqlite3 connection (used by database.get_connection)
+  timing every statement and counting the rows it returned or changed
+- stage timers around the import pipeline
+
+Statements are labelled by their verb and first table ("SELECT
+daily_summary") to keep label cardinality bounded. /metrics renders the
+registry for a local Prometheus to scrape.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from . import querylog
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+IMPORT_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple = ()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, labels: tuple, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, labels: tuple) -> int:
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[2] if entry else 0
+
+    def samples(self) -> list:
+        lines = []
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append((f"{self.name}_bucket", _format_labels(self.labelnames, labels, le), cumulative))
+                lines.append((f"{self.name}_sum", _format_labels(self.labelnames, labels), total))
+                lines.append((f"{self.name}_count", _format_labels(self.labelnames, labels), count))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+))
+QUERY_SECONDS = registry.register(Histogram(
+    "sqlite_statement_duration_seconds", "Time to execute a statement (up to its first row).", ("statement",)
+))
+FETCH_SECONDS = registry.register(Counter(
+    "sqlite_fetch_seconds_total", "Time spent fetching result rows.", ("statement",)
+))
+QUERY_ROWS = registry.register(Counter(
+    "sqlite_rows_total", "Rows returned by queries or changed by DML.", ("statement",)
+))
+IMPORT_STAGE_SECONDS = registry.register(Histogram(
+    "import_stage_duration_seconds", "Duration of each import pipeline stage.", ("stage",), IMPORT_BUCKETS
+))
+IMPORT_LAST_STAGE_SECONDS = registry.register(Gauge(
+    "import_last_stage_duration_seconds", "Duration of each stage in the most recent import.", ("stage",)
+))
+
+
+_STATEMENT = re.compile(
+    r"^\s*(?:WITH\b.*?\)\s*)?(SELECT|INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER|PRAGMA|ANALYZE|BEGIN|VACUUM)\b"
+    r"(?:.*?\b(?:FROM|INTO|UPDATE|TABLE|INDEX)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?[\"']?(\w+))?",
+    re.IGNORECASE | re.DOTALL,
+)
+_UPDATE_TABLE = re.compile(r"UPDATE\s+(?:OR\s+\w+\s+)?[\"']?(\w+)", re.IGNORECASE)
+_labels = {}
+
+
+def statement_label(sql: str) -> str:
+    """Reduce a statement to "VERB table" for use as a label."""
+    label = _labels.get(sql)
+    if label is None:
+        match = _STATEMENT.match(sql)
+        if match is None:
+            label = "OTHER"
+        else:
+            verb = match.group(1).upper()
+            table = match.group(2)
+            if verb == "UPDATE":
+                update = _UPDATE_TABLE.search(sql, match.start(1))
+                table = update.group(1) if update else None
+            label = f"{verb} {table}" if table and verb != "PRAGMA" else verb
+        # Statements are built from a fixed set of templates, so this stays small
+        if len(_labels) < 10000:
+            _labels[sql] = label
+    return label
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor recording statement time, fetch time and row counts."""
+
+    _label = None
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters, True)
+
+    def _timed(self, method, sql, parameters, many):
+        self._label = (statement_label(sql),)
+        began = time.perf_counter()
+        try:
+            return method(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - began
+            QUERY_SECONDS.observe(self._label, elapsed)
+            if self.rowcount > 0:
+                QUERY_ROWS.inc(self._label, self.rowcount)
+            querylog.observe(self.connection, sql, parameters, elapsed, many)
+
+    def _fetched(self, began: float, rows: int):
+        if self._label is not None:
+            FETCH_SECONDS.inc(self._label, time.perf_counter() - began)
+            if rows:
+                QUERY_ROWS.inc(self._label, rows)
+
+    def fetchone(self):
+        began = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(began, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        began = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(began, len(rows))
+        return rows
+
+    def fetchall(self):
+        began = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(began, len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        if self._label is not None:
+            QUERY_ROWS.inc(self._label)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including execute shortcuts) are instrumented."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class StageTimer:
+    """Times consecutive stages; starting a stage ends the previous one."""
+
+    def __init__(self):
+        self._stage: Optional[str] = None
+        self._began = 0.0
+
+    def begin(self, stage: str):
+        self.end()
+        self._stage = stage
+        self._began = time.perf_counter()
+
+    def end(self):
+        if self._stage is None:
+            return
+        elapsed = time.perf_counter() - self._began
+        IMPORT_STAGE_SECONDS.observe((self._stage,), elapsed)
+        IMPORT_LAST_STAGE_SECONDS.set((self._stage,), elapsed)
+        self._stage = None
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        began = time.perf_counter()
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            # The router stores the matched route in the scope; using its
+            # template keeps path parameters out of the labels
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe((scope["method"], template, str(status)), time.perf_counter() - began)
@@ -0,0 +1,669 @@
+"""
+Schema versioning and online migrations.
+
+The schema version lives in PRAGMA user_version. Each migration step brings
+the schema from version N-1 to N inside its own transaction, so an existing
+database is upgraded in place instead of requiring a reimport. Tables are
+created from their current definitions in TABLES, which clearing the data
+also uses to recreate the tables it drops.
+
+Steps that need to populate data queue a backfill. Backfills walk the
+source table in id batches, each batch committed together with its progress
+row in backfill_progress, so they resume where they stopped after a restart
+and only ever hold the write lock for one short batch. Derived tables that
+can only be rebuilt as a whole queue a one-shot rebuild instead, which runs
+in a single transaction once the batched backfills are done. The database
+runs in WAL mode so readers are not blocked while a batch commits.
+"""
+
+import time
+
+from . import database, goals, heatmaps, timeseries
+
+
+def _rollup_table(table: str) -> str:
+    # Coarse rollups hold the mean of the daily values in each period,
+    # keyed by the first day of the period
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            period DATE PRIMARY KEY,
+            days INTEGER,
+            steps REAL,
+            active_calories REAL,
+            resting_heart_rate REAL,
+            weight REAL,
+            sleep_hours REAL,
+            workout_minutes REAL,
+            distance_km REAL,
+            flights_climbed REAL,
+            blood_pressure_systolic REAL,
+            blood_pressure_diastolic REAL,
+            caffeine_mg REAL,
+            water_ml REAL
+        )
+    """
+
+
+# Table -> statements creating it at its current definition, indexes included
+TABLES = {
+    "health_records": (
+        """
+        CREATE TABLE IF NOT EXISTS health_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            value REAL,
+            unit TEXT,
+            start_date DATETIME,
+            end_date DATETIME,
+            source_name TEXT,
+            device TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_health_type ON health_records(type)",
+        "CREATE INDEX IF NOT EXISTS idx_health_start_date ON health_records(start_date)",
+        "CREATE INDEX IF NOT EXISTS idx_health_type_date ON health_records(type, start_date)",
+    ),
+    "workouts": (
+        """
+        CREATE TABLE IF NOT EXISTS workouts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            workout_type TEXT,
+            duration_minutes REAL,
+            total_distance REAL,
+            total_energy_burned REAL,
+            start_date DATETIME,
+            end_date DATETIME,
+            source_name TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_workouts_start_date ON workouts(start_date)",
+    ),
+    "sleep_records": (
+        """
+        CREATE TABLE IF NOT EXISTS sleep_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sleep_type TEXT,
+            start_date DATETIME,
+            end_date DATETIME,
+            source_name TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sleep_start_date ON sleep_records(start_date)",
+    ),
+    # Daily summary table (pre-aggregated for fast queries)
+    "daily_summary": (
+        """
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            date DATE PRIMARY KEY,
+            steps INTEGER,
+            active_calories REAL,
+            resting_heart_rate REAL,
+            weight REAL,
+            sleep_hours REAL,
+            workout_minutes REAL,
+            distance_km REAL,
+            flights_climbed INTEGER,
+            blood_pressure_systolic REAL,
+            blood_pressure_diastolic REAL,
+            caffeine_mg REAL,
+            water_ml REAL
+        )
+        """,
+    ),
+    "import_status": (
+        """
+        CREATE TABLE IF NOT EXISTS import_status (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            status TEXT DEFAULT 'idle',
+            progress REAL DEFAULT 0,
+            records_imported INTEGER DEFAULT 0,
+            last_import DATETIME,
+            error_message TEXT
+        )
+        """,
+    ),
+    # Units table - stores detected units from import
+    "units": (
+        """
+        CREATE TABLE IF NOT EXISTS units (
+            metric TEXT PRIMARY KEY,
+            unit TEXT NOT NULL
+        )
+        """,
+    ),
+    # heart_rate_samples is the sample count behind heart_rate, so partial
+    # hours can be merged
+    "hourly_summary": (
+        """
+        CREATE TABLE IF NOT EXISTS hourly_summary (
+            period TEXT PRIMARY KEY,
+            steps INTEGER,
+            active_calories REAL,
+            heart_rate REAL,
+            flights_climbed INTEGER,
+            caffeine_mg REAL,
+            water_ml REAL,
+            heart_rate_samples INTEGER
+        )
+        """,
+    ),
+    "weekly_summary": (_rollup_table("weekly_summary"),),
+    "monthly_summary": (_rollup_table("monthly_summary"),),
+    "yearly_summary": (_rollup_table("yearly_summary"),),
+    # Keyed by minutes since the Unix epoch
+    "heart_rate_minutes": (
+        """
+        CREATE TABLE IF NOT EXISTS heart_rate_minutes (
+            minute INTEGER PRIMARY KEY,
+            min_bpm REAL,
+            max_bpm REAL,
+            sum_bpm REAL,
+            samples INTEGER
+        )
+        """,
+    ),
+    "sample_series": (
+        """
+        CREATE TABLE IF NOT EXISTS sample_series (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            unit TEXT,
+            source_name TEXT,
+            device TEXT
+        )
+        """,
+    ),
+    "sample_blocks": (
+        """
+        CREATE TABLE IF NOT EXISTS sample_blocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            series_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            chunk_start INTEGER NOT NULL,
+            first_ts INTEGER,
+            last_ts INTEGER,
+            samples INTEGER,
+            data BLOB
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_blocks_type_start ON sample_blocks(type, chunk_start)",
+    ),
+    # source_name is '' rather than NULL so it can be part of the key
+    "record_catalog": (
+        """
+        CREATE TABLE IF NOT EXISTS record_catalog (
+            type TEXT NOT NULL,
+            source_name TEXT NOT NULL DEFAULT '',
+            unit TEXT,
+            records INTEGER NOT NULL,
+            first_date DATETIME,
+            last_date DATETIME,
+            PRIMARY KEY (type, source_name)
+        )
+        """,
+    ),
+    "anomaly_scores": (
+        """
+        CREATE TABLE IF NOT EXISTS anomaly_scores (
+            metric TEXT NOT NULL,
+            date DATE NOT NULL,
+            value REAL NOT NULL,
+            baseline REAL,
+            spread REAL,
+            score REAL,
+            PRIMARY KEY (metric, date)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_anomaly_scores_date ON anomaly_scores(date)",
+    ),
+    # Keyed by minutes since the Unix epoch, like heart_rate_minutes
+    "heart_rate_spikes": (
+        """
+        CREATE TABLE IF NOT EXISTS heart_rate_spikes (
+            minute INTEGER PRIMARY KEY,
+            date DATE NOT NULL,
+            bpm REAL,
+            max_bpm REAL,
+            baseline REAL,
+            spread REAL,
+            score REAL,
+            duration_minutes INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_heart_rate_spikes_date ON heart_rate_spikes(date)",
+    ),
+    # Per-day fingerprint and baseline of the scored heart rate minutes
+    "heart_rate_days": (
+        """
+        CREATE TABLE IF NOT EXISTS heart_rate_days (
+            day INTEGER PRIMARY KEY,
+            minutes INTEGER,
+            samples INTEGER,
+            sum_bpm REAL,
+            median REAL,
+            mad REAL
+        )
+        """,
+    ),
+    "goals": (
+        """
+        CREATE TABLE IF NOT EXISTS goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            metric TEXT NOT NULL,
+            target REAL NOT NULL,
+            comparison TEXT NOT NULL DEFAULT 'at_least',
+            name TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ),
+    # One row per run of consecutive days meeting a goal
+    "goal_streaks": (
+        """
+        CREATE TABLE IF NOT EXISTS goal_streaks (
+            goal_id INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            days INTEGER NOT NULL,
+            PRIMARY KEY (goal_id, start_date)
+        )
+        """,
+    ),
+    "goal_progress": (
+        """
+        CREATE TABLE IF NOT EXISTS goal_progress (
+            goal_id INTEGER PRIMARY KEY,
+            tracked_days INTEGER NOT NULL,
+            met_days INTEGER NOT NULL,
+            current_streak INTEGER NOT NULL,
+            longest_streak INTEGER NOT NULL,
+            longest_start DATE,
+            last_met DATE,
+            through DATE
+        )
+        """,
+    ),
+    # buckets holds one digit per day of the year
+    "heatmaps": (
+        """
+        CREATE TABLE IF NOT EXISTS heatmaps (
+            metric TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            thresholds TEXT NOT NULL,
+            days INTEGER NOT NULL,
+            buckets TEXT NOT NULL,
+            PRIMARY KEY (metric, year)
+        )
+        """,
+    ),
+    # date is the UTC date of the wake time; stage columns are minutes
+    "sleep_sessions": (
+        """
+        CREATE TABLE IF NOT EXISTS sleep_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL,
+            bedtime DATETIME NOT NULL,
+            wake_time DATETIME NOT NULL,
+            asleep_minutes REAL NOT NULL,
+            core_minutes REAL,
+            deep_minutes REAL,
+            rem_minutes REAL,
+            unstaged_minutes REAL,
+            awake_minutes REAL,
+            session_minutes REAL,
+            efficiency REAL,
+            sources TEXT,
+            segments INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sleep_sessions_date ON sleep_sessions(date)",
+    ),
+}
+
+
+def create_tables(cursor, tables):
+    """Create tables that do not exist yet, with their indexes."""
+    for table in tables:
+        for statement in TABLES[table]:
+            cursor.execute(statement)
+
+
+def _table_exists(cursor, table: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cursor.fetchone() is not None
+
+
+def _add_column(cursor, table: str, column: str, definition: str):
+    """Add a column unless it already exists."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _register_backfill(cursor, name: str, source: str = "health_records"):
+    """Queue a backfill over the rows currently in `source`.
+
+    Rows inserted later come from a new import, which builds its own
+    aggregates, so the backfill stops at today's highest id.
+    """
+    cursor.execute(f"SELECT IFNULL(MAX(rowid), 0) FROM {source}")
+    max_id = cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT OR REPLACE INTO backfill_progress (name, last_id, max_id)
+        VALUES (?, 0, ?)
+    """, (name, max_id))
+
+
+def _register_rebuild(cursor, name: str, *sources: str):
+    """Queue a one-shot rebuild, if any of `sources` holds anything to rebuild from.
+
+    Its progress row goes from (0, 1) to (1, 1) when the rebuild commits.
+    """
+    pending = 0
+    for source in sources:
+        # MAX(rowid) is a single index lookup, where EXISTS plans as a scan
+        cursor.execute(f"SELECT IFNULL(MAX(rowid), 0) > 0 FROM {source}")
+        pending = pending or cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT OR REPLACE INTO backfill_progress (name, last_id, max_id)
+        VALUES (?, 0, ?)
+    """, (name, pending))
+
+
+def _baseline_schema(cursor):
+    """Version 1: tables present before schema versioning."""
+    create_tables(cursor, ("health_records", "workouts", "sleep_records", "daily_summary", "import_status", "units"))
+
+    cursor.execute("""
+        INSERT OR IGNORE INTO import_status (id, status, progress, records_imported)
+        VALUES (1, 'idle', 0, 0)
+    """)
+
+
+def _rollup_tables(cursor):
+    """Version 2: hourly, weekly, monthly and yearly rollups."""
+    backfill = not _table_exists(cursor, "hourly_summary")
+
+    create_tables(cursor, ("hourly_summary", "weekly_summary", "monthly_summary", "yearly_summary"))
+    _add_column(cursor, "hourly_summary", "heart_rate_samples", "INTEGER")
+
+    if backfill:
+        _register_backfill(cursor, "hourly_summary")
+        _register_rebuild(cursor, "period_rollups", "daily_summary")
+
+
+def _heart_rate_minutes(cursor):
+    """Version 3: per-minute heart rate aggregate."""
+    backfill = not _table_exists(cursor, "heart_rate_minutes")
+
+    create_tables(cursor, ("heart_rate_minutes",))
+
+    if backfill:
+        _register_backfill(cursor, "heart_rate_minutes")
+
+
+def _sample_blocks(cursor):
+    """Version 4: compressed block storage for high-frequency samples."""
+    backfill = not _table_exists(cursor, "sample_blocks")
+
+    create_tables(cursor, ("sample_series", "sample_blocks"))
+
+    # Compaction deletes the raw rows, so it must be queued after the
+    # backfills that aggregate them
+    if backfill:
+        _register_backfill(cursor, "compact_samples")
+
+
+def _import_generation(cursor):
+    """Version 5: counter bumped whenever imported data changes."""
+    _add_column(cursor, "import_status", "generation", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _record_catalog(cursor):
+    """Version 6: per type and source record counts, kept by the importer."""
+    backfill = not _table_exists(cursor, "record_catalog")
+
+    create_tables(cursor, ("record_catalog",))
+
+    if backfill:
+        _queue_catalog_backfill(cursor)
+
+
+def _queue_catalog_backfill(cursor):
+    # Rows left in health_records are counted in batches; block-stored
+    # samples are counted once, after compaction (which may still be
+    # pending for the raw rows) has finished
+    _register_backfill(cursor, "record_catalog")
+    _register_rebuild(cursor, "block_catalog", "sample_blocks", "health_records")
+
+
+def _anomalies(cursor):
+    """Version 7: persisted anomaly scores for daily metrics and heart rate."""
+    backfill = not _table_exists(cursor, "anomaly_scores")
+
+    create_tables(cursor, ("anomaly_scores", "heart_rate_spikes", "heart_rate_days"))
+
+    if backfill:
+        _register_rebuild(cursor, "anomalies", "daily_summary")
+
+
+def _goals(cursor):
+    """Version 8: goals with their streaks kept as runs of met days."""
+    create_tables(cursor, ("goals", "goal_streaks", "goal_progress"))
+
+
+def _heatmaps(cursor):
+    """Version 9: per metric and year heatmap buckets."""
+    backfill = not _table_exists(cursor, "heatmaps")
+
+    create_tables(cursor, ("heatmaps",))
+
+    if backfill:
+        _register_rebuild(cursor, "heatmaps", "daily_summary")
+
+
+def _sleep_sessions(cursor):
+    """Version 10: nightly sleep sessions merged from sleep segments."""
+    backfill = not _table_exists(cursor, "sleep_sessions")
+
+    create_tables(cursor, ("sleep_sessions",))
+
+    if backfill:
+        _register_rebuild(cursor, "sleep_sessions", "sleep_records")
+
+
+def _utc_catalog_dates(cursor):
+    """Version 11: record_catalog first/last dates in UTC, recounted from the data.
+
+    Earlier versions stored record dates with their own UTC offsets, which
+    MIN/MAX do not order chronologically.
+    """
+    cursor.execute("DELETE FROM record_catalog")
+    _queue_catalog_backfill(cursor)
+
+
+def _utc_sleep_dates(cursor):
+    """Version 12: sleep sessions dated by the UTC date of their wake time.
+
+    Version 10 dated them by the local wake date, unlike every other
+    daily_summary column, so the sessions and sleep_hours are rebuilt.
+    """
+    _register_rebuild(cursor, "sleep_sessions", "sleep_records")
+
+
+def _sleep_session_minutes(cursor):
+    """Version 13: sleep_sessions.in_bed_minutes renamed to session_minutes.
+
+    The column holds the span from a session's first segment to wake, not
+    time in the in-bed stage.
+    """
+    cursor.execute("PRAGMA table_info(sleep_sessions)")
+    if "in_bed_minutes" in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE sleep_sessions RENAME COLUMN in_bed_minutes TO session_minutes")
+
+
+# Ordered migration steps; a step's position + 1 is the version it produces
+MIGRATIONS = [
+    _baseline_schema,
+    _rollup_tables,
+    _heart_rate_minutes,
+    _sample_blocks,
+    _import_generation,
+    _record_catalog,
+    _anomalies,
+    _goals,
+    _heatmaps,
+    _sleep_sessions,
+    _utc_catalog_dates,
+    _utc_sleep_dates,
+    _sleep_session_minutes,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _backfill_record_catalog(conn, min_id: int, max_id: int):
+    cursor = conn.cursor()
+    # Grouped by UTC offset suffix too: within one offset the date strings
+    # order chronologically, and merge_catalog keeps the UTC extremes
+    cursor.execute("""
+        SELECT type, IFNULL(source_name, ''), MIN(unit), COUNT(*), MIN(start_date), MAX(start_date)
+        FROM health_records WHERE id > ? AND id <= ?
+        GROUP BY type, IFNULL(source_name, ''), SUBSTR(start_date, -6)
+    """, (min_id, max_id))
+    database.merge_catalog(cursor, [
+        (record_type, source, unit, count, timeseries.utc_date(first), timeseries.utc_date(last))
+        for record_type, source, unit, count, first, last in cursor.fetchall()
+    ])
+
+
+def _rebuild_block_catalog(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT s.type, IFNULL(s.source_name, ''), MIN(s.unit), SUM(b.samples), MIN(b.first_ts), MAX(b.last_ts)
+        FROM sample_blocks b JOIN sample_series s ON s.id = b.series_id
+        GROUP BY s.type, IFNULL(s.source_name, '')
+    """)
+    database.merge_catalog(cursor, [
+        (record_type, source, unit, count, timeseries.format_timestamp(first), timeseries.format_timestamp(last))
+        for record_type, source, unit, count, first, last in cursor.fetchall()
+    ])
+
+
+def _rebuild_sleep_sessions(conn):
+    cursor = conn.cursor()
+    database.apply_sleep_sessions(cursor)
+    # sleep_hours moved to wake dates, so refresh what is derived from it
+    database.aggregate_period_rollups(cursor)
+    goals.update_goals(cursor)
+    heatmaps.build_heatmaps(cursor)
+    from . import anomalies
+    anomalies.score_daily(cursor)
+
+
+def _rebuild_anomalies(conn):
+    # NumPy is only loaded when there is something to score
+    from . import anomalies
+    cursor = conn.cursor()
+    anomalies.score_daily(cursor)
+    anomalies.score_heart_rate(cursor)
+
+
+# Backfill name -> batch function(conn, min_id, max_id) covering rowids in
+# (min_id, max_id], in the order they must run
+BACKFILLS = {
+    "hourly_summary": lambda conn, lo, hi: database.aggregate_hourly_summary(conn.cursor(), lo, hi),
+    "heart_rate_minutes": lambda conn, lo, hi: database.aggregate_heart_rate_minutes(conn.cursor(), lo, hi),
+    "compact_samples": lambda conn, lo, hi: timeseries.compact_range(conn, lo, hi),
+    "record_catalog": _backfill_record_catalog,
+}
+
+# Rebuild name -> function(conn) rebuilding derived tables as a whole. They
+# run after every batched backfill, in this order, since they read what the
+# backfills build (block_catalog needs compaction to have finished).
+REBUILDS = {
+    "period_rollups": lambda conn: database.aggregate_period_rollups(conn.cursor()),
+    "block_catalog": _rebuild_block_catalog,
+    "sleep_sessions": _rebuild_sleep_sessions,
+    "anomalies": _rebuild_anomalies,
+    "heatmaps": lambda conn: heatmaps.build_heatmaps(conn.cursor()),
+}
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """Apply pending migration steps and return the resulting version."""
+    # Nothing to do for a current database; journal_mode and auto_vacuum
+    # are stored in the file, so they need no re-applying either
+    if get_schema_version(conn) == SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    # Incremental auto-vacuum only takes effect before the first table is
+    # created (or after a VACUUM), so set it while the database is empty
+    if get_schema_version(conn) == 0:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    # WAL lets readers proceed while migrations and backfills write
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            max_id INTEGER NOT NULL
+        )
+    """)
+    conn.commit()
+
+    version = get_schema_version(conn)
+    for target, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        # sqlite3 only opens transactions implicitly for DML, so begin one
+        # explicitly to make the DDL in each step atomic
+        cursor.execute("BEGIN")
+        step(cursor)
+        # PRAGMA values cannot be bound as parameters
+        cursor.execute(f"PRAGMA user_version = {int(target)}")
+        conn.commit()
+        version = target
+    return version
+
+
+def pending_backfills() -> list:
+    """Get (name, last_id, max_id) for backfills and rebuilds that have not finished, in run order."""
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, last_id, max_id FROM backfill_progress WHERE last_id < max_id")
+        rows = [tuple(row) for row in cursor.fetchall()]
+    order = list(BACKFILLS) + list(REBUILDS)
+    return sorted(rows, key=lambda row: order.index(row[0]))
+
+
+def run_backfills(batch_size: int = 50000, pause: float = 0.0):
+    """Run pending backfills, one batch per transaction, then pending rebuilds."""
+    pending = pending_backfills()
+    for name, last_id, max_id in pending:
+        if name in REBUILDS:
+            with database.get_connection() as conn:
+                REBUILDS[name](conn)
+                conn.execute("UPDATE backfill_progress SET last_id = max_id WHERE name = ?", (name,))
+                conn.commit()
+            continue
+
+        batch = BACKFILLS[name]
+        while last_id < max_id:
+            upper = min(last_id + batch_size, max_id)
+            with database.get_connection() as conn:
+                batch(conn, last_id, upper)
+                conn.execute("UPDATE backfill_progress SET last_id = ? WHERE name = ?", (upper, name))
+                conn.commit()
+            last_id = upper
+            if pause:
+                time.sleep(pause)
+
+    # Derived tables changed, so responses cached for this data are stale
+    if pending:
+        database.bump_import_generation()
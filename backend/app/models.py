@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, date
 from typing import Optional
 
@@ -67,6 +67,8 @@ class CorrelationInsight(BaseModel):
     metric2: str
     correlation: float
     description: str
+    p_value: Optional[float] = None
+    samples: Optional[int] = None
 
 
 class PersonalRecord(BaseModel):
@@ -82,3 +84,20 @@ class ImportStatus(BaseModel):
     records_imported: int
     last_import: Optional[datetime]
     error_message: Optional[str]
+
+
+class DashboardWidget(BaseModel):
+    id: str
+    type: str  # "summary", "range", "metric", "trends", ...
+    params: dict = {}
+
+
+class DashboardRequest(BaseModel):
+    widgets: list[DashboardWidget]
+
+
+class GoalRequest(BaseModel):
+    metric: str
+    target: float = Field(ge=0)
+    comparison: str = Field("at_least", pattern="^(at_least|at_most)$")
+    name: Optional[str] = None
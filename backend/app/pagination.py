@@ -0,0 +1,28 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor encodes the sort key of the last item on a page. The next page
+continues strictly after that key, so each page costs the same regardless of
+how deep into the history it is, unlike OFFSET which rescans skipped rows.
+"""
+
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    """Encode sort key values into a URL-safe cursor."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    """Decode a cursor holding `length` values, raising ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError("Invalid cursor")
+    return values
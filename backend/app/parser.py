@@ -7,10 +7,10 @@ Parses the export.xml file from Apple Health using streaming to handle large fil
 import os
 from lxml import etree
 from datetime import datetime
-from typing import Generator, Tuple
+from typing import Generator, Optional, Tuple
 from pathlib import Path
 
-from . import database
+from . import anomalies, database, goals, heatmaps, maintenance, metrics, timeseries
 
 
 # Secure XML parser - disable external entities to prevent XXE attacks
@@ -90,7 +90,9 @@ def parse_apple_health_export(file_path: str, progress_callback=None) -> dict:
     Returns:
         dict with import statistics
     """
-    database.clear_database()
+    stages = metrics.StageTimer()
+    stages.begin("clear")
+    database.clear_database(keep_derived=True)
     database.init_database()
     database.update_import_status("parsing", 0, 0)
 
@@ -106,6 +108,7 @@ def parse_apple_health_export(file_path: str, progress_callback=None) -> dict:
     bytes_read = 0
 
     try:
+        stages.begin("parse")
         context = etree.iterparse(file_path, events=("end",), tag=("Record", "Workout"))
 
         for event, elem in context:
@@ -232,9 +235,9 @@ def parse_apple_health_export(file_path: str, progress_callback=None) -> dict:
             metric_name = metric_name_map.get(hk_type, hk_type)
             database.set_unit(metric_name, unit)
 
-        # Compute daily summaries
+        # Compute daily summaries and everything derived from them
         database.update_import_status("computing", 95, record_count)
-        database.compute_daily_summaries()
+        build_derived_data(stages)
 
         # Mark complete
         database.update_import_status("complete", 100, record_count)
@@ -250,6 +253,38 @@ def parse_apple_health_export(file_path: str, progress_callback=None) -> dict:
         raise
 
 
+def build_derived_data(stages: Optional[metrics.StageTimer] = None):
+    """Build every table an import derives from the inserted records.
+
+    Runs after the raw records are in; also used to seed benchmark
+    databases, so they go through the same stages as a real import.
+    """
+    stages = stages or metrics.StageTimer()
+    stages.begin("daily_summaries")
+    database.compute_daily_summaries()
+    stages.begin("rollups")
+    database.compute_rollup_summaries()
+    stages.begin("heart_rate_minutes")
+    database.compute_heart_rate_minutes()
+    stages.begin("anomalies")
+    anomalies.compute_anomalies()
+    stages.begin("goals")
+    goals.update_all_goals()
+    stages.begin("heatmaps")
+    heatmaps.compute_heatmaps()
+
+    # Move high-frequency samples into compressed blocks once every
+    # aggregate that reads them from health_records has been built
+    stages.begin("compaction")
+    timeseries.compact_records()
+
+    # Refresh planner statistics and release the pages compaction freed
+    stages.begin("maintenance")
+    maintenance.optimize_database()
+    maintenance.incremental_vacuum()
+    stages.end()
+
+
 def parse_export_file(file_path: Path) -> dict:
     """Convenience wrapper for parsing."""
     return parse_apple_health_export(str(file_path))
@@ -0,0 +1,142 @@
+"""
+Per-person profiles, each backed by its own SQLite file.
+
+A request selects a profile with the X-Health-Profile header or a
+/p/{profile}/ path prefix; requests naming neither use the default profile,
+which is DATABASE_PATH. Other profiles live in a profiles/ directory next to
+it. The middleware routes the request's database connections through a
+context variable, which background tasks and worker threads inherit, so an
+import for one profile writes only its own file and never blocks reads of
+another.
+
+A profile's database is migrated the first time it is used in this process;
+its connection pool is opened lazily and closed again once it sits idle
+(see database.evict_idle_pools).
+"""
+
+import contextvars
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from fastapi.responses import JSONResponse
+
+from . import database, migrations
+
+
+DEFAULT_PROFILE = "default"
+PROFILE_HEADER = b"x-health-profile"
+PATH_PREFIX = "/p/"
+
+# Profile names become file names, so only allow a safe subset
+PROFILE_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+_current_profile: contextvars.ContextVar[str] = contextvars.ContextVar("current_profile", default=DEFAULT_PROFILE)
+
+# Profiles whose database has been migrated by this process
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+def is_valid(name: str) -> bool:
+    return bool(PROFILE_PATTERN.match(name))
+
+
+def profiles_dir() -> Path:
+    return database.DATABASE_PATH.parent / "profiles"
+
+
+def profile_path(name: str) -> Path:
+    """Get the database file of a profile."""
+    if name == DEFAULT_PROFILE:
+        return database.DATABASE_PATH
+    return profiles_dir() / f"{name}.db"
+
+
+def current_profile() -> str:
+    return _current_profile.get()
+
+
+def list_profiles() -> list:
+    """Get the default profile and every profile with a database file."""
+    names = {DEFAULT_PROFILE}
+    if profiles_dir().is_dir():
+        names.update(path.stem for path in profiles_dir().glob("*.db") if is_valid(path.stem))
+    return sorted(names)
+
+
+@contextmanager
+def use_profile(name: str):
+    """Route database access in this context to the profile `name`."""
+    token = _current_profile.set(name)
+    try:
+        with database.use_database(profile_path(name)):
+            yield
+    finally:
+        _current_profile.reset(token)
+
+
+def ensure_ready(name: str):
+    """Migrate a non-default profile's database on its first use.
+
+    The default profile is migrated at startup. Backfills left pending in a
+    profile's database run on a background thread within that profile.
+    """
+    if name == DEFAULT_PROFILE or name in _ready:
+        return
+    with _ready_lock:
+        if name in _ready:
+            return
+        with use_profile(name):
+            database.init_database()
+            if migrations.pending_backfills():
+                context = contextvars.copy_context()
+                threading.Thread(target=context.run, args=(migrations.run_backfills,), daemon=True).start()
+        _ready.add(name)
+
+
+def forget(name: Optional[str] = None):
+    """Drop a profile (or all) from the migrated set, e.g. after its file is removed."""
+    with _ready_lock:
+        if name is None:
+            _ready.clear()
+        else:
+            _ready.discard(name)
+
+
+class ProfileMiddleware:
+    """ASGI middleware selecting the profile each HTTP request is served from."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = None
+        if scope["path"].startswith(PATH_PREFIX):
+            name, _, rest = scope["path"][len(PATH_PREFIX):].partition("/")
+            # Rewritten in place so outer middleware see the matched route
+            scope["path"] = "/" + rest
+            scope["raw_path"] = scope["path"].encode("utf-8")
+        else:
+            header = dict(scope["headers"]).get(PROFILE_HEADER)
+            if header:
+                name = header.decode("latin-1").strip()
+
+        name = name or DEFAULT_PROFILE
+        if not is_valid(name):
+            response = JSONResponse({"detail": "Invalid profile name"}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        if name != DEFAULT_PROFILE and name not in _ready:
+            # Migrating a database can take a while; keep it off the event loop
+            await anyio.to_thread.run_sync(ensure_ready, name)
+        with use_profile(name):
+            await self.app(scope, receive, send)
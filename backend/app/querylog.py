@@ -0,0 +1,128 @@
+"""
+Slow-query log and query plan guard.
+
+Statements run through the instrumented connection (see metrics.py) are
+reported here with their duration. Those slower than the threshold are kept
+with their parameters and EXPLAIN QUERY PLAN output in a ring buffer served
+at /api/admin/slow-queries. The threshold comes from HEALTH_SLOW_QUERY_MS
+(default 100) and can be changed at runtime.
+
+In strict mode every statement run while serving a data GET request is
+explained, and plans that SCAN health_records are recorded as violations;
+the test suite enables it and fails on any violation. Statements that scan
+on purpose carry a /* full-scan-ok */ comment.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+
+threshold = float(os.environ.get("HEALTH_SLOW_QUERY_MS", "100")) / 1000
+
+# Slow statements kept for the admin endpoint
+LOG_SIZE = 100
+
+# Requests outside these prefixes are not held to the plan guard: admin
+# endpoints inspect whole tables and exports stream them by design
+UNGUARDED_PREFIXES = ("/api/admin/", "/api/export/")
+
+SCAN_ALLOWED = "/* full-scan-ok */"
+
+strict = os.environ.get("HEALTH_STRICT_QUERY_PLANS") == "1"
+
+_FULL_SCAN = re.compile(r"^SCAN health_records\b")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+_log = deque(maxlen=LOG_SIZE)
+_violations = []
+_lock = threading.Lock()
+_guarded_request = ContextVar("guarded_request", default=None)
+
+
+def explain(conn, sql: str, parameters=()) -> list:
+    """Get the EXPLAIN QUERY PLAN detail lines for a statement, or [] if it has none."""
+    if not _EXPLAINABLE.match(sql):
+        return []
+    try:
+        # A plain cursor, so explaining is not itself timed and logged
+        cursor = conn.cursor(sqlite3.Cursor)
+        return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+    except sqlite3.Error:
+        return []
+
+
+def observe(conn, sql: str, parameters, elapsed: float, many: bool = False):
+    """Record a finished statement; called by the instrumented cursor."""
+    request = _guarded_request.get()
+    checking = strict and request is not None and SCAN_ALLOWED not in sql
+    if elapsed < threshold and not checking:
+        return
+
+    # executemany has no single parameter set to explain with
+    plan = [] if many else explain(conn, sql, parameters)
+
+    if elapsed >= threshold:
+        with _lock:
+            _log.append({
+                "time": datetime.now(timezone.utc).isoformat(),
+                "duration_ms": round(elapsed * 1000, 2),
+                "sql": " ".join(sql.split()),
+                "parameters": [] if many else [_jsonable(p) for p in parameters],
+                "plan": plan,
+            })
+
+    if checking and any(_FULL_SCAN.match(detail) for detail in plan):
+        with _lock:
+            _violations.append({"request": request, "sql": " ".join(sql.split()), "plan": plan})
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    return value
+
+
+def slow_queries() -> list:
+    """Get logged slow statements, newest first."""
+    with _lock:
+        return list(reversed(_log))
+
+
+def clear():
+    with _lock:
+        _log.clear()
+        _violations.clear()
+
+
+def plan_violations() -> list:
+    with _lock:
+        return list(_violations)
+
+
+class PlanGuardMiddleware:
+    """ASGI middleware marking data GET requests for the strict plan guard."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not strict
+            or scope["type"] != "http"
+            or scope["method"] != "GET"
+            or scope["path"].startswith(UNGUARDED_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        token = _guarded_request.set(f"GET {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _guarded_request.reset(token)
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Query
+
+from .. import cache, maintenance, querylog, startup
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/storage")
+async def get_storage():
+    """Get database size, free pages and per-table row counts and sizes."""
+    return maintenance.get_storage_stats()
+
+
+@router.get("/integrity")
+async def get_integrity(full: bool = Query(False)):
+    """Run an integrity check on the database."""
+    messages = maintenance.check_integrity(full)
+    return {"ok": messages == ["ok"], "messages": messages}
+
+
+@router.post("/maintenance")
+async def run_maintenance():
+    """Run ANALYZE, PRAGMA optimize and an incremental vacuum now."""
+    return maintenance.run_maintenance()
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Get response cache size and hit counts."""
+    return cache.response_cache.stats()
+
+
+@router.get("/startup")
+async def get_startup_report(limit: int = Query(30, ge=1)):
+    """Get startup phase timings and the slowest module imports."""
+    return startup.report(limit)
+
+
+@router.get("/slow-queries")
+async def get_slow_queries():
+    """Get statements slower than the threshold with their query plans."""
+    return {"threshold_ms": querylog.threshold * 1000, "queries": querylog.slow_queries()}
+
+
+@router.put("/slow-queries")
+async def set_slow_query_threshold(threshold_ms: float = Query(..., ge=0)):
+    """Change the slow-query threshold."""
+    querylog.threshold = threshold_ms / 1000
+    return {"threshold_ms": threshold_ms}
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    """Empty the slow-query log."""
+    querylog.clear()
+    return {"message": "Slow-query log cleared"}
@@ -0,0 +1,232 @@
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Optional
+
+from .. import database
+from ..models import DashboardRequest
+from .health import empty_summary
+from .insights import DEFAULT_TOP, compute_trends, compute_correlations, compute_records, compute_weekly_summary
+
+router = APIRouter(prefix="/api", tags=["dashboard"])
+
+
+def _param_date(params: dict, name: str) -> Optional[date]:
+    value = params.get(name)
+    return date.fromisoformat(value) if value else None
+
+
+def _period(params: dict, today: date, default_days: int) -> tuple:
+    """Resolve start/end/days params the same way the single endpoints do."""
+    end = _param_date(params, "end") or today
+    start = _param_date(params, "start") or end - timedelta(days=int(params.get("days", default_days)))
+    return start, end
+
+
+class SummaryWindow:
+    """Daily summaries for the union of all widget ranges, read once.
+
+    Slices and per-column series are memoized so widgets asking for the
+    same range share the work.
+    """
+
+    def __init__(self, summaries: list):
+        self.summaries = summaries
+        self.dates = [s["date"] for s in summaries]
+        self._memo = {}
+
+    def between(self, start: date, end: date) -> list:
+        key = ("between", start, end)
+        if key not in self._memo:
+            lo = bisect_left(self.dates, start.isoformat())
+            hi = bisect_right(self.dates, end.isoformat())
+            self._memo[key] = self.summaries[lo:hi]
+        return self._memo[key]
+
+    def series(self, column: str, start: date, end: date) -> list:
+        key = ("series", column, start, end)
+        if key not in self._memo:
+            self._memo[key] = [
+                {"date": s["date"], "value": s[column]}
+                for s in self.between(start, end) if s.get(column) is not None
+            ]
+        return self._memo[key]
+
+
+# Each widget type maps to (window, compute). window(params, today, history)
+# returns the (start, end) daily_summary range the widget needs, or None if
+# it reads nothing from daily_summary; history is the (first, last) date
+# with data. compute(params, today, window) builds the widget's response.
+
+def _summary_window(params, today, history):
+    target = _param_date(params, "date") or today
+    return target, target
+
+
+def _summary(params, today, window):
+    target = _param_date(params, "date") or today
+    rows = window.between(target, target)
+    return rows[0] if rows else empty_summary(target)
+
+
+def _range_window(params, today, history):
+    start, end = _param_date(params, "start"), _param_date(params, "end")
+    if start is None or end is None:
+        raise ValueError("range widget requires start and end")
+    return start, end
+
+
+def _range(params, today, window):
+    summaries = window.between(_param_date(params, "start"), _param_date(params, "end"))
+    return {"summaries": summaries, "count": len(summaries)}
+
+
+def _metric_resolution(params, start, end) -> str:
+    """Resolve the resolution param, including auto, as the metric endpoint does."""
+    resolution = params.get("resolution", "day")
+    if resolution not in database.RESOLUTIONS and resolution != "auto":
+        raise ValueError(f"Unknown resolution: {resolution}")
+    return database.resolve_resolution(params["metric"], resolution, start, end, int(params.get("points", 200)))
+
+
+def _metric_window(params, today, history):
+    start, end = _period(params, today, 30)
+    if _metric_resolution(params, start, end) != "day":
+        return None
+    return start, end
+
+
+def _metric(params, today, window):
+    metric = params["metric"]
+    start, end = _period(params, today, 30)
+    resolution = _metric_resolution(params, start, end)
+    if resolution != "day":
+        data = database.get_metric_history(metric, start, end, resolution)
+    elif metric in database.METRIC_COLUMNS:
+        data = window.series(database.METRIC_COLUMNS[metric], start, end)
+    else:
+        data = []
+    return {"metric": metric, "data": data, "count": len(data), "resolution": resolution}
+
+
+def _workouts(params, today, window):
+    workouts = database.get_all_workouts(*_period(params, today, 30))
+    return {"workouts": workouts, "count": len(workouts)}
+
+
+def _date_range(params, today, window):
+    min_date, max_date = database.get_date_range()
+    return {"min_date": min_date, "max_date": max_date}
+
+
+def _units(params, today, window):
+    return database.get_all_units()
+
+
+def _trends_window(params, today, history):
+    return today - timedelta(days=2 * int(params.get("days", 30))), today
+
+
+def _trends(params, today, window):
+    days = int(params.get("days", 30))
+    summaries = window.between(today - timedelta(days=2 * days), today)
+    return {"trends": compute_trends(summaries, today, days), "period_days": days}
+
+
+def _correlations_window(params, today, history):
+    return today - timedelta(days=int(params.get("days", 90))), today
+
+
+def _correlations(params, today, window):
+    summaries = window.between(*_correlations_window(params, today, None))
+    if len(summaries) < 7:
+        return {"correlations": [], "message": "Not enough data for correlation analysis"}
+    return {"correlations": compute_correlations(summaries, int(params.get("top", DEFAULT_TOP)))}
+
+
+def _records_window(params, today, history):
+    return history
+
+
+def _records(params, today, window):
+    # The window spans the full history whenever a records widget is present
+    return {"records": compute_records(window.summaries)}
+
+
+def _weekly_window(params, today, history):
+    return today - timedelta(days=7), today
+
+
+def _weekly(params, today, window):
+    start, end = _weekly_window(params, today, None)
+    return compute_weekly_summary(window.between(start, end), start, end)
+
+
+def _no_window(params, today, history):
+    return None
+
+
+WIDGETS = {
+    "summary": (_summary_window, _summary),
+    "range": (_range_window, _range),
+    "metric": (_metric_window, _metric),
+    "workouts": (_no_window, _workouts),
+    "date_range": (_no_window, _date_range),
+    "units": (_no_window, _units),
+    "trends": (_trends_window, _trends),
+    "correlations": (_correlations_window, _correlations),
+    "records": (_records_window, _records),
+    "weekly_summary": (_weekly_window, _weekly),
+}
+
+
+@router.post("/dashboard")
+async def get_dashboard(request: DashboardRequest):
+    """Answer several dashboard widgets in one request.
+
+    Every widget reading daily_summary is served from a single read of the
+    union of their date ranges. Errors are reported per widget.
+    """
+    today = date.today()
+
+    history = None
+    if any(widget.type == "records" for widget in request.widgets):
+        min_date, max_date = database.get_date_range()
+        if min_date and max_date:
+            history = (date.fromisoformat(min_date), date.fromisoformat(max_date))
+
+    results = {}
+    windows = []
+    planned = []
+    for widget in request.widgets:
+        if widget.type not in WIDGETS:
+            results[widget.id] = {"error": f"Unknown widget type: {widget.type}"}
+            continue
+        window_for, compute = WIDGETS[widget.type]
+        try:
+            window = window_for(widget.params, today, history)
+        except (ValueError, TypeError, KeyError) as e:
+            results[widget.id] = {"error": str(e)}
+            continue
+        if window is not None:
+            windows.append(window)
+        planned.append((widget, compute))
+
+    summaries = []
+    span = None
+    if windows:
+        span = (min(w[0] for w in windows), max(w[1] for w in windows))
+        summaries = database.get_summaries_in_range(*span)
+
+    window = SummaryWindow(summaries)
+    for widget, compute in planned:
+        try:
+            results[widget.id] = compute(widget.params, today, window)
+        except (ValueError, TypeError, KeyError) as e:
+            results[widget.id] = {"error": str(e)}
+
+    return ORJSONResponse({
+        "widgets": results,
+        "window": {"start": span[0].isoformat(), "end": span[1].isoformat()} if span else None,
+    })
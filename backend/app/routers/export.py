@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Path, Query
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Optional
+
+from .. import export
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+FORMAT_PATTERN = "^(ndjson|csv)$"
+
+
+def _streaming(chunks, fmt: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+@router.get("/records.{fmt}")
+async def export_records(
+    fmt: str = Path(..., pattern=FORMAT_PATTERN),
+    type: Optional[str] = Query(None),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    source: Optional[str] = Query(None)
+):
+    """Stream raw records as NDJSON or CSV, filtered by type, start date and source."""
+    chunks = export.stream_records(fmt, record_type=type, start_date=start, end_date=end, source_name=source)
+    return _streaming(chunks, fmt, "records")
+
+
+@router.get("/summaries.{fmt}")
+async def export_summaries(
+    fmt: str = Path(..., pattern=FORMAT_PATTERN),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    resolution: str = Query("day", pattern="^(hour|day|week|month|year)$")
+):
+    """Stream summaries at a resolution as NDJSON or CSV (all dates by default)."""
+    chunks = export.stream_summaries(fmt, start or date.min, end or date.max, resolution)
+    return _streaming(chunks, fmt, f"{resolution}_summaries")
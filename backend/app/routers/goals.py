@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from .. import database, goals
+from ..models import GoalRequest
+
+router = APIRouter(prefix="/api/goals", tags=["goals"])
+
+
+def _check_metric(request: GoalRequest):
+    if request.metric not in database.METRIC_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {request.metric}")
+
+
+def _goal_or_404(goal_id: int) -> dict:
+    goal = goals.get_goal(goal_id)
+    if goal is None:
+        raise HTTPException(status_code=404, detail="Goal not found")
+    return goal
+
+
+@router.get("")
+async def list_goals():
+    """List goals with their current streak, longest streak and completion rate."""
+    return {"goals": goals.list_goals()}
+
+
+@router.post("", status_code=201)
+async def create_goal(request: GoalRequest):
+    """Create a goal; its streaks are computed from the imported data right away."""
+    _check_metric(request)
+    goal_id = goals.save_goal(request.metric, request.target, request.comparison, request.name)
+    return goals.get_goal(goal_id)
+
+
+@router.get("/{goal_id}")
+async def get_goal(goal_id: int):
+    """Get a goal with its progress."""
+    return _goal_or_404(goal_id)
+
+
+@router.put("/{goal_id}")
+async def update_goal(goal_id: int, request: GoalRequest):
+    """Change a goal's metric, target or comparison and recompute its streaks."""
+    _check_metric(request)
+    _goal_or_404(goal_id)
+    goals.save_goal(request.metric, request.target, request.comparison, request.name, goal_id)
+    return goals.get_goal(goal_id)
+
+
+@router.delete("/{goal_id}")
+async def delete_goal(goal_id: int):
+    """Delete a goal and its streaks."""
+    if not goals.delete_goal(goal_id):
+        raise HTTPException(status_code=404, detail="Goal not found")
+    return {"message": "Goal deleted"}
+
+
+@router.get("/{goal_id}/streaks")
+async def get_streaks(
+    goal_id: int,
+    order: str = Query("longest", pattern="^(longest|recent)$"),
+    limit: int = Query(10, ge=1, le=1000)
+):
+    """Get a goal's runs of consecutive met days."""
+    _goal_or_404(goal_id)
+    return {"goal_id": goal_id, "streaks": goals.get_streaks(goal_id, limit, order)}
@@ -1,22 +1,19 @@
-from fastapi import APIRouter, Query
-from datetime import date, timedelta
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from datetime import date, datetime, time, timedelta, timezone
 from typing import Optional
 
-from .. import database
+from .. import database, timeseries
+from ..downsample import lttb
+from ..encoding import columnar_response, negotiate
+from ..pagination import decode_cursor, encode_cursor
 from ..models import DailySummary, MetricData
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
 
-@router.get("/summary")
-async def get_daily_summary(target_date: Optional[date] = Query(None)):
-    """Get daily summary for a specific date (defaults to today)."""
-    if target_date is None:
-        target_date = date.today()
-
-    summary = database.get_daily_summary(target_date)
-    if summary:
-        return summary
+def empty_summary(target_date: date) -> dict:
+    """Summary returned for a day without data."""
     return {
         "date": target_date.isoformat(),
         "steps": None,
@@ -30,47 +27,305 @@ async def get_daily_summary(target_date: Optional[date] = Query(None)):
     }
 
 
+@router.get("/summary")
+async def get_daily_summary(target_date: Optional[date] = Query(None)):
+    """Get daily summary for a specific date (defaults to today)."""
+    if target_date is None:
+        target_date = date.today()
+
+    summary = database.get_daily_summary(target_date)
+    if summary:
+        return summary
+    return empty_summary(target_date)
+
+
+# Endpoints returning long row lists build an ORJSONResponse themselves,
+# skipping FastAPI's recursive jsonable_encoder pass over every row
+RESOLUTION_PATTERN = "^(auto|hour|day|week|month|year)$"
+FORMAT_PATTERN = "^(json|columnar|msgpack)$"
+
+# Page sizes used once a client starts paging with a cursor
+RANGE_PAGE_SIZE = 1000
+WORKOUT_PAGE_SIZE = 500
+
+
+def _decode_cursor(cursor: Optional[str], length: int) -> Optional[list]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, length)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/range")
 async def get_summaries_range(
+    request: Request,
     start: date = Query(...),
-    end: date = Query(...)
+    end: date = Query(...),
+    resolution: str = Query("day", pattern=RESOLUTION_PATTERN),
+    points: int = Query(200, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    cursor: Optional[str] = Query(None),
+    fmt: Optional[str] = Query(None, alias="format", pattern=FORMAT_PATTERN)
 ):
-    """Get daily summaries for a date range."""
-    summaries = database.get_summaries_in_range(start, end)
-    return {"summaries": summaries, "count": len(summaries)}
+    """Get summaries for a date range.
+
+    With resolution=auto the coarsest resolution giving at least `points`
+    buckets is used. Without `limit` or `cursor` the whole range is
+    returned; otherwise results are paged by `limit` (RANGE_PAGE_SIZE by
+    default) and `next_cursor` is passed back as `cursor` to get the
+    following page. The columnar and msgpack formats return one array per
+    column under "columns".
+    """
+    if resolution == "auto":
+        resolution = database.choose_resolution(start, end, points)
+
+    after = _decode_cursor(cursor, 1)
+    if limit is None and cursor is not None:
+        limit = RANGE_PAGE_SIZE
+    fields, rows = database.get_summary_rows(
+        start, end, resolution,
+        limit=limit + 1 if limit is not None else None,
+        after=after[0] if after else None
+    )
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0])
+
+    fmt = negotiate(request.headers.get("accept", ""), fmt)
+    if fmt == "json":
+        summaries = [dict(zip(fields, row)) for row in rows]
+        return ORJSONResponse({
+            "summaries": summaries,
+            "count": len(summaries),
+            "resolution": resolution,
+            "next_cursor": next_cursor,
+        })
+
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in fields]
+    return columnar_response({
+        "columns": dict(zip(fields, columns)),
+        "count": len(rows),
+        "resolution": resolution,
+        "next_cursor": next_cursor,
+    }, fmt)
 
 
 @router.get("/metrics/{metric_type}")
 async def get_metric_history(
+    request: Request,
     metric_type: str,
     start: Optional[date] = Query(None),
     end: Optional[date] = Query(None),
-    days: int = Query(30)
+    days: int = Query(30),
+    resolution: str = Query("day", pattern=RESOLUTION_PATTERN),
+    points: int = Query(200, ge=1),
+    fmt: Optional[str] = Query(None, alias="format", pattern=FORMAT_PATTERN)
 ):
-    """Get history for a specific metric."""
+    """Get history for a specific metric.
+
+    With resolution=auto the coarsest resolution giving at least `points`
+    buckets is used. Metrics without an hourly rollup fall back to daily,
+    and asking for them with resolution=hour is a 400.
+    The columnar and msgpack formats return parallel "dates" and "values"
+    arrays instead of a list of points.
+    """
     if end is None:
         end = date.today()
     if start is None:
         start = end - timedelta(days=days)
 
-    data = database.get_metric_history(metric_type, start, end)
-    return {"metric": metric_type, "data": data, "count": len(data)}
+    try:
+        resolution = database.resolve_resolution(metric_type, resolution, start, end, points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    dates, values = database.get_metric_series(metric_type, start, end, resolution)
+    fmt = negotiate(request.headers.get("accept", ""), fmt)
+    if fmt == "json":
+        data = [{"date": d, "value": v} for d, v in zip(dates, values)]
+        return ORJSONResponse({"metric": metric_type, "data": data, "count": len(data), "resolution": resolution})
+    return columnar_response({
+        "metric": metric_type,
+        "dates": dates,
+        "values": values,
+        "count": len(dates),
+        "resolution": resolution,
+    }, fmt)
+
+
+def _to_minute(value: datetime) -> int:
+    """Convert a datetime to minutes since the epoch, treating naive values as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp()) // 60
+
+
+def _minute_iso(minute: int) -> str:
+    return datetime.fromtimestamp(minute * 60, tz=timezone.utc).isoformat()
+
+
+@router.get("/heart-rate/intraday")
+async def get_intraday_heart_rate(
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    hours: int = Query(24, ge=1),
+    points: int = Query(500, ge=3, le=10000)
+):
+    """Get intraday heart rate for a time window.
+
+    Returns min/avg/max per bucket plus an LTTB-downsampled line of the
+    per-minute averages, both capped at `points`. Defaults to the last
+    `hours` hours of recorded data.
+    """
+    if end is not None:
+        end_minute = _to_minute(end)
+    else:
+        end_minute = database.get_last_heart_rate_minute()
+        if end_minute is None:
+            return {"start": None, "end": None, "bucket_minutes": 1, "buckets": [], "line": [], "count": 0}
+    start_minute = _to_minute(start) if start is not None else end_minute - hours * 60
+
+    rows = database.get_heart_rate_minutes(start_minute, end_minute)
+    bucket_minutes = max(1, -(-(end_minute - start_minute + 1) // points))
+
+    buckets = []
+    current = None
+    for minute, min_bpm, max_bpm, sum_bpm, samples in rows:
+        bucket = start_minute + (minute - start_minute) // bucket_minutes * bucket_minutes
+        if current is None or current[0] != bucket:
+            current = [bucket, min_bpm, max_bpm, sum_bpm, samples]
+            buckets.append(current)
+        else:
+            current[1] = min(current[1], min_bpm)
+            current[2] = max(current[2], max_bpm)
+            current[3] += sum_bpm
+            current[4] += samples
+
+    line = lttb([(minute, sum_bpm / samples) for minute, _, _, sum_bpm, samples in rows], points)
+
+    return ORJSONResponse({
+        "start": _minute_iso(start_minute),
+        "end": _minute_iso(end_minute),
+        "bucket_minutes": bucket_minutes,
+        "buckets": [
+            {"time": _minute_iso(b[0]), "min": b[1], "avg": round(b[3] / b[4], 1), "max": b[2]}
+            for b in buckets
+        ],
+        "line": [{"time": _minute_iso(int(x)), "value": round(y, 1)} for x, y in line],
+        "count": len(buckets),
+    })
 
 
 @router.get("/workouts")
 async def get_workouts(
     start: Optional[date] = Query(None),
     end: Optional[date] = Query(None),
-    days: int = Query(30)
+    days: int = Query(30),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    cursor: Optional[str] = Query(None)
 ):
-    """Get workouts for a date range."""
+    """Get workouts for a date range, newest first.
+
+    Paged by `limit` (WORKOUT_PAGE_SIZE once a `cursor` is passed without
+    one); with neither, every workout in the range is returned.
+    """
     if end is None:
         end = date.today()
     if start is None:
         start = end - timedelta(days=days)
 
-    workouts = database.get_all_workouts(start, end)
-    return {"workouts": workouts, "count": len(workouts)}
+    before = _decode_cursor(cursor, 2)
+    if limit is None and cursor is not None:
+        limit = WORKOUT_PAGE_SIZE
+    workouts = database.get_all_workouts(
+        start, end, limit=limit + 1 if limit is not None else None, before=before
+    )
+    next_cursor = None
+    if limit is not None and len(workouts) > limit:
+        workouts = workouts[:limit]
+        next_cursor = encode_cursor(workouts[-1]["start_date"], workouts[-1]["id"])
+    return ORJSONResponse({"workouts": workouts, "count": len(workouts), "next_cursor": next_cursor})
+
+
+@router.get("/sleep/sessions")
+async def get_sleep_sessions(
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    days: int = Query(30),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """Get nightly sleep sessions by the UTC date of their wake time, newest first.
+
+    Each session merges overlapping segments from every source and has
+    minutes per stage, bedtime, wake time, session minutes (from the first
+    segment of any stage to wake) and efficiency (time asleep over session
+    minutes).
+    """
+    if end is None:
+        end = date.today()
+    if start is None:
+        start = end - timedelta(days=days)
+
+    sessions = database.get_sleep_sessions(start, end, limit)
+    return ORJSONResponse({"sessions": sessions, "count": len(sessions)})
+
+
+RECORD_FIELDS = ("type", "value", "unit", "start_date", "end_date", "source_name", "device")
+
+
+def _block_records(record_type: str, start: Optional[date], end: Optional[date], limit: int, after: Optional[list]) -> tuple:
+    """Page block-stored samples, returning (records, next_cursor).
+
+    Block samples have no row id, so the cursor holds the last timestamp and
+    how many samples at that timestamp were already returned.
+    """
+    start_dt = datetime.combine(start, time.min, tzinfo=timezone.utc) if start else None
+    end_dt = datetime.combine(end, time.max, tzinfo=timezone.utc) if end else None
+    after_ts, seen = after if after else (None, 0)
+    if after_ts is not None:
+        resume = datetime.fromtimestamp(after_ts, tz=timezone.utc)
+        start_dt = max(start_dt, resume) if start_dt else resume
+
+    records = []
+    last_ts = None
+    at_last = 0
+    skip = seen
+    for record in timeseries.read_samples(record_type, start_dt, end_dt):
+        ts = int(datetime.fromisoformat(record[3]).timestamp())
+        if ts == after_ts and skip:
+            skip -= 1
+            continue
+        if len(records) == limit:
+            # Include samples at this timestamp returned by earlier pages
+            carried = seen if last_ts == after_ts else 0
+            return records, encode_cursor(last_ts, at_last + carried)
+        records.append(dict(zip(RECORD_FIELDS, record)))
+        at_last = at_last + 1 if ts == last_ts else 1
+        last_ts = ts
+    return records, None
+
+
+@router.get("/records")
+async def get_records(
+    type: str = Query(...),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    limit: int = Query(1000, ge=1, le=5000),
+    cursor: Optional[str] = Query(None)
+):
+    """Get raw records of one type in start order, paged by `limit`."""
+    after = _decode_cursor(cursor, 2)
+    if type in timeseries.BLOCK_TYPES:
+        records, next_cursor = _block_records(type, start, end, limit, after)
+    else:
+        records = database.get_health_records(type, start, end, limit=limit + 1, after=after)
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = encode_cursor(records[-1]["start_date"], records[-1]["id"])
+    return ORJSONResponse({"records": records, "count": len(records), "next_cursor": next_cursor})
 
 
 @router.get("/date-range")
@@ -80,6 +335,12 @@ async def get_available_date_range():
     return {"min_date": min_date, "max_date": max_date}
 
 
+@router.get("/types")
+async def get_record_types():
+    """Get the record types present, with counts, first/last dates, unit and sources."""
+    return {"types": database.get_record_types()}
+
+
 @router.get("/units")
 async def get_units():
     """Get detected units for all metrics."""
@@ -1,51 +1,34 @@
-from fastapi import APIRouter, Query
-from datetime import date, timedelta
+from fastapi import APIRouter, HTTPException, Query
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
+import math
 import statistics
 
-from .. import database
+from .. import database, heatmaps
 from ..models import TrendInsight, CorrelationInsight, PersonalRecord
 
 router = APIRouter(prefix="/api/insights", tags=["insights"])
 
 
-def calculate_correlation(x: list, y: list) -> float:
-    """Calculate Pearson correlation coefficient."""
-    if len(x) != len(y) or len(x) < 3:
-        return 0.0
+TREND_METRICS = ["steps", "calories", "sleep", "heart_rate", "workouts"]
 
-    n = len(x)
-    mean_x = sum(x) / n
-    mean_y = sum(y) / n
 
-    numerator = sum((x[i] - mean_x) * (y[i] - mean_y) for i in range(n))
-    denominator_x = sum((xi - mean_x) ** 2 for xi in x) ** 0.5
-    denominator_y = sum((yi - mean_y) ** 2 for yi in y) ** 0.5
+def _values(summaries: list, column: str, start_date: date, end_date: date) -> list:
+    """Non-null values of a summary column for dates in [start_date, end_date]."""
+    start, end = start_date.isoformat(), end_date.isoformat()
+    return [s[column] for s in summaries if start <= s["date"] <= end and s.get(column) is not None]
 
-    if denominator_x == 0 or denominator_y == 0:
-        return 0.0
 
-    return numerator / (denominator_x * denominator_y)
-
-
-@router.get("/trends")
-async def get_trends(days: int = Query(30)):
-    """Get trend analysis for key metrics."""
-    end_date = date.today()
+def compute_trends(summaries: list, end_date: date, days: int) -> list:
+    """Compare each metric's average over the last `days` days with the period before."""
     mid_date = end_date - timedelta(days=days)
     start_date = mid_date - timedelta(days=days)
-
-    metrics = ["steps", "calories", "sleep", "heart_rate", "workouts"]
     trends = []
 
-    for metric in metrics:
-        # Get current period
-        current_data = database.get_metric_history(metric, mid_date, end_date)
-        # Get previous period
-        previous_data = database.get_metric_history(metric, start_date, mid_date)
-
-        current_values = [d["value"] for d in current_data if d["value"] is not None]
-        previous_values = [d["value"] for d in previous_data if d["value"] is not None]
+    for metric in TREND_METRICS:
+        column = database.METRIC_COLUMNS[metric]
+        current_values = _values(summaries, column, mid_date, end_date)
+        previous_values = _values(summaries, column, start_date, mid_date)
 
         if not current_values or not previous_values:
             continue
@@ -73,96 +56,260 @@ async def get_trends(days: int = Query(30)):
             "trend": trend
         })
 
-    return {"trends": trends, "period_days": days}
+    return trends
 
 
-@router.get("/correlations")
-async def get_correlations(days: int = Query(90)):
-    """Find correlations between metrics."""
+@router.get("/trends")
+async def get_trends(days: int = Query(30)):
+    """Get trend analysis for key metrics."""
     end_date = date.today()
-    start_date = end_date - timedelta(days=days)
+    summaries = database.get_summaries_in_range(end_date - timedelta(days=2 * days), end_date)
+    return {"trends": compute_trends(summaries, end_date, days), "period_days": days}
+
+
+# Descriptions for metric pairs with a known relationship; others get a
+# generic one
+CORRELATION_DESCRIPTIONS = {
+    ("steps", "sleep"): "More steps may improve sleep quality",
+    ("steps", "calories"): "Steps and calorie burn are related",
+    ("sleep", "heart_rate"): "Better sleep may lower resting heart rate",
+    ("workouts", "sleep"): "Exercise may improve sleep",
+    ("workouts", "calories"): "Workouts burn more calories",
+    ("steps", "weight"): "Activity level and weight correlation",
+}
+
+# Smallest |r| reported as an insight
+MIN_CORRELATION = 0.2
+
+# Pairs returned when no top-k is requested
+DEFAULT_TOP = 6
+
+# Robust z-score from which a day counts as anomalous (Iglewicz and Hoaglin)
+ANOMALY_THRESHOLD = 3.5
+
+
+def _describe(metric1: str, metric2: str, correlation: float) -> str:
+    description = CORRELATION_DESCRIPTIONS.get((metric1, metric2)) or CORRELATION_DESCRIPTIONS.get((metric2, metric1))
+    if description:
+        return description
+    direction = "rise together" if correlation > 0 else "move in opposite directions"
+    return f"{metric1.replace('_', ' ').capitalize()} and {metric2.replace('_', ' ')} {direction}"
+
+
+def compute_correlations(summaries, top: int = DEFAULT_TOP, min_abs: float = MIN_CORRELATION) -> list:
+    """Find the `top` strongest correlations between any two summary metrics.
+
+    `summaries` is a list of daily summary dicts or an engine.SummaryMatrix.
+    Each pair is correlated over the days where both metrics have a value.
+    """
+    # NumPy loads on the first insights request rather than at startup
+    from .. import engine
+
+    matrix = summaries if isinstance(summaries, engine.SummaryMatrix) else engine.SummaryMatrix.from_summaries(summaries)
+    pairs = engine.top_correlations(engine.correlation_matrix(matrix), top, min_abs)
+    return [
+        {
+            "metric1": pair["metric1"],
+            "metric2": pair["metric2"],
+            "correlation": round(pair["correlation"], 3),
+            "p_value": pair["p_value"],
+            "samples": pair["samples"],
+            "description": _describe(pair["metric1"], pair["metric2"], pair["correlation"]),
+            "strength": "strong" if abs(pair["correlation"]) > 0.6 else "moderate" if abs(pair["correlation"]) > 0.4 else "weak",
+        }
+        for pair in pairs
+    ]
+
+
+def _correlation_window(days: int, start: Optional[date], end: Optional[date]) -> tuple:
+    end_date = end or date.today()
+    return start or end_date - timedelta(days=days), end_date
 
-    summaries = database.get_summaries_in_range(start_date, end_date)
 
-    if len(summaries) < 7:
+@router.get("/correlations")
+async def get_correlations(
+    days: int = Query(90),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    top: int = Query(DEFAULT_TOP, ge=1, le=100),
+    min_abs: float = Query(MIN_CORRELATION, ge=0, le=1)
+):
+    """Find the strongest correlations between metrics over a window.
+
+    The window is the last `days` days, or [start, end] when given.
+    """
+    from .. import engine
+
+    matrix = engine.load_summaries(*_correlation_window(days, start, end))
+
+    if len(matrix.dates) < 7:
+        return {"correlations": [], "message": "Not enough data for correlation analysis"}
+
+    return {"correlations": compute_correlations(matrix, top, min_abs)}
+
+
+@router.get("/correlations/matrix")
+async def get_correlation_matrix(
+    days: int = Query(90),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None)
+):
+    """Get Pearson r, p-values and shared day counts for every pair of metrics."""
+    from .. import engine
+
+    matrix = engine.load_summaries(*_correlation_window(days, start, end))
+    return {**engine.matrix_payload(engine.correlation_matrix(matrix)), "days": len(matrix.dates)}
+
+
+@router.get("/lagged-correlations")
+async def get_lagged_correlations(
+    days: int = Query(365),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    max_lag: int = Query(7, ge=0, le=30),
+    top: int = Query(10, ge=1, le=100),
+    min_abs: float = Query(MIN_CORRELATION, ge=0, le=1),
+    metric1: Optional[str] = Query(None),
+    metric2: Optional[str] = Query(None)
+):
+    """Correlate each metric with every other metric up to `max_lag` days later.
+
+    A positive lag pairs metric1 on a day with metric2 that many days later
+    (e.g. workouts today vs sleep tonight is lag 0 or 1, depending on how
+    sleep is dated). Returns the `top` strongest combinations, or with both
+    metric1 and metric2 the pair's full profile across lags.
+    """
+    from .. import engine
+
+    if (metric1 is None) != (metric2 is None):
+        raise HTTPException(status_code=400, detail="Pass both metric1 and metric2, or neither")
+    for metric in (metric1, metric2):
+        if metric is not None and metric not in database.METRIC_COLUMNS:
+            raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+
+    matrix = engine.load_summaries(*_correlation_window(days, start, end))
+    if len(matrix.dates) < 7:
         return {"correlations": [], "message": "Not enough data for correlation analysis"}
 
-    # Build aligned metric arrays
-    metrics_data = {
-        "steps": [],
-        "calories": [],
-        "sleep": [],
-        "heart_rate": [],
-        "workouts": [],
-        "weight": []
+    result = engine.lagged_correlations(matrix, max_lag)
+
+    if metric1 is not None:
+        i, j = result["metrics"].index(metric1), result["metrics"].index(metric2)
+        profile = [
+            {
+                "lag": lag,
+                "correlation": None if math.isnan(result["r"][index, i, j]) else round(float(result["r"][index, i, j]), 3),
+                "p_value": None if math.isnan(result["p"][index, i, j]) else float(result["p"][index, i, j]),
+                "samples": int(result["n"][index, i, j]),
+            }
+            for index, lag in enumerate(result["lags"])
+        ]
+        return {"metric1": metric1, "metric2": metric2, "lags": profile}
+
+    pairs = engine.top_lagged_correlations(result, top, min_abs)
+    return {
+        "correlations": [
+            {**pair, "correlation": round(pair["correlation"], 3)} for pair in pairs
+        ],
+        "max_lag": max_lag,
     }
 
-    metric_keys = {
-        "steps": "steps",
-        "calories": "active_calories",
-        "sleep": "sleep_hours",
-        "heart_rate": "resting_heart_rate",
-        "workouts": "workout_minutes",
-        "weight": "weight"
+
+@router.get("/rolling/{metric}")
+async def get_rolling_series(
+    metric: str,
+    method: str = Query("sma", pattern="^(sma|ewma|median)$"),
+    window: int = Query(7, ge=1, le=365),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    alpha: Optional[float] = Query(None, gt=0, le=1),
+    min_periods: int = Query(1, ge=1)
+):
+    """Get a metric's daily values with a rolling mean, EWMA or rolling median.
+
+    Windows are trailing and span `window` calendar days, skipping days
+    without data. The EWMA uses `alpha`, or 2 / (window + 1) by default.
+    Defaults to the last year; earlier days are read so the first points
+    have a full window. Cached per import generation like every insights
+    response.
+    """
+    from .. import engine
+
+    if metric not in database.METRIC_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+
+    end_date = end or date.today()
+    start_date = start or end_date - timedelta(days=364)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    # An EWMA remembers further back than its nominal window
+    warmup = window - 1 if method != "ewma" else 3 * window
+    read_from = start_date - timedelta(days=warmup)
+    series = engine.daily_series(*database.get_metric_series(metric, read_from, end_date), read_from, end_date)
+
+    if method == "sma":
+        smoothed = engine.rolling_mean(series, window, min_periods)
+    elif method == "median":
+        smoothed = engine.rolling_median(series, window, min_periods)
+    else:
+        smoothed = engine.ewma(series, alpha or 2 / (window + 1))
+
+    def values(array):
+        return [None if math.isnan(value) else round(value, 3) for value in array[warmup:].tolist()]
+
+    return {
+        "metric": metric,
+        "method": method,
+        "window": window,
+        "dates": engine.series_dates(start_date, len(series) - warmup),
+        "values": values(smoothed),
+        "raw": values(series),
     }
 
-    for s in summaries:
-        for metric, key in metric_keys.items():
-            metrics_data[metric].append(s.get(key))
-
-    correlations = []
-    pairs = [
-        ("steps", "sleep", "More steps may improve sleep quality"),
-        ("steps", "calories", "Steps and calorie burn are related"),
-        ("sleep", "heart_rate", "Better sleep may lower resting heart rate"),
-        ("workouts", "sleep", "Exercise may improve sleep"),
-        ("workouts", "calories", "Workouts burn more calories"),
-        ("steps", "weight", "Activity level and weight correlation"),
-    ]
 
-    for m1, m2, description in pairs:
-        # Filter out None values while keeping alignment
-        valid_pairs = [
-            (metrics_data[m1][i], metrics_data[m2][i])
-            for i in range(len(summaries))
-            if metrics_data[m1][i] is not None and metrics_data[m2][i] is not None
-        ]
+@router.get("/anomalies")
+async def get_anomalies(
+    since: Optional[date] = Query(None),
+    metric: Optional[str] = Query(None),
+    min_score: float = Query(ANOMALY_THRESHOLD, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Get days whose value stood out from the weeks before, and heart rate spikes.
 
-        if len(valid_pairs) >= 7:
-            x = [p[0] for p in valid_pairs]
-            y = [p[1] for p in valid_pairs]
-            corr = calculate_correlation(x, y)
+    Scores are computed at import, so this only reads the precomputed
+    tables. Defaults to the last 30 days.
+    """
+    if metric is not None and metric not in database.METRIC_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
 
-            if abs(corr) > 0.2:  # Only show meaningful correlations
-                correlations.append({
-                    "metric1": m1,
-                    "metric2": m2,
-                    "correlation": round(corr, 3),
-                    "description": description,
-                    "strength": "strong" if abs(corr) > 0.6 else "moderate" if abs(corr) > 0.4 else "weak"
-                })
+    since = since or date.today() - timedelta(days=30)
+    anomalies = database.get_anomalies(since, min_score, metric, limit)
+    for anomaly in anomalies:
+        anomaly["direction"] = "high" if anomaly["score"] > 0 else "low"
 
-    # Sort by absolute correlation strength
-    correlations.sort(key=lambda x: abs(x["correlation"]), reverse=True)
+    spikes = [] if metric not in (None, "heart_rate") else database.get_heart_rate_spikes(since, limit)
+    for spike in spikes:
+        spike["time"] = datetime.fromtimestamp(spike.pop("minute") * 60, tz=timezone.utc).isoformat()
 
-    return {"correlations": correlations}
+    return {"since": since.isoformat(), "anomalies": anomalies, "heart_rate_spikes": spikes}
 
 
-@router.get("/records")
-async def get_personal_records():
-    """Get personal best records."""
-    min_date, max_date = database.get_date_range()
-    if not min_date or not max_date:
-        return {"records": []}
+@router.get("/heatmap/{metric}")
+async def get_heatmap(metric: str, year: Optional[int] = Query(None, ge=1900, le=2200)):
+    """Get calendar heatmap buckets for a metric, for one year or all years.
 
-    summaries = database.get_summaries_in_range(
-        date.fromisoformat(min_date),
-        date.fromisoformat(max_date)
-    )
+    Each year has the quartile thresholds of its daily values and a bucket
+    per day from January 1st: 0 for no value, 1-4 from lowest to highest.
+    Built at import, so this reads one row per year.
+    """
+    if metric not in database.METRIC_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    return {"metric": metric, "years": heatmaps.get_heatmaps(metric, year)}
 
-    if not summaries:
-        return {"records": []}
 
+def compute_records(summaries: list) -> list:
+    """Find the best day for each metric."""
     records = []
 
     # Steps record
@@ -231,17 +378,26 @@ async def get_personal_records():
             "unit": "flights"
         })
 
-    return {"records": records}
+    return records
 
 
-@router.get("/weekly-summary")
-async def get_weekly_summary():
-    """Get summary statistics for the past week."""
-    end_date = date.today()
-    start_date = end_date - timedelta(days=7)
+@router.get("/records")
+async def get_personal_records():
+    """Get personal best records."""
+    min_date, max_date = database.get_date_range()
+    if not min_date or not max_date:
+        return {"records": []}
 
-    summaries = database.get_summaries_in_range(start_date, end_date)
+    summaries = database.get_summaries_in_range(
+        date.fromisoformat(min_date),
+        date.fromisoformat(max_date)
+    )
+
+    return {"records": compute_records(summaries)}
 
+
+def compute_weekly_summary(summaries: list, start_date: date, end_date: date) -> dict:
+    """Averages and totals over the summaries of one week."""
     if not summaries:
         return {
             "period": {"start": start_date.isoformat(), "end": end_date.isoformat()},
@@ -284,3 +440,13 @@ async def get_weekly_summary():
         },
         "days_with_data": len(summaries)
     }
+
+
+@router.get("/weekly-summary")
+async def get_weekly_summary():
+    """Get summary statistics for the past week."""
+    end_date = date.today()
+    start_date = end_date - timedelta(days=7)
+
+    summaries = database.get_summaries_in_range(start_date, end_date)
+    return compute_weekly_summary(summaries, start_date, end_date)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from .. import database, profiles
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+
+@router.get("")
+async def list_profiles():
+    """List profiles with a database, and the one serving this request."""
+    return {"profiles": profiles.list_profiles(), "current": profiles.current_profile()}
+
+
+@router.get("/pools")
+async def get_pools():
+    """Get the open connection pools with their idle and checked-out counts."""
+    return database.pool_stats()
@@ -2,10 +2,9 @@ import os
 import shutil
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from .. import database
-from ..parser import parse_apple_health_export
+from .. import database, events, profiles
 from ..models import ImportStatus
 
 router = APIRouter(prefix="/api", tags=["upload"])
@@ -16,8 +15,21 @@ DATA_DIR = Path(__file__).parent.parent.parent.parent / "data"
 MAX_UPLOAD_SIZE = 3 * 1024 * 1024 * 1024  # 3GB in bytes
 
 
+def export_path() -> Path:
+    """Get where the current profile's export is stored before import."""
+    name = profiles.current_profile()
+    if name == profiles.DEFAULT_PROFILE:
+        return DATA_DIR / "export.xml"
+    return DATA_DIR / "profiles" / f"{name}.xml"
+
+
 def run_import(file_path: str):
-    """Background task to run the import."""
+    """Background task to run the import.
+
+    Runs in the request's context, so it writes to that request's profile.
+    """
+    # The parser pulls in lxml, which only an import needs
+    from ..parser import parse_apple_health_export
     try:
         parse_apple_health_export(file_path)
     except Exception as e:
@@ -43,11 +55,9 @@ async def upload_health_export(
     if file.content_type and file.content_type not in ["text/xml", "application/xml", "application/octet-stream"]:
         raise HTTPException(status_code=400, detail="Invalid content type for XML file")
 
-    # Ensure data directory exists
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
     # Save uploaded file with size limit check
-    file_path = DATA_DIR / "export.xml"
+    file_path = export_path()
+    file_path.parent.mkdir(parents=True, exist_ok=True)
     try:
         total_size = 0
         with open(file_path, "wb") as buffer:
@@ -74,13 +84,13 @@ async def upload_health_export(
 
 @router.post("/upload/local")
 async def import_local_file(background_tasks: BackgroundTasks):
-    """Import export.xml from the data directory."""
-    file_path = DATA_DIR / "export.xml"
+    """Import export.xml (profiles/{profile}.xml for other profiles) from the data directory."""
+    file_path = export_path()
 
     if not file_path.exists():
         raise HTTPException(
             status_code=404,
-            detail="No export.xml found in data directory. Please copy your Apple Health export there."
+            detail=f"No {file_path.name} found in data directory. Please copy your Apple Health export there."
         )
 
     # Check if already importing
@@ -112,6 +122,22 @@ async def get_import_status():
     }
 
 
+@router.get("/status/stream")
+async def stream_import_status():
+    """Push import status changes as Server-Sent Events.
+
+    Sends the current status once, then every update the importer publishes,
+    without reading the database again.
+    """
+    status = database.get_import_status()
+    initial = {key: status.get(key) for key in ("status", "progress", "records_imported", "error_message")}
+    return StreamingResponse(
+        events.stream(events.import_events, initial, topic=str(database.database_path())),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.delete("/data")
 async def clear_all_data():
     """Clear all imported health data."""
@@ -120,4 +146,8 @@ async def clear_all_data():
         raise HTTPException(status_code=409, detail="Cannot clear data during import")
 
     database.clear_database()
+    events.import_events.publish(
+        {"status": "idle", "progress": 0, "records_imported": 0, "error_message": None},
+        topic=str(database.database_path())
+    )
     return {"message": "All data cleared"}
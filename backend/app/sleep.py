@@ -0,0 +1,146 @@
+"""
+Sleep session reconstruction.
+
+Apple Health stores sleep as stage segments (core, deep, REM, awake, in bed,
+or plain "asleep" from older sources), one set per source, so a night the
+Watch and the phone both recorded is two overlapping sets of segments and a
+night starting before midnight spans two dates. Sessions are rebuilt by
+sorting every segment by start and merging segments that overlap or are
+less than SESSION_GAP_SECONDS apart. Within a session a sweep over the
+segment boundaries gives each stretch of time to the highest-priority stage
+any source reports for it, so overlapping sources are counted once.
+
+A session is dated by the UTC date of its wake time, the rule SQLite's
+DATE() applies to start dates for every other daily_summary column, so a
+night's sleep lands on the same row as the steps of the morning it ends
+(the night from Sunday 23:00 to Monday 07:00 is Monday's sleep in the
+Americas and Europe). Bedtime is when the first sleep stage begins,
+preferring the Watch's staged segments over a phone's in-bed or unstaged
+asleep spans, which usually begin earlier. session_minutes covers the whole
+session, from its first segment of any stage to wake, and efficiency is the
+time asleep over it.
+"""
+
+from datetime import datetime, timezone
+
+
+# sleep_type value -> stage
+STAGES = {
+    "HKCategoryValueSleepAnalysisAsleepDeep": "deep",
+    "HKCategoryValueSleepAnalysisAsleepREM": "rem",
+    "HKCategoryValueSleepAnalysisAsleepCore": "core",
+    "HKCategoryValueSleepAnalysisAwake": "awake",
+    "HKCategoryValueSleepAnalysisAsleep": "asleep",
+    "HKCategoryValueSleepAnalysisAsleepUnspecified": "asleep",
+    "HKCategoryValueSleepAnalysisInBed": "in_bed",
+}
+
+# Stage that wins where sources overlap, most specific first. Awake beats
+# unstaged "asleep" so a phone's coarse asleep span does not hide the
+# Watch's wake-ups.
+PRIORITY = ("deep", "rem", "core", "awake", "asleep", "in_bed")
+
+ASLEEP_STAGES = ("deep", "rem", "core", "asleep")
+
+# Stages bedtime is taken from, most preferred first
+BEDTIME_STAGES = (("deep", "rem", "core"), ("asleep",))
+
+# Segments further apart than this belong to different sessions
+SESSION_GAP_SECONDS = 60 * 60
+
+SESSION_COLUMNS = (
+    "date", "bedtime", "wake_time", "asleep_minutes", "core_minutes", "deep_minutes", "rem_minutes",
+    "unstaged_minutes", "awake_minutes", "session_minutes", "efficiency", "sources", "segments",
+)
+
+
+def _segments(records: list) -> list:
+    """Parse (sleep_type, start, end, source) rows into sorted segments."""
+    segments = []
+    for sleep_type, start, end, source in records:
+        stage = STAGES.get(sleep_type)
+        if stage is None or not start or not end:
+            continue
+        try:
+            start_dt, end_dt = datetime.fromisoformat(start), datetime.fromisoformat(end)
+        except ValueError:
+            continue
+        if end_dt > start_dt:
+            segments.append((start_dt.timestamp(), end_dt.timestamp(), stage, source, start, end))
+    segments.sort(key=lambda segment: (segment[0], segment[1]))
+    return segments
+
+
+def _stage_seconds(group: list) -> dict:
+    """Seconds per stage within a session, each instant counted once."""
+    events = []
+    for start, end, stage, *_ in group:
+        events.append((start, 1, stage))
+        events.append((end, -1, stage))
+    events.sort(key=lambda event: event[0])
+
+    active = dict.fromkeys(PRIORITY, 0)
+    seconds = dict.fromkeys(PRIORITY, 0.0)
+    previous = None
+    for moment, change, stage in events:
+        if previous is not None and moment > previous:
+            winner = next((name for name in PRIORITY if active[name]), None)
+            if winner is not None:
+                seconds[winner] += moment - previous
+        active[stage] += change
+        previous = moment
+    return seconds
+
+
+def _bedtime(group: list) -> str:
+    """Start of the session's first segment of the most preferred stages present."""
+    for stages in BEDTIME_STAGES:
+        # Segments are sorted by start, so the first match is the earliest
+        first = next((segment for segment in group if segment[2] in stages), None)
+        if first is not None:
+            return first[4]
+    return group[0][4]
+
+
+def _session(group: list) -> tuple:
+    seconds = _stage_seconds(group)
+    minutes = {stage: round(value / 60, 1) for stage, value in seconds.items()}
+    asleep = round(sum(seconds[stage] for stage in ASLEEP_STAGES) / 60, 1)
+    last = max(group, key=lambda segment: segment[1])
+    span = (last[1] - group[0][0]) / 60
+    return (
+        datetime.fromtimestamp(last[1], timezone.utc).date().isoformat(), _bedtime(group), last[5], asleep,
+        minutes["core"], minutes["deep"], minutes["rem"], minutes["asleep"], minutes["awake"],
+        round(span, 1), round(asleep / span, 3), ", ".join(sorted({s[3] for s in group if s[3]})), len(group),
+    )
+
+
+def build_sessions(records: list) -> list:
+    """Merge sleep segments into sessions, as tuples in SESSION_COLUMNS order.
+
+    Sessions without any asleep time (a phone's in-bed span on its own)
+    are left out.
+    """
+    sessions = []
+    group = []
+    group_end = None
+    for segment in _segments(records):
+        if group and segment[0] > group_end + SESSION_GAP_SECONDS:
+            sessions.append(_session(group))
+            group = []
+        group_end = segment[1] if not group else max(group_end, segment[1])
+        group.append(segment)
+    if group:
+        sessions.append(_session(group))
+    return [session for session in sessions if session[3] > 0]
+
+
+def build_sleep_sessions(cursor):
+    """Rebuild sleep_sessions from sleep_records."""
+    cursor.execute("DELETE FROM sleep_sessions")
+    cursor.execute("SELECT sleep_type, start_date, end_date, source_name FROM sleep_records")
+    sessions = build_sessions(cursor.fetchall())
+    placeholders = ", ".join("?" * len(SESSION_COLUMNS))
+    cursor.executemany(
+        f"INSERT INTO sleep_sessions ({', '.join(SESSION_COLUMNS)}) VALUES ({placeholders})", sessions
+    )
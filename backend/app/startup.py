@@ -0,0 +1,123 @@
+"""
+Startup timing.
+
+Records how long the API process takes to become ready: time spent importing
+each module (self and cumulative, like `python -X importtime`), the startup
+phases, and the arrival of the first request. Import timing hooks into
+sys.meta_path when the app package is imported and is removed once startup
+completes. The report is served at /api/admin/startup.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+# Reference point for all timings: when the app package began importing
+STARTED = time.perf_counter()
+
+_modules = {}
+_phases = {}
+_marks = {}
+_local = threading.local()
+
+
+class _ImportTimer:
+    """Meta path finder that times exec_module of the specs other finders return."""
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        loader = spec.loader
+        # Built-in and frozen importers are shared classes; leave them alone
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        try:
+            loader.exec_module = _timed_exec(name, loader.exec_module)
+        except AttributeError:
+            pass
+        return spec
+
+
+def _timed_exec(name: str, exec_module):
+    def timed(module):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(0.0)
+        began = time.perf_counter()
+        try:
+            exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - began
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            _modules[name] = (elapsed - children, elapsed)
+    return timed
+
+
+_timer = _ImportTimer()
+
+
+def install():
+    if _timer not in sys.meta_path:
+        sys.meta_path.insert(0, _timer)
+
+
+def uninstall():
+    if _timer in sys.meta_path:
+        sys.meta_path.remove(_timer)
+
+
+def mark(name: str):
+    """Record the first time `name` is reached, relative to STARTED."""
+    _marks.setdefault(name, time.perf_counter() - STARTED)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a startup phase."""
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = time.perf_counter() - began
+
+
+class FirstRequestMiddleware:
+    """ASGI middleware recording when the first HTTP request arrives."""
+
+    def __init__(self, app):
+        self.app = app
+        self.seen = False
+
+    async def __call__(self, scope, receive, send):
+        if not self.seen and scope["type"] == "http":
+            self.seen = True
+            mark("first_request")
+        await self.app(scope, receive, send)
+
+
+def report(limit: Optional[int] = 30) -> dict:
+    """Get startup marks, phases and the slowest module imports."""
+    modules = sorted(_modules.items(), key=lambda item: item[1][1], reverse=True)
+    if limit is not None:
+        modules = modules[:limit]
+    return {
+        "marks_ms": {name: round(value * 1000, 1) for name, value in _marks.items()},
+        "phases_ms": {name: round(value * 1000, 1) for name, value in _phases.items()},
+        "modules": [
+            {"module": name, "self_ms": round(own * 1000, 2), "cumulative_ms": round(total * 1000, 2)}
+            for name, (own, total) in modules
+        ],
+    }
@@ -0,0 +1,326 @@
+"""
+Compressed block storage for high-frequency samples.
+
+Heart rate, energy and distance samples make up most of an export. Rather
+than one health_records row per sample, they are stored as fixed time-range
+blocks per series (type, unit, source, device). Each block encodes:
+
+- start timestamps as delta-of-delta zigzag varints
+- durations (end - start) and UTC offsets as delta zigzag varints
+- values XOR-ed with the previous value's float64 bits, storing only the
+  non-zero bytes
+
+and the whole payload is zlib-compressed. Blocks are indexed by
+(type, chunk_start) so readers only decode the chunks covering a query.
+"""
+
+import math
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from . import database
+
+
+# Record types moved into block storage after import
+BLOCK_TYPES = {
+    "HKQuantityTypeIdentifierHeartRate",
+    "HKQuantityTypeIdentifierActiveEnergyBurned",
+    "HKQuantityTypeIdentifierBasalEnergyBurned",
+    "HKQuantityTypeIdentifierDistanceWalkingRunning",
+}
+
+# Fixed time range covered by a block
+CHUNK_SECONDS = 86400
+
+# Samples buffered before pending blocks are flushed during compaction
+FLUSH_SAMPLES = 50000
+
+_NAN_BITS = struct.unpack(">Q", struct.pack(">d", math.nan))[0]
+
+
+def _write_varint(out: bytearray, value: int):
+    """Append a zigzag-encoded signed varint."""
+    value = (value << 1) ^ (value >> 63)
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple:
+    """Read a zigzag-encoded signed varint, returning (value, new_pos)."""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (result >> 1) ^ -(result & 1), pos
+
+
+def encode_block(timestamps: list, durations: list, offsets: list, values: list) -> bytes:
+    """Encode parallel sample lists into a compressed block.
+
+    Timestamps and durations are whole seconds, offsets are UTC offsets in
+    minutes and values are floats or None.
+    """
+    out = bytearray()
+    _write_varint(out, len(timestamps))
+
+    prev_ts = 0
+    prev_delta = 0
+    for ts in timestamps:
+        delta = ts - prev_ts
+        _write_varint(out, delta - prev_delta)
+        prev_ts, prev_delta = ts, delta
+
+    for series in (durations, offsets):
+        prev = 0
+        for item in series:
+            _write_varint(out, item - prev)
+            prev = item
+
+    prev_bits = 0
+    for value in values:
+        bits = _NAN_BITS if value is None else struct.unpack(">Q", struct.pack(">d", value))[0]
+        xor = bits ^ prev_bits
+        prev_bits = bits
+        if xor == 0:
+            out.append(0)
+            continue
+        raw = xor.to_bytes(8, "big")
+        leading = (64 - xor.bit_length()) // 8
+        trailing = (((xor & -xor).bit_length() - 1) // 8)
+        # Control byte: 0x80 marks a change, then leading/trailing zero bytes
+        out.append(0x80 | (leading << 3) | trailing)
+        out += raw[leading:8 - trailing]
+
+    return zlib.compress(bytes(out))
+
+
+def decode_block(blob: bytes) -> tuple:
+    """Decode a block into (timestamps, durations, offsets, values) lists."""
+    data = zlib.decompress(blob)
+    count, pos = _read_varint(data, 0)
+
+    timestamps = []
+    prev_ts = 0
+    prev_delta = 0
+    for _ in range(count):
+        dod, pos = _read_varint(data, pos)
+        prev_delta += dod
+        prev_ts += prev_delta
+        timestamps.append(prev_ts)
+
+    decoded = []
+    for _ in range(2):
+        series = []
+        prev = 0
+        for _ in range(count):
+            delta, pos = _read_varint(data, pos)
+            prev += delta
+            series.append(prev)
+        decoded.append(series)
+
+    values = []
+    prev_bits = 0
+    for _ in range(count):
+        control = data[pos]
+        pos += 1
+        if control:
+            leading = (control >> 3) & 0x07
+            trailing = control & 0x07
+            width = 8 - leading - trailing
+            xor = int.from_bytes(data[pos:pos + width], "big") << (8 * trailing)
+            pos += width
+            prev_bits ^= xor
+        value = struct.unpack(">d", prev_bits.to_bytes(8, "big"))[0]
+        values.append(None if math.isnan(value) else value)
+
+    return timestamps, decoded[0], decoded[1], values
+
+
+def _split_date(value: str) -> tuple:
+    """Parse an ISO date string into (epoch seconds, UTC offset minutes)."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp()), int(parsed.utcoffset().total_seconds() // 60)
+
+
+def _format_date(ts: int, offset: int) -> str:
+    return datetime.fromtimestamp(ts, timezone(timedelta(minutes=offset))).isoformat()
+
+
+def format_timestamp(ts: Optional[int]) -> Optional[str]:
+    """Format a block timestamp as a UTC ISO date string."""
+    return None if ts is None else _format_date(ts, 0)
+
+
+def utc_date(value: Optional[str]) -> Optional[str]:
+    """Convert an ISO date string with any UTC offset to the UTC form block timestamps format to."""
+    return None if value is None else format_timestamp(_split_date(value)[0])
+
+
+class BlockWriter:
+    """Buffers samples per (series, chunk) and writes them as blocks."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.series_ids = {}
+        self.pending = {}
+        self.buffered = 0
+
+    def _series_id(self, record_type, unit, source_name, device) -> int:
+        key = (record_type, unit, source_name, device)
+        if key not in self.series_ids:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT id FROM sample_series
+                WHERE type = ? AND unit IS ? AND source_name IS ? AND device IS ?
+            """, key)
+            row = cursor.fetchone()
+            if row:
+                self.series_ids[key] = row[0]
+            else:
+                cursor.execute(
+                    "INSERT INTO sample_series (type, unit, source_name, device) VALUES (?, ?, ?, ?)",
+                    key
+                )
+                self.series_ids[key] = cursor.lastrowid
+        return self.series_ids[key]
+
+    def add(self, record: tuple):
+        """Buffer one record in health_records column order."""
+        record_type, value, unit, start_date, end_date, source_name, device = record
+        series_id = self._series_id(record_type, unit, source_name, device)
+        start_ts, offset = _split_date(start_date)
+        end_ts, _ = _split_date(end_date)
+        key = (series_id, record_type, start_ts - start_ts % CHUNK_SECONDS)
+        self.pending.setdefault(key, []).append((start_ts, end_ts - start_ts, offset, value))
+        self.buffered += 1
+        if self.buffered >= FLUSH_SAMPLES:
+            self.flush()
+
+    def flush(self):
+        """Encode and insert all buffered blocks."""
+        rows = []
+        for (series_id, record_type, chunk_start), samples in self.pending.items():
+            samples.sort(key=lambda s: s[0])
+            timestamps, durations, offsets, values = (list(c) for c in zip(*samples))
+            rows.append((
+                series_id, record_type, chunk_start, timestamps[0], timestamps[-1],
+                len(samples), encode_block(timestamps, durations, offsets, values)
+            ))
+        self.conn.executemany("""
+            INSERT INTO sample_blocks (series_id, type, chunk_start, first_ts, last_ts, samples, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        self.pending = {}
+        self.buffered = 0
+
+
+def compact_range(conn, min_id: int, max_id: int, types: set = BLOCK_TYPES):
+    """Move rows of block types with ids in (min_id, max_id] into blocks.
+
+    Runs on the caller's connection without committing, so a migration
+    backfill can record its progress in the same transaction.
+    """
+    placeholders = ", ".join("?" * len(types))
+    params = (*sorted(types), min_id, max_id)
+    writer = BlockWriter(conn)
+    read_cursor = conn.cursor()
+    read_cursor.execute(f"""
+        SELECT type, value, unit, start_date, end_date, source_name, device
+        FROM health_records WHERE type IN ({placeholders}) AND id > ? AND id <= ?
+    """, params)
+    while rows := read_cursor.fetchmany(5000):
+        for row in rows:
+            writer.add(tuple(row))
+    writer.flush()
+    conn.execute(f"DELETE FROM health_records WHERE type IN ({placeholders}) AND id > ? AND id <= ?", params)
+
+
+def compact_records(types: set = BLOCK_TYPES):
+    """Move high-frequency rows from health_records into block storage.
+
+    Runs after all summaries have been computed from health_records, since
+    those aggregations read the raw rows directly.
+    """
+    with database.get_connection() as conn:
+        compact_range(conn, 0, database.MAX_ROWID, types)
+        conn.commit()
+
+
+def read_samples(
+    record_type: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    source_name: Optional[str] = None,
+    conn=None
+) -> Iterator[tuple]:
+    """Yield block-stored samples of a type in [start, end], ordered by time.
+
+    Records are yielded in health_records column order (type, value, unit,
+    start_date, end_date, source_name, device). Only blocks whose chunk
+    overlaps the range (and series from `source_name`, if given) are
+    decoded. Uses `conn` if passed, otherwise opens and closes its own.
+    """
+    start_ts = int(start.timestamp()) if start else None
+    end_ts = int(end.timestamp()) if end else None
+
+    conditions = ["b.type = ?"]
+    params = [record_type]
+    if start_ts is not None:
+        conditions.append("b.chunk_start >= ?")
+        params.append(start_ts - start_ts % CHUNK_SECONDS)
+    if end_ts is not None:
+        conditions.append("b.chunk_start <= ?")
+        params.append(end_ts)
+    if source_name is not None:
+        conditions.append("s.source_name = ?")
+        params.append(source_name)
+
+    owns_conn = conn is None
+    if owns_conn:
+        conn = database.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT b.chunk_start, b.data, s.unit, s.source_name, s.device
+        FROM sample_blocks b JOIN sample_series s ON s.id = b.series_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY b.chunk_start, b.id
+    """, params)
+
+    chunk = None
+    samples = []
+    try:
+        for chunk_start, data, unit, source_name, device in cursor:
+            if chunk_start != chunk:
+                yield from _emit(record_type, samples, start_ts, end_ts)
+                chunk = chunk_start
+                samples = []
+            for ts, duration, offset, value in zip(*decode_block(data)):
+                samples.append((ts, duration, offset, value, unit, source_name, device))
+        yield from _emit(record_type, samples, start_ts, end_ts)
+    finally:
+        if owns_conn:
+            conn.close()
+
+
+def _emit(record_type: str, samples: list, start_ts: Optional[int], end_ts: Optional[int]) -> Iterator[tuple]:
+    samples.sort(key=lambda s: s[0])
+    for ts, duration, offset, value, unit, source_name, device in samples:
+        if start_ts is not None and ts < start_ts:
+            continue
+        if end_ts is not None and ts > end_ts:
+            continue
+        yield (
+            record_type, value, unit, _format_date(ts, offset),
+            _format_date(ts + duration, offset), source_name, device
+        )
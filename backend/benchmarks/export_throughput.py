@@ -0,0 +1,77 @@
+"""
+Export throughput benchmark.
+
+Seeds a temporary database with raw step records and block-stored heart rate
+samples, then drains the NDJSON and CSV export streams and reports MB/s and
+peak Python heap usage. Peak memory should stay flat as --records grows.
+
+Run from backend/:
+
+    python -m benchmarks.export_throughput --records 1000000
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app import database, export, timeseries
+
+
+def seed(records: int):
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    for i in range(records):
+        stamp = (start + timedelta(seconds=i * 30)).isoformat()
+        if i % 2:
+            batch.append(("HKQuantityTypeIdentifierHeartRate", 60 + i % 40, "count/min", stamp, stamp, "Apple Watch", None))
+        else:
+            batch.append(("HKQuantityTypeIdentifierStepCount", i % 200, "count", stamp, stamp, "iPhone", None))
+        if len(batch) == 50000:
+            database.insert_health_records(batch)
+            batch = []
+    if batch:
+        database.insert_health_records(batch)
+    timeseries.compact_records()
+
+
+def measure(fmt: str) -> tuple:
+    """Drain one export, returning (bytes, seconds, peak heap bytes).
+
+    Peak heap comes from a second, traced pass since tracing slows the
+    export several times over.
+    """
+    began = time.perf_counter()
+    total = sum(len(chunk) for chunk in export.stream_records(fmt))
+    elapsed = time.perf_counter() - began
+
+    tracemalloc.start()
+    for _ in export.stream_records(fmt):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "bench.db"
+        database.init_database()
+        seed(args.records)
+
+        for fmt in ("ndjson", "csv"):
+            total, elapsed, peak = measure(fmt)
+            print(
+                f"{fmt:>6}: {total / 1e6:8.1f} MB in {elapsed:6.2f}s = {total / 1e6 / elapsed:6.1f} MB/s, "
+                f"peak heap {peak / 1e6:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+API load test with latency SLOs.
+
+Builds a database holding years of synthetic Apple Health data (raw step,
+heart rate, energy and distance samples, sleep and workouts) through the
+same post-import stages as an import (app.parser.build_derived_data), and keeps
+it for later runs. It then drives the ASGI app in-process, over httpx's
+ASGITransport like the tests' SyncTestClient, with a fixed number of
+concurrent clients per endpoint, and reports p50/p95/p99 latency and
+requests/sec, each the median of --runs passes.
+
+Runs exit non-zero when an endpoint misses its SLO in slo.json (or --slo),
+so the harness can gate changes. Latency limits are only enforced with at
+least MIN_SLO_SAMPLES requests per pass, since a p99 over a handful of
+requests is one unlucky request. The response cache is disabled unless
+--cache is given, so handlers and SQLite are measured rather than cache hits.
+
+Run from backend/:
+
+    python -m benchmarks.load_test --years 10 --concurrency 8 --requests 200
+
+The default sample rates give about 1.6 million records over ten years;
+--hr-interval 10 gives tens of millions, as a long-worn watch produces.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+
+from app import cache, database, goals
+from app.main import app
+from app.parser import build_derived_data
+
+
+SLO_PATH = Path(__file__).parent / "slo.json"
+
+# Records per insert batch while seeding
+SEED_BATCH = 50000
+
+# Fewer requests per pass than this only report latency, never fail on it
+MIN_SLO_SAMPLES = 100
+
+DASHBOARD_WIDGETS = [
+    {"id": "summary", "type": "summary"},
+    {"id": "steps", "type": "metric", "params": {"metric": "steps", "days": 30}},
+    {"id": "trends", "type": "trends", "params": {"days": 30}},
+    {"id": "correlations", "type": "correlations", "params": {"days": 90}},
+    {"id": "weekly", "type": "weekly_summary"},
+]
+
+TZ = timezone(timedelta(hours=-5))
+
+
+def _iso(day: date, seconds: int) -> str:
+    return (datetime(day.year, day.month, day.day, tzinfo=TZ) + timedelta(seconds=seconds)).isoformat()
+
+
+def _day_records(rng: random.Random, day: date, hr_interval: int) -> list:
+    """Synthetic samples for one day, in health_records column order."""
+    records = []
+    for hour in range(7, 23):
+        start = hour * 3600
+        steps = rng.randint(0, 1500)
+        records.append(("HKQuantityTypeIdentifierStepCount", steps, "count", _iso(day, start), _iso(day, start + 3600), "iPhone", None))
+        records.append(("HKQuantityTypeIdentifierDistanceWalkingRunning", steps * 0.0007, "km", _iso(day, start), _iso(day, start + 3600), "iPhone", None))
+        records.append(("HKQuantityTypeIdentifierFlightsClimbed", rng.randint(0, 3), "count", _iso(day, start), _iso(day, start + 3600), "iPhone", None))
+    for start in range(0, 86400, 900):
+        records.append(("HKQuantityTypeIdentifierActiveEnergyBurned", rng.uniform(0, 40), "kcal", _iso(day, start), _iso(day, start + 900), "Apple Watch", None))
+    bpm = 65.0
+    for start in range(0, 86400, hr_interval):
+        bpm = min(180.0, max(45.0, bpm + rng.gauss(0, 3) + (65.0 - bpm) * 0.05))
+        records.append(("HKQuantityTypeIdentifierHeartRate", round(bpm), "count/min", _iso(day, start), _iso(day, start), "Apple Watch", None))
+    records.append(("HKQuantityTypeIdentifierRestingHeartRate", rng.randint(52, 68), "count/min", _iso(day, 0), _iso(day, 0), "Apple Watch", None))
+    if rng.random() < 0.5:
+        records.append(("HKQuantityTypeIdentifierBodyMass", rng.uniform(70, 80), "kg", _iso(day, 25200), _iso(day, 25200), "Withings", None))
+    return records
+
+
+def seed(years: int, hr_interval: int) -> int:
+    """Fill the current database the way an import would; return the record count."""
+    rng = random.Random(0)
+    end = date.today() - timedelta(days=1)
+    days = [end - timedelta(days=i) for i in range(365 * years)][::-1]
+
+    total = 0
+    batch, sleep, workouts = [], [], []
+    for day in days:
+        batch.extend(_day_records(rng, day, hr_interval))
+        bedtime = 23 * 3600 + rng.randint(-3600, 3600)
+        for stage, minutes in (("HKCategoryValueSleepAnalysisAsleepCore", 180), ("HKCategoryValueSleepAnalysisAsleepDeep", 90), ("HKCategoryValueSleepAnalysisAsleepREM", 120)):
+            sleep.append((stage, _iso(day, bedtime), _iso(day, bedtime + minutes * 60), "Apple Watch"))
+            bedtime += minutes * 60
+        if rng.random() < 0.4:
+            minutes = rng.uniform(20, 60)
+            workouts.append(("HKWorkoutActivityTypeRunning", minutes, minutes / 6, minutes * 10, _iso(day, 64800), _iso(day, 64800 + int(minutes * 60)), "Apple Watch"))
+        if len(batch) >= SEED_BATCH:
+            database.insert_health_records(batch)
+            total += len(batch)
+            batch = []
+    database.insert_health_records(batch)
+    database.insert_sleep_records(sleep)
+    database.insert_workouts(workouts)
+    total += len(batch) + len(sleep) + len(workouts)
+
+    # Goals are settings, so one exists before the import stages run
+    goals.save_goal("steps", 10000, "at_least", "10k steps")
+    build_derived_data()
+    database.detect_units_from_data()
+    database.update_import_status("complete", 100, total)
+    return total
+
+
+def endpoints(first: date, last: date) -> dict:
+    """Endpoint name -> URL, or (URL, JSON body) to POST, with dates inside the seeded range."""
+    month = last - timedelta(days=30)
+    year = last - timedelta(days=365)
+    return {
+        "health.summary": f"/api/health/summary?target_date={last}",
+        "health.range_month": f"/api/health/range?start={month}&end={last}",
+        "health.range_all": f"/api/health/range?start={first}&end={last}",
+        "health.metric_year": f"/api/health/metrics/steps?start={last - timedelta(days=365)}&end={last}",
+        "health.metric_all_columnar": f"/api/health/metrics/heart_rate?start={first}&end={last}&format=columnar",
+        "health.intraday": f"/api/health/heart-rate/intraday?start={last}T00:00:00&end={last}T23:59:00",
+        "health.workouts": f"/api/health/workouts?start={month}&end={last}",
+        "health.sleep_sessions": f"/api/health/sleep/sessions?start={month}&end={last}",
+        "health.records": f"/api/health/records?type=HKQuantityTypeIdentifierStepCount&start={month}&end={last}",
+        "insights.trends": "/api/insights/trends?days=90",
+        "insights.correlations": "/api/insights/correlations?days=365",
+        "insights.lagged_correlations": "/api/insights/lagged-correlations?days=365",
+        "insights.rolling": f"/api/insights/rolling/steps?method=ewma&window=28&start={year}&end={last}",
+        "insights.anomalies": f"/api/insights/anomalies?since={year}",
+        "insights.heatmap": f"/api/insights/heatmap/steps?year={last.year}",
+        "insights.records": "/api/insights/records",
+        "insights.weekly_summary": "/api/insights/weekly-summary",
+        "goals.list": "/api/goals",
+        "goals.streaks": "/api/goals/1/streaks",
+        "dashboard": ("/api/dashboard", {"widgets": DASHBOARD_WIDGETS}),
+    }
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return math.nan
+    rank = max(1, math.ceil(pct / 100 * len(samples)))
+    return samples[rank - 1]
+
+
+def _send(client: AsyncClient, target):
+    if isinstance(target, tuple):
+        url, body = target
+        return client.post(url, json=body)
+    return client.get(target)
+
+
+async def drive(client: AsyncClient, target, requests: int, concurrency: int) -> dict:
+    """Issue `requests` requests from `concurrency` clients; return latency stats."""
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            began = time.perf_counter()
+            response = await _send(client, target)
+            latencies.append(time.perf_counter() - began)
+            if response.status_code != 200:
+                errors += 1
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def median_stats(passes: list) -> dict:
+    """Combine the stats of several passes: summed counts, median rates and latencies."""
+    combined = {
+        "requests": sum(stats["requests"] for stats in passes),
+        "errors": sum(stats["errors"] for stats in passes),
+        "runs": len(passes),
+    }
+    for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+        combined[key] = statistics.median(stats[key] for stats in passes)
+    return combined
+
+
+def check_slos(results: dict, slos: dict, min_samples: int = MIN_SLO_SAMPLES) -> list:
+    """Get a message for every SLO an endpoint missed."""
+    failures = []
+    for name, limits in slos.items():
+        stats = results.get(name)
+        if stats is None:
+            continue
+        if stats["errors"]:
+            failures.append(f"{name}: {stats['errors']} non-200 responses")
+        enforce_latency = stats["requests"] / stats.get("runs", 1) >= min_samples
+        for key, limit in limits.items():
+            if key != "min_rps" and not enforce_latency:
+                continue
+            if key == "min_rps":
+                if stats["rps"] < limit:
+                    failures.append(f"{name}: {stats['rps']:.1f} req/s < {limit}")
+            elif stats[key] > limit:
+                failures.append(f"{name}: {key} {stats[key]:.1f} ms > {limit}")
+    return failures
+
+
+async def run(urls: dict, requests: int, concurrency: int, warmup: int, runs: int) -> dict:
+    results = {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, target in urls.items():
+            for _ in range(warmup):
+                await _send(client, target)
+            passes = [await drive(client, target, requests, concurrency) for _ in range(runs)]
+            results[name] = median_stats(passes)
+            stats = results[name]
+            print(
+                f"{name:<30}{stats['rps']:>9.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+                f"{stats['errors']:>8}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--hr-interval", type=int, default=300, help="seconds between heart rate samples")
+    parser.add_argument("--db", type=Path, help="seeded database to reuse (built if missing)")
+    parser.add_argument("--rebuild", action="store_true", help="reseed even if the database exists")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and pass")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3, help="passes per endpoint; the median is reported")
+    parser.add_argument("--only", help="comma-separated endpoint names")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--slo", type=Path, default=SLO_PATH)
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+
+    db_path = args.db or Path(tempfile.gettempdir()) / f"health-load-{args.years}y-{args.hr_interval}s.db"
+    database.DATABASE_PATH = db_path
+    if args.rebuild and db_path.exists():
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+    if not db_path.exists():
+        database.init_database()
+        began = time.perf_counter()
+        total = seed(args.years, args.hr_interval)
+        print(f"seeded {total:,} records into {db_path} in {time.perf_counter() - began:.0f}s")
+    database.init_database()
+
+    if not args.cache:
+        cache.response_cache.max_entries = 0
+
+    first, last = (date.fromisoformat(value) for value in database.get_date_range())
+    urls = endpoints(first, last)
+    if args.only:
+        urls = {name: urls[name] for name in args.only.split(",")}
+
+    print(f"{db_path.stat().st_size / 1e6:.0f} MB, {first} .. {last}, concurrency {args.concurrency}")
+    print(f"{'endpoint':<30}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    results = asyncio.run(run(urls, args.requests, args.concurrency, args.warmup, args.runs))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    slos = json.loads(args.slo.read_text()) if args.slo.exists() else {}
+    if args.requests < MIN_SLO_SAMPLES:
+        print(f"fewer than {MIN_SLO_SAMPLES} requests per pass: latency SLOs are reported, not enforced")
+    failures = check_slos(results, slos)
+    for failure in failures:
+        print(f"SLO missed: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Serialization benchmark for the list endpoints.
+
+Seeds a temporary database with years of daily and hourly summaries and
+workouts, then times, per endpoint payload:
+
+- query: reading the rows, as sqlite3.Row converted with dict() (before)
+  or tuple rows zipped with the column names once (after)
+- serialize: jsonable_encoder plus the stdlib JSONResponse (before) or
+  ORJSONResponse (after)
+
+and reports each side's share of the total.
+
+Run from backend/:
+
+    python -m benchmarks.serialization --years 10
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app import database
+
+
+def seed(years: int):
+    rng = random.Random(0)
+    start = date.today() - timedelta(days=365 * years)
+    days = [start + timedelta(days=i) for i in range(365 * years)]
+    with database.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO daily_summary (date, steps, active_calories, resting_heart_rate, sleep_hours, distance_km) VALUES (?, ?, ?, ?, ?, ?)",
+            [(d.isoformat(), rng.randint(2000, 15000), rng.uniform(200, 900), rng.uniform(50, 70), rng.uniform(5, 9), rng.uniform(1, 12)) for d in days],
+        )
+        conn.executemany(
+            "INSERT INTO hourly_summary (period, steps, active_calories, heart_rate) VALUES (?, ?, ?, ?)",
+            [(f"{d.isoformat()}T{h:02d}", rng.randint(0, 2000), rng.uniform(0, 80), rng.uniform(50, 120)) for d in days for h in range(24)],
+        )
+        conn.executemany(
+            "INSERT INTO workouts (workout_type, duration_minutes, total_distance, total_energy_burned, start_date, end_date, source_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [("HKWorkoutActivityTypeRunning", 30.0, 5.0, 300.0, f"{d.isoformat()}T07:00:00+00:00", f"{d.isoformat()}T07:30:00+00:00", "Apple Watch") for d in days],
+        )
+        conn.commit()
+    return start, days[-1]
+
+
+def _old_rows(sql: str, params: tuple) -> list:
+    with database.get_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+    return rows
+
+
+def _timed(fn, repeat: int = 3) -> tuple:
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = Path(tmp) / "bench.db"
+        database.init_database()
+        start, end = seed(args.years)
+
+        cases = {
+            "/range (day)": (
+                lambda: _old_rows("SELECT * FROM daily_summary WHERE date >= ? AND date <= ? ORDER BY date", (start.isoformat(), end.isoformat())),
+                lambda: database.get_summaries_in_range(start, end),
+                "summaries",
+            ),
+            "/metrics (hour)": (
+                lambda: [{"date": r["date"], "value": r["value"]} for r in _old_rows(
+                    "SELECT period as date, heart_rate as value FROM hourly_summary WHERE period >= ? AND period <= ? ORDER BY period",
+                    (start.isoformat(), f"{end.isoformat()}T23:59:59"))],
+                lambda: database.get_metric_history("heart_rate", start, end, "hour"),
+                "data",
+            ),
+            "/workouts": (
+                lambda: _old_rows("SELECT * FROM workouts ORDER BY start_date DESC, id DESC", ()),
+                lambda: database.get_all_workouts(start, end),
+                "workouts",
+            ),
+        }
+
+        print(f"{'endpoint':<18}{'rows':>8}  {'before: query / serialize (share)':>36}  {'after: query / serialize (share)':>36}")
+        for name, (old_query, new_query, key) in cases.items():
+            old_q, old_rows = _timed(old_query)
+            old_s, _ = _timed(lambda: JSONResponse(jsonable_encoder({key: old_rows, "count": len(old_rows)})).body)
+            new_q, new_rows = _timed(new_query)
+            new_s, _ = _timed(lambda: ORJSONResponse({key: new_rows, "count": len(new_rows)}).body)
+            print(
+                f"{name:<18}{len(new_rows):>8}  "
+                f"{old_q * 1000:>12.1f} / {old_s * 1000:7.1f} ms ({old_s / (old_q + old_s):4.0%})  "
+                f"{new_q * 1000:>12.1f} / {new_s * 1000:7.1f} ms ({new_s / (new_q + new_s):4.0%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
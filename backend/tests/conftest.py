@@ -2,6 +2,7 @@ import pytest
 import tempfile
 import os
 import asyncio
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from httpx import ASGITransport, AsyncClient
 
@@ -10,7 +11,7 @@ TEST_DATA_DIR = tempfile.mkdtemp()
 os.environ["HEALTH_DATA_DIR"] = TEST_DATA_DIR
 
 from app.main import app
-from app import database
+from app import cache, database, querylog
 
 
 class SyncTestClient:
@@ -33,6 +34,9 @@ class SyncTestClient:
     def post(self, url, **kwargs):
         return self._run(self._request('post', url, **kwargs))
 
+    def put(self, url, **kwargs):
+        return self._run(self._request('put', url, **kwargs))
+
     def delete(self, url, **kwargs):
         return self._run(self._request('delete', url, **kwargs))
 
@@ -43,11 +47,22 @@ def client():
     # Override database path for tests
     database.DATABASE_PATH = Path(TEST_DATA_DIR) / "test_health.db"
     database.init_database()
+    cache.response_cache.clear()
+
+    # Fail any test whose data requests fully scan health_records
+    querylog.strict = True
+    querylog.clear()
 
     test_client = SyncTestClient(app)
     yield test_client
 
+    violations = querylog.plan_violations()
+    querylog.strict = False
+    if violations:
+        pytest.fail(f"Full scan of health_records while serving a request: {violations}")
+
     # Cleanup
+    database.close_pools()
     if database.DATABASE_PATH.exists():
         database.DATABASE_PATH.unlink()
 
@@ -60,10 +75,28 @@ def db():
     yield database
 
     # Cleanup
+    database.close_pools()
     if database.DATABASE_PATH.exists():
         database.DATABASE_PATH.unlink()
 
 
+@pytest.fixture
+def steps():
+    """Build step records for consecutive days from 2024-01-01; None leaves a day out."""
+    def build(values: list) -> list:
+        records = []
+        for offset, value in enumerate(values):
+            if value is None:
+                continue
+            start = datetime(2024, 1, 1, 8, tzinfo=timezone.utc) + timedelta(days=offset)
+            records.append((
+                "HKQuantityTypeIdentifierStepCount", value, "count",
+                start.isoformat(), (start + timedelta(hours=1)).isoformat(), "iPhone", None
+            ))
+        return records
+    return build
+
+
 @pytest.fixture
 def sample_health_xml():
     """Create a minimal sample Apple Health export XML."""
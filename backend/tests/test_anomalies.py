@@ -0,0 +1,131 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app import anomalies
+
+
+def _daily_steps(days: int, spike_day: int = None) -> list:
+    """Steady daily step counts, with an outlier on spike_day."""
+    return [100000 if offset == spike_day else 5000 + (offset % 5) * 100 for offset in range(days)]
+
+
+def _heart_rate(spike_minutes: range) -> list:
+    records = []
+    start = datetime(2024, 1, 5, 6, tzinfo=timezone.utc)
+    for minute in range(180):
+        bpm = 150 if minute in spike_minutes else 60 + minute % 5
+        moment = (start + timedelta(minutes=minute)).isoformat()
+        records.append(("HKQuantityTypeIdentifierHeartRate", bpm, "count/min", moment, moment, "Apple Watch", None))
+    return records
+
+
+def _scores(db, metric: str) -> dict:
+    conn = db.get_connection()
+    rows = conn.execute("SELECT date, score FROM anomaly_scores WHERE metric = ?", (metric,)).fetchall()
+    conn.close()
+    return dict((row[0], row[1]) for row in rows)
+
+
+class TestRobustScores:
+    """Tests for the rolling median/MAD z-score."""
+
+    def test_scores_against_previous_days(self):
+        """Test each day is scored against the window before it, not itself."""
+        series = np.array([10.0, 12, 11, 13, 10, 12, 11, 40, 11])
+
+        median, mad, score = anomalies.robust_scores(series, window=7, min_history=7)
+
+        assert np.isnan(score[:7]).all()
+        assert median[7] == 11
+        assert mad[7] == 1
+        assert score[7] == pytest.approx(0.6745 * 29)
+        # The outlier barely moves the next day's baseline
+        assert median[8] == 12
+
+    def test_missing_days_and_flat_windows(self):
+        """Test gaps count against the history and a zero MAD gives no score."""
+        series = np.array([5.0, np.nan, 5, 5, 5, 9])
+
+        median, mad, score = anomalies.robust_scores(series, window=5, min_history=4)
+
+        assert np.isnan(median[4])
+        assert median[5] == 5
+        assert mad[5] == 0
+        assert np.isnan(score[5])
+
+
+class TestDailyAnomalies:
+    """Tests for persisted daily scores."""
+
+    def test_scores_every_day(self, db, steps):
+        """Test every day with a value is stored and the outlier stands out."""
+        db.insert_health_records(steps(_daily_steps(40, spike_day=30)))
+        db.compute_daily_summaries()
+
+        result = anomalies.compute_anomalies()
+
+        scores = _scores(db, "steps")
+        assert result["daily_scores"] == 40
+        assert len(scores) == 40
+        assert scores["2024-01-01"] is None
+        assert scores["2024-01-31"] > 100
+        assert all(abs(score) < 3.5 for day, score in scores.items() if score is not None and day != "2024-01-31")
+
+    def test_rescores_only_the_changed_tail(self, db, steps):
+        """Test unchanged days are kept and new days are scored on a rerun."""
+        db.insert_health_records(steps(_daily_steps(40)))
+        db.compute_daily_summaries()
+        anomalies.compute_anomalies()
+
+        assert anomalies.compute_anomalies()["daily_scores"] == 0
+
+        db.clear_database(keep_derived=True)
+        db.insert_health_records(steps(_daily_steps(45, spike_day=42)))
+        db.compute_daily_summaries()
+
+        assert anomalies.compute_anomalies()["daily_scores"] == 5
+        assert _scores(db, "steps")["2024-02-12"] > 100
+
+    def test_clear_drops_scores(self, db, steps):
+        """Test clearing all data also removes the anomaly scores."""
+        db.insert_health_records(steps(_daily_steps(20)))
+        db.compute_daily_summaries()
+        anomalies.compute_anomalies()
+
+        db.clear_database()
+
+        assert _scores(db, "steps") == {}
+
+
+class TestHeartRateSpikes:
+    """Tests for intraday heart rate spike detection."""
+
+    def test_consecutive_minutes_form_one_spike(self, db):
+        """Test a run of high minutes is stored once, at its peak."""
+        db.insert_health_records(_heart_rate(range(100, 103)))
+        db.compute_heart_rate_minutes()
+
+        assert anomalies.compute_anomalies()["heart_rate_days"] == 1
+
+        spikes = db.get_heart_rate_spikes(date(2024, 1, 1))
+        assert len(spikes) == 1
+        assert spikes[0]["date"] == "2024-01-05"
+        assert spikes[0]["bpm"] == 150
+        assert spikes[0]["duration_minutes"] == 3
+        assert spikes[0]["baseline"] == 62
+        assert anomalies.compute_anomalies()["heart_rate_days"] == 0
+
+    def test_workout_minutes_are_ignored(self, db):
+        """Test high heart rate during a workout is not a spike."""
+        db.insert_health_records(_heart_rate(range(100, 103)))
+        db.insert_workouts([(
+            "HKWorkoutActivityTypeRunning", 10, 1, 100,
+            "2024-01-05T07:35:00+00:00", "2024-01-05T07:50:00+00:00", "Apple Watch"
+        )])
+        db.compute_heart_rate_minutes()
+
+        anomalies.compute_anomalies()
+
+        assert db.get_heart_rate_spikes(date(2024, 1, 1)) == []
@@ -22,6 +22,25 @@ class TestHealthAPI:
         assert "records_count" in data
         assert "date_range" in data
 
+    def test_get_record_types(self, client):
+        """Test the types endpoint and overview count come from the record catalog."""
+        from app import database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierHeartRate", 60 + i, "count/min", f"2024-01-14T08:0{i}:00+00:00",
+             f"2024-01-14T08:0{i}:00+00:00", "Apple Watch", None)
+            for i in range(5)
+        ])
+
+        types = client.get("/api/health/types").json()["types"]
+        overview = client.get("/api/overview").json()
+
+        assert types == [{
+            "type": "HKQuantityTypeIdentifierHeartRate", "records": 5,
+            "first_date": "2024-01-14T08:00:00+00:00", "last_date": "2024-01-14T08:04:00+00:00",
+            "unit": "count/min", "sources": [{"source_name": "Apple Watch", "records": 5}],
+        }]
+        assert overview["records_count"] == 5
+
     def test_get_status(self, client):
         """Test getting import status."""
         response = client.get("/api/status")
@@ -67,6 +86,107 @@ class TestHealthAPI:
         assert "data" in data
         assert "count" in data
 
+    def test_get_metric_history_resolution(self, client):
+        """Test requesting a metric at a rollup resolution."""
+        response = client.get("/api/health/metrics/steps?days=365&resolution=month")
+
+        assert response.status_code == 200
+        assert response.json()["resolution"] == "month"
+
+    def test_get_metric_history_auto_resolution(self, client):
+        """Test the server picks a resolution from the requested points."""
+        response = client.get("/api/health/metrics/steps?start=2020-01-01&end=2024-12-31&resolution=auto&points=50")
+
+        assert response.status_code == 200
+        assert response.json()["resolution"] == "month"
+
+    def test_get_metric_history_invalid_resolution(self, client):
+        """Test an unknown resolution is rejected."""
+        response = client.get("/api/health/metrics/steps?resolution=minute")
+
+        assert response.status_code == 422
+
+    def test_get_metric_history_hourly_unsupported(self, client):
+        """Test explicit hourly resolution for a metric without an hourly rollup is rejected."""
+        response = client.get("/api/health/metrics/weight?days=2&resolution=hour")
+
+        assert response.status_code == 400
+        assert "weight" in response.json()["detail"]
+
+    def test_get_metric_history_columnar(self, client):
+        """Test the columnar format returns parallel date and value arrays."""
+        from app import database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 1000 * day, "count",
+             f"2024-01-{day:02d}T12:00:00+00:00", f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None)
+            for day in range(1, 4)
+        ])
+        database.compute_daily_summaries()
+
+        response = client.get("/api/health/metrics/steps?start=2024-01-01&end=2024-01-31&format=columnar")
+
+        assert response.headers["content-type"] == "application/vnd.health.columnar+json"
+        data = response.json()
+        assert data["dates"] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+        assert data["values"] == [1000, 2000, 3000]
+
+    def test_get_metric_history_msgpack(self, client):
+        """Test MessagePack is negotiated from Accept and cached separately from JSON."""
+        import msgpack
+        from app import database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 1500, "count",
+             "2024-01-02T12:00:00+00:00", "2024-01-02T12:30:00+00:00", "iPhone", None)
+        ])
+        database.compute_daily_summaries()
+        url = "/api/health/metrics/steps?start=2024-01-01&end=2024-01-31"
+
+        json_response = client.get(url)
+        response = client.get(url, headers={"Accept": "application/msgpack"})
+
+        assert json_response.json()["data"] == [{"date": "2024-01-02", "value": 1500}]
+        assert response.headers["content-type"] == "application/msgpack"
+        data = msgpack.unpackb(response.content)
+        assert data["dates"] == ["2024-01-02"]
+        assert data["values"] == [1500]
+
+    def test_get_summaries_range_columnar(self, client):
+        """Test range summaries in the columnar format."""
+        response = client.get("/api/health/range?start=2024-01-01&end=2024-01-31&format=columnar")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 0
+        assert "date" in data["columns"]
+
+    def test_get_intraday_heart_rate_no_data(self, client):
+        """Test intraday heart rate with no samples."""
+        response = client.get("/api/health/heart-rate/intraday")
+
+        assert response.status_code == 200
+        assert response.json()["count"] == 0
+
+    def test_get_intraday_heart_rate(self, client):
+        """Test intraday heart rate buckets and downsampled line."""
+        from app import database
+        records = [
+            ("HKQuantityTypeIdentifierHeartRate", 60 + (i % 30), "count/min",
+             f"2024-01-14T{i // 60:02d}:{i % 60:02d}:00+00:00", f"2024-01-14T{i // 60:02d}:{i % 60:02d}:00+00:00",
+             "Apple Watch", None)
+            for i in range(600)
+        ]
+        database.insert_health_records(records)
+        database.compute_heart_rate_minutes()
+
+        response = client.get("/api/health/heart-rate/intraday?start=2024-01-14T00:00:00&end=2024-01-14T09:59:00&points=60")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["bucket_minutes"] == 10
+        assert data["count"] == 60
+        assert data["buckets"][0] == {"time": "2024-01-14T00:00:00+00:00", "min": 60, "avg": 64.5, "max": 69}
+        assert len(data["line"]) == 60
+
     def test_get_workouts(self, client):
         """Test getting workouts."""
         response = client.get("/api/health/workouts?days=30")
@@ -76,6 +196,149 @@ class TestHealthAPI:
         assert "workouts" in data
         assert "count" in data
 
+    def test_get_workouts_pages(self, client):
+        """Test workouts are paged newest first with a cursor."""
+        from app import database
+        database.insert_workouts([
+            ("HKWorkoutActivityTypeRunning", 30, 5.0, 300, f"2024-01-{day:02d}T07:00:00+00:00",
+             f"2024-01-{day:02d}T07:30:00+00:00", "Apple Watch")
+            for day in range(1, 6)
+        ])
+
+        first = client.get("/api/health/workouts?start=2024-01-01&end=2024-01-31&limit=3").json()
+        second = client.get(
+            f"/api/health/workouts?start=2024-01-01&end=2024-01-31&limit=3&cursor={first['next_cursor']}"
+        ).json()
+
+        dates = [w["start_date"][:10] for w in first["workouts"] + second["workouts"]]
+        assert dates == ["2024-01-05", "2024-01-04", "2024-01-03", "2024-01-02", "2024-01-01"]
+        assert second["next_cursor"] is None
+
+    def test_get_sleep_sessions(self, client):
+        """Test sleep sessions are listed by wake date, newest first."""
+        from app import database
+        database.insert_sleep_records([
+            ("HKCategoryValueSleepAnalysisAsleepCore", f"2024-01-{day:02d}T23:00:00+00:00",
+             f"2024-01-{day + 1:02d}T06:00:00+00:00", "Apple Watch")
+            for day in range(1, 4)
+        ])
+        database.compute_daily_summaries()
+
+        data = client.get("/api/health/sleep/sessions?start=2024-01-01&end=2024-01-03").json()
+
+        assert data["count"] == 2
+        assert [(s["date"], s["asleep_minutes"], s["efficiency"]) for s in data["sessions"]] == [
+            ("2024-01-03", 420, 1.0), ("2024-01-02", 420, 1.0)
+        ]
+
+    def test_get_summaries_range_pages(self, client):
+        """Test range summaries are paged in date order."""
+        from app import database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 1000, "count",
+             f"2024-01-{day:02d}T12:00:00+00:00", f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None)
+            for day in range(1, 8)
+        ])
+        database.compute_daily_summaries()
+
+        first = client.get("/api/health/range?start=2024-01-01&end=2024-01-31&limit=4").json()
+        second = client.get(
+            f"/api/health/range?start=2024-01-01&end=2024-01-31&limit=4&cursor={first['next_cursor']}"
+        ).json()
+
+        assert [s["date"] for s in first["summaries"]] == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+        assert [s["date"] for s in second["summaries"]] == ["2024-01-05", "2024-01-06", "2024-01-07"]
+        assert second["next_cursor"] is None
+
+    def test_get_summaries_range_unpaged(self, client):
+        """Test a range longer than a page is returned whole when no limit or cursor is given."""
+        from datetime import datetime, timedelta, timezone
+        from app import database
+        from app.routers.health import RANGE_PAGE_SIZE
+        first = datetime(2020, 1, 1, 12, tzinfo=timezone.utc)
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 1000, "count", (first + timedelta(days=offset)).isoformat(),
+             (first + timedelta(days=offset, minutes=30)).isoformat(), "iPhone", None)
+            for offset in range(RANGE_PAGE_SIZE + 100)
+        ])
+        database.compute_daily_summaries()
+
+        data = client.get("/api/health/range?start=2020-01-01&end=2024-12-31").json()
+
+        assert data["count"] == RANGE_PAGE_SIZE + 100
+        assert data["summaries"][-1]["date"] == (first + timedelta(days=RANGE_PAGE_SIZE + 99)).date().isoformat()
+        assert data["next_cursor"] is None
+
+    def test_get_records_pages(self, client):
+        """Test raw records are paged in start order."""
+        from app import database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", i, "count",
+             f"2024-01-14T10:{i:02d}:00+00:00", f"2024-01-14T10:{i:02d}:30+00:00", "iPhone", None)
+            for i in range(5)
+        ])
+
+        values = []
+        cursor = None
+        while True:
+            url = "/api/health/records?type=HKQuantityTypeIdentifierStepCount&limit=2"
+            data = client.get(url + (f"&cursor={cursor}" if cursor else "")).json()
+            values += [r["value"] for r in data["records"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+        assert values == [0, 1, 2, 3, 4]
+
+    def test_get_records_filters_by_utc_date(self, client):
+        """Test raw records near midnight in a non-UTC offset are bounded by their UTC date, like blocks."""
+        from app import database, timeseries
+        database.insert_health_records([
+            # 2024-01-15 04:00 UTC
+            ("HKQuantityTypeIdentifierStepCount", 1, "count",
+             "2024-01-14T23:00:00-05:00", "2024-01-14T23:30:00-05:00", "iPhone", None),
+            # 2024-01-14 23:30 UTC
+            ("HKQuantityTypeIdentifierStepCount", 2, "count",
+             "2024-01-15T08:30:00+09:00", "2024-01-15T08:45:00+09:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierHeartRate", 70, "count/min",
+             "2024-01-14T23:00:00-05:00", "2024-01-14T23:00:00-05:00", "Apple Watch", None),
+        ])
+        timeseries.compact_records()
+
+        steps = client.get("/api/health/records?type=HKQuantityTypeIdentifierStepCount&start=2024-01-15&end=2024-01-15").json()
+        heart_rate = client.get("/api/health/records?type=HKQuantityTypeIdentifierHeartRate&start=2024-01-15&end=2024-01-15").json()
+
+        assert [r["value"] for r in steps["records"]] == [1]
+        assert [r["value"] for r in heart_rate["records"]] == [70]
+
+    def test_get_block_records_pages(self, client):
+        """Test block-stored samples sharing a timestamp are not skipped between pages."""
+        from app import database, timeseries
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierHeartRate", 60 + i, "count/min",
+             f"2024-01-14T10:{i // 3:02d}:00+00:00", f"2024-01-14T10:{i // 3:02d}:00+00:00", f"Source {i % 3}", None)
+            for i in range(9)
+        ])
+        timeseries.compact_records()
+
+        values = []
+        cursor = None
+        while True:
+            url = "/api/health/records?type=HKQuantityTypeIdentifierHeartRate&start=2024-01-14&limit=2"
+            data = client.get(url + (f"&cursor={cursor}" if cursor else "")).json()
+            values += [r["value"] for r in data["records"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+        assert sorted(values) == [60 + i for i in range(9)]
+
+    def test_get_records_invalid_cursor(self, client):
+        """Test a malformed cursor is rejected."""
+        response = client.get("/api/health/records?type=HKQuantityTypeIdentifierStepCount&cursor=not-a-cursor")
+
+        assert response.status_code == 400
+
     def test_get_date_range(self, client):
         """Test getting available date range."""
         response = client.get("/api/health/date-range")
@@ -106,6 +369,130 @@ class TestInsightsAPI:
         data = response.json()
         assert "correlations" in data
 
+    def test_get_correlations_top_k(self, client):
+        """Test correlations cover every metric pair and honour top and the window."""
+        from app import database
+        database.insert_health_records([
+            record
+            for day in range(1, 11)
+            for record in (
+                ("HKQuantityTypeIdentifierStepCount", 1000 * day, "count", f"2024-01-{day:02d}T12:00:00+00:00",
+                 f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None),
+                ("HKQuantityTypeIdentifierDistanceWalkingRunning", 0.7 * day + (day % 2) * 0.3, "km",
+                 f"2024-01-{day:02d}T12:00:00+00:00", f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None),
+                ("HKQuantityTypeIdentifierFlightsClimbed", 20 - day + (day % 3) * 4, "count",
+                 f"2024-01-{day:02d}T12:00:00+00:00", f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None),
+            )
+        ])
+        database.compute_daily_summaries()
+
+        response = client.get("/api/insights/correlations?start=2024-01-01&end=2024-01-31&top=1")
+        matrix = client.get("/api/insights/correlations/matrix?start=2024-01-01&end=2024-01-31").json()
+
+        correlations = response.json()["correlations"]
+        assert len(correlations) == 1
+        assert (correlations[0]["metric1"], correlations[0]["metric2"]) == ("steps", "distance")
+        assert correlations[0]["correlation"] > 0.9
+        assert correlations[0]["samples"] == 10
+        assert correlations[0]["p_value"] < 0.001
+        steps, flights = matrix["metrics"].index("steps"), matrix["metrics"].index("flights")
+        assert matrix["r"][steps][flights] < 0
+        assert matrix["n"][steps][flights] == 10
+        assert matrix["r"][steps][matrix["metrics"].index("weight")] is None
+        assert matrix["days"] == 10
+
+    def test_get_lagged_correlations(self, client):
+        """Test lagged correlations rank pairs by lag and return a pair's lag profile."""
+        from app import database
+        database.insert_health_records([
+            record
+            for day in range(1, 21)
+            for record in (
+                ("HKQuantityTypeIdentifierStepCount", 1000 * (day % 7), "count", f"2024-01-{day:02d}T12:00:00+00:00",
+                 f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None),
+                ("HKQuantityTypeIdentifierFlightsClimbed", (day - 1) % 7, "count",
+                 f"2024-01-{day:02d}T12:00:00+00:00", f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None),
+            )
+        ])
+        database.compute_daily_summaries()
+        window = "start=2024-01-01&end=2024-01-31&max_lag=3"
+
+        top = client.get(f"/api/insights/lagged-correlations?{window}&top=1").json()["correlations"]
+        profile = client.get(f"/api/insights/lagged-correlations?{window}&metric1=steps&metric2=flights").json()
+        invalid = client.get(f"/api/insights/lagged-correlations?{window}&metric1=steps")
+
+        assert (top[0]["metric1"], top[0]["metric2"], top[0]["lag"]) == ("steps", "flights", 1)
+        assert top[0]["correlation"] == 1.0
+        assert [point["lag"] for point in profile["lags"]] == [-3, -2, -1, 0, 1, 2, 3]
+        assert profile["lags"][4]["correlation"] == 1.0
+        assert invalid.status_code == 400
+
+    def test_get_rolling_series(self, client):
+        """Test rolling series include warm-up days and are served from the cache on repeat."""
+        from app import cache, database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 1000 * day, "count", f"2024-01-{day:02d}T12:00:00+00:00",
+             f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None)
+            for day in range(1, 11) if day != 6
+        ])
+        database.compute_daily_summaries()
+        url = "/api/insights/rolling/steps?start=2024-01-04&end=2024-01-08&window=3"
+
+        sma = client.get(url).json()
+        median = client.get(url + "&method=median").json()
+        ewma = client.get(url + "&method=ewma&alpha=1").json()
+        hits = cache.response_cache.hits
+        client.get(url)
+
+        assert sma["dates"] == ["2024-01-04", "2024-01-05", "2024-01-06", "2024-01-07", "2024-01-08"]
+        assert sma["raw"] == [4000, 5000, None, 7000, 8000]
+        assert sma["values"] == [3000, 4000, 4500, 6000, 7500]
+        assert median["values"] == [3000, 4000, 4500, 6000, 7500]
+        assert ewma["values"] == [4000, 5000, 5000, 7000, 8000]
+        assert cache.response_cache.hits == hits + 1
+        assert client.get("/api/insights/rolling/nope").status_code == 400
+
+    def test_get_anomalies(self, client):
+        """Test anomalies are read from the scores computed at import."""
+        from app import anomalies, database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 40000 if day == 25 else 5000 + day % 3 * 200, "count",
+             f"2024-01-{day:02d}T12:00:00+00:00", f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None)
+            for day in range(1, 29)
+        ])
+        database.compute_daily_summaries()
+        anomalies.compute_anomalies()
+
+        data = client.get("/api/insights/anomalies?since=2024-01-01").json()
+        steps_only = client.get("/api/insights/anomalies?since=2024-01-01&metric=steps&min_score=0").json()
+        later = client.get("/api/insights/anomalies?since=2024-01-26").json()
+
+        assert [(a["metric"], a["date"], a["direction"]) for a in data["anomalies"]] == [("steps", "2024-01-25", "high")]
+        assert data["heart_rate_spikes"] == []
+        assert len(steps_only["anomalies"]) == 14
+        assert later["anomalies"] == []
+        assert client.get("/api/insights/anomalies?metric=nope").status_code == 400
+
+    def test_get_heatmap(self, client):
+        """Test heatmaps are served from the rows built at import."""
+        from app import database, heatmaps
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 1000 * day, "count", f"2024-03-{day:02d}T12:00:00+00:00",
+             f"2024-03-{day:02d}T12:30:00+00:00", "iPhone", None)
+            for day in range(1, 9)
+        ])
+        database.compute_daily_summaries()
+        heatmaps.compute_heatmaps()
+
+        data = client.get("/api/insights/heatmap/steps?year=2024").json()
+
+        year = data["years"][0]
+        assert (year["year"], year["start"], year["days"]) == (2024, "2024-01-01", 8)
+        # March 1st is day 61 of a leap year
+        assert year["buckets"][60:69] == [1, 1, 2, 2, 3, 3, 4, 4, 0]
+        assert client.get("/api/insights/heatmap/steps?year=2023").json()["years"] == []
+        assert client.get("/api/insights/heatmap/nope").status_code == 400
+
     def test_get_records(self, client):
         """Test getting personal records."""
         response = client.get("/api/insights/records")
@@ -121,6 +508,41 @@ class TestInsightsAPI:
         assert response.status_code == 200
 
 
+class TestGoalsAPI:
+    """Tests for goal endpoints."""
+
+    def test_goal_lifecycle(self, client):
+        """Test creating, reading, changing and deleting a goal."""
+        from app import database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", steps, "count", f"2024-01-{day:02d}T12:00:00+00:00",
+             f"2024-01-{day:02d}T12:30:00+00:00", "iPhone", None)
+            for day, steps in enumerate([12000, 9000, 11000, 13000], start=1)
+        ])
+        database.compute_daily_summaries()
+
+        created = client.post("/api/goals", json={"metric": "steps", "target": 10000, "name": "10k"})
+        goal_id = created.json()["id"]
+        listed = client.get("/api/goals").json()["goals"]
+        streaks = client.get(f"/api/goals/{goal_id}/streaks").json()["streaks"]
+        changed = client.put(f"/api/goals/{goal_id}", json={"metric": "steps", "target": 8000})
+
+        assert created.status_code == 201
+        assert [(g["name"], g["current_streak"], g["longest_streak"], g["completion_rate"]) for g in listed] == [
+            ("10k", 2, 2, 0.75)
+        ]
+        assert streaks[0] == {"start_date": "2024-01-03", "end_date": "2024-01-04", "days": 2}
+        assert changed.json()["current_streak"] == 4
+        assert client.delete(f"/api/goals/{goal_id}").status_code == 200
+        assert client.get(f"/api/goals/{goal_id}").status_code == 404
+
+    def test_invalid_goals(self, client):
+        """Test unknown metrics and comparisons are rejected."""
+        assert client.post("/api/goals", json={"metric": "nope", "target": 1}).status_code == 400
+        assert client.post("/api/goals", json={"metric": "steps", "target": 1, "comparison": "equal"}).status_code == 422
+        assert client.put("/api/goals/99", json={"metric": "steps", "target": 1}).status_code == 404
+
+
 class TestUploadAPI:
     """Tests for upload API endpoints."""
 
@@ -156,6 +578,61 @@ class TestUploadAPI:
         assert "cleared" in response.json()["message"]
 
 
+class TestAdminAPI:
+    """Tests for admin API endpoints."""
+
+    def test_get_storage(self, client):
+        """Test storage stats list tables with sizes and indexes."""
+        response = client.get("/api/admin/storage")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["auto_vacuum"] == "incremental"
+        tables = {t["name"]: t for t in data["tables"]}
+        assert tables["health_records"]["rows"] == 0
+        assert "idx_health_type_date" in [i["name"] for i in tables["health_records"]["indexes"]]
+
+    def test_get_storage_row_counts(self, client):
+        """Test row counts come from the table b-tree leaf pages."""
+        from app import database
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", i, "count",
+             f"2024-01-01T{i // 60:02d}:{i % 60:02d}:00+00:00", f"2024-01-01T{i // 60:02d}:{i % 60:02d}:30+00:00",
+             "iPhone", "x" * 200)
+            for i in range(600)
+        ])
+
+        tables = {t["name"]: t for t in client.get("/api/admin/storage").json()["tables"]}
+
+        assert tables["health_records"]["rows"] == 600
+        assert tables["health_records"]["pages"] > 1
+        assert tables["daily_summary"]["rows"] == 0
+
+    def test_get_integrity(self, client):
+        """Test integrity check on a healthy database."""
+        response = client.get("/api/admin/integrity")
+
+        assert response.status_code == 200
+        assert response.json()["ok"] is True
+
+    def test_get_startup_report(self, client):
+        """Test the startup report lists module import timings."""
+        response = client.get("/api/admin/startup?limit=5")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert "imported" in data["marks_ms"]
+        assert 0 < len(data["modules"]) <= 5
+        assert {"module", "self_ms", "cumulative_ms"} <= set(data["modules"][0])
+
+    def test_run_maintenance(self, client):
+        """Test running maintenance on demand."""
+        response = client.post("/api/admin/maintenance")
+
+        assert response.status_code == 200
+        assert response.json()["analyzed"] is True
+
+
 class TestAPIWithData:
     """Tests for API endpoints with actual data."""
 
@@ -176,3 +653,99 @@ class TestAPIWithData:
         data = response.json()
         # Status might be parsing, computing, or complete depending on timing
         assert data["status"] in ["parsing", "computing", "complete", "idle"]
+
+
+class TestDashboardAPI:
+    """Tests for the batched dashboard endpoint."""
+
+    def _seed(self):
+        from app import database
+        from datetime import timedelta
+        today = date.today()
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 1000 + i * 100, "count", f"{(today - timedelta(days=i)).isoformat()}T12:00:00",
+             f"{(today - timedelta(days=i)).isoformat()}T12:30:00", "iPhone", None)
+            for i in range(60)
+        ])
+        database.compute_daily_summaries()
+
+    def test_widgets_match_single_endpoints(self, client):
+        """Test each widget returns what its standalone endpoint returns."""
+        self._seed()
+        widgets = [
+            {"id": "steps", "type": "metric", "params": {"metric": "steps", "days": 30}},
+            {"id": "trends", "type": "trends", "params": {"days": 14}},
+            {"id": "records", "type": "records"},
+            {"id": "week", "type": "weekly_summary"},
+            {"id": "units", "type": "units"},
+        ]
+
+        response = client.post("/api/dashboard", json={"widgets": widgets})
+
+        assert response.status_code == 200
+        data = response.json()["widgets"]
+        assert data["steps"] == client.get("/api/health/metrics/steps?days=30").json()
+        assert data["trends"] == client.get("/api/insights/trends?days=14").json()
+        assert data["records"] == client.get("/api/insights/records").json()
+        assert data["week"] == client.get("/api/insights/weekly-summary").json()
+        assert data["units"] == client.get("/api/health/units").json()
+
+    def test_metric_widget_auto_resolution(self, client):
+        """Test resolution=auto resolves like the metric endpoint, hourly fallback included."""
+        self._seed()
+        widgets = [
+            {"id": "steps", "type": "metric", "params": {"metric": "steps", "days": 60, "resolution": "auto", "points": 8}},
+            {"id": "weight", "type": "metric", "params": {"metric": "weight", "days": 2, "resolution": "auto"}},
+            {"id": "hourly", "type": "metric", "params": {"metric": "weight", "days": 2, "resolution": "hour"}},
+        ]
+
+        data = client.post("/api/dashboard", json={"widgets": widgets}).json()["widgets"]
+
+        assert data["steps"]["resolution"] == "week"
+        assert data["steps"] == client.get("/api/health/metrics/steps?days=60&resolution=auto&points=8").json()
+        assert data["weight"]["resolution"] == "day"
+        assert data["weight"] == client.get("/api/health/metrics/weight?days=2&resolution=auto").json()
+        assert "error" in data["hourly"]
+
+    def test_summary_widget_empty_day(self, client):
+        """Test a day without data has the same shape as the summary endpoint."""
+        widgets = [{"id": "summary", "type": "summary", "params": {"date": "2020-01-01"}}]
+
+        data = client.post("/api/dashboard", json={"widgets": widgets}).json()["widgets"]
+
+        assert data["summary"] == client.get("/api/health/summary?target_date=2020-01-01").json()
+
+    def test_reads_daily_summary_once(self, client, monkeypatch):
+        """Test all summary-based widgets share one read."""
+        from app import database
+        self._seed()
+        calls = []
+        original = database.get_summaries_in_range
+        monkeypatch.setattr(database, "get_summaries_in_range", lambda *a: calls.append(a) or original(*a))
+        widgets = [
+            {"id": "summary", "type": "summary"},
+            {"id": "trends", "type": "trends"},
+            {"id": "correlations", "type": "correlations"},
+            {"id": "calories", "type": "metric", "params": {"metric": "calories"}},
+        ]
+
+        response = client.post("/api/dashboard", json={"widgets": widgets})
+
+        assert response.status_code == 200
+        assert len(calls) == 1
+
+    def test_reports_errors_per_widget(self, client):
+        """Test a bad widget does not fail the whole request."""
+        widgets = [
+            {"id": "bad", "type": "nope"},
+            {"id": "range", "type": "range", "params": {"start": "2024-01-01"}},
+            {"id": "dates", "type": "date_range"},
+        ]
+
+        response = client.post("/api/dashboard", json={"widgets": widgets})
+
+        assert response.status_code == 200
+        data = response.json()["widgets"]
+        assert "error" in data["bad"]
+        assert "error" in data["range"]
+        assert "min_date" in data["dates"]
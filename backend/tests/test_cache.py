@@ -0,0 +1,77 @@
+import pytest
+from app.cache import ResponseCache
+
+
+class TestResponseCache:
+    """Tests for the LRU response cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the entry bound evicts the oldest unused entry."""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", '"a"', [], b"a")
+        cache.put("b", '"b"', [], b"b")
+        cache.get("a")
+        cache.put("c", '"c"', [], b"c")
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_evicts_by_size(self):
+        """Test the byte bound evicts entries until the cache fits."""
+        cache = ResponseCache(max_bytes=10)
+        cache.put("a", '"a"', [], b"x" * 6)
+        cache.put("b", '"b"', [], b"x" * 6)
+
+        assert cache.get("a") is None
+        assert cache.stats()["bytes"] == 6
+
+
+class TestResponseCacheMiddleware:
+    """Tests for cached API responses."""
+
+    def test_response_has_etag(self, client):
+        """Test cached endpoints return a strong ETag."""
+        response = client.get("/api/insights/records")
+
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('"')
+
+    def test_if_none_match_returns_304(self, client):
+        """Test revalidating with the ETag returns 304 without a body."""
+        etag = client.get("/api/insights/trends?days=30").headers["etag"]
+
+        response = client.get("/api/insights/trends?days=30", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_repeat_request_served_from_cache(self, client, monkeypatch):
+        """Test a repeated request does not reach the database."""
+        from app import database
+        client.get("/api/health/range?start=2024-01-01&end=2024-01-31")
+
+        def fail(*args, **kwargs):
+            raise AssertionError("database queried")
+
+        monkeypatch.setattr(database, "get_summary_rows", fail)
+        response = client.get("/api/health/range?end=2024-01-31&start=2024-01-01")
+
+        assert response.status_code == 200
+
+    def test_import_invalidates_cache(self, client):
+        """Test completing an import changes the cached response."""
+        from app import database
+        before = client.get("/api/health/summary?target_date=2024-01-14")
+
+        database.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 5000, "count", "2024-01-14T08:00:00", "2024-01-14T09:00:00", "iPhone", None),
+        ])
+        database.compute_daily_summaries()
+        database.update_import_status("complete", 100, 1)
+
+        after = client.get("/api/health/summary?target_date=2024-01-14")
+
+        assert before.json()["steps"] is None
+        assert after.json()["steps"] == 5000
+        assert after.headers["etag"] != before.headers["etag"]
@@ -123,6 +123,64 @@ class TestDatabase:
 
         assert count == 3
 
+    def test_record_catalog_tracks_inserts(self, db):
+        """Test inserts keep per type and source counts, dates and units in the catalog."""
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 5000, "count", "2024-01-14T08:00:00", "2024-01-14T09:00:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierStepCount", 800, "count", "2024-01-13T08:00:00", "2024-01-13T09:00:00", "Apple Watch", None),
+        ])
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 3000, "count", "2024-01-15T12:00:00", "2024-01-15T13:00:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierBodyMass", 75.5, "kg", "2024-01-14T07:00:00", "2024-01-14T07:00:00", None, None),
+        ])
+
+        types = {t["type"]: t for t in db.get_record_types()}
+
+        steps = types["HKQuantityTypeIdentifierStepCount"]
+        assert steps["records"] == 3
+        assert (steps["first_date"], steps["last_date"]) == ("2024-01-13T08:00:00+00:00", "2024-01-15T12:00:00+00:00")
+        assert steps["unit"] == "count"
+        assert steps["sources"] == [
+            {"source_name": "iPhone", "records": 2}, {"source_name": "Apple Watch", "records": 1}
+        ]
+        assert types["HKQuantityTypeIdentifierBodyMass"]["sources"] == [{"source_name": None, "records": 1}]
+        assert db.get_records_count() == 4
+
+    def test_record_catalog_dates_are_utc(self, db):
+        """Test catalog dates are compared and stored in UTC whatever offset records carry."""
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 100, "count", "2024-01-14T08:00:00-05:00", "2024-01-14T09:00:00-05:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierStepCount", 100, "count", "2024-01-14T10:00:00+01:00", "2024-01-14T11:00:00+01:00", "iPhone", None),
+        ])
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 100, "count", "2024-01-14T12:00:00+00:00", "2024-01-14T13:00:00+00:00", "iPhone", None),
+        ])
+
+        steps = db.get_record_types()[0]
+
+        assert (steps["first_date"], steps["last_date"]) == ("2024-01-14T09:00:00+00:00", "2024-01-14T13:00:00+00:00")
+
+    def test_record_catalog_reset_by_clear(self, db):
+        """Test clearing data empties the catalog."""
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 5000, "count", "2024-01-14T08:00:00", "2024-01-14T09:00:00", "iPhone", None),
+        ])
+
+        db.clear_database()
+
+        assert db.get_record_types() == []
+        assert db.get_records_count() == 0
+
+    def test_workouts_by_utc_date(self, db):
+        """Test workouts are matched by UTC date across offset boundaries."""
+        db.insert_workouts([
+            ("HKWorkoutActivityTypeRunning", 30, 5.0, 300, "2024-01-01T23:30:00-05:00",
+             "2024-01-02T00:00:00-05:00", "Apple Watch")
+        ])
+
+        assert len(db.get_all_workouts(date(2024, 1, 2), date(2024, 1, 2))) == 1
+        assert db.get_all_workouts(date(2024, 1, 1), date(2024, 1, 1)) == []
+
 
 class TestDailySummary:
     """Tests for daily summary operations."""
@@ -177,3 +235,128 @@ class TestDailySummary:
         assert len(history) == 2
         assert history[0]["value"] == 5000
         assert history[1]["value"] == 6000
+
+
+class TestRollupSummaries:
+    """Tests for hourly/weekly/monthly/yearly rollups."""
+
+    def _seed(self, db):
+        records = [
+            ("HKQuantityTypeIdentifierStepCount", 1000, "count", "2024-01-15T08:10:00", "2024-01-15T08:20:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierStepCount", 500, "count", "2024-01-15T08:40:00", "2024-01-15T08:50:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierStepCount", 3000, "count", "2024-01-16T09:00:00", "2024-01-16T09:30:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierStepCount", 6000, "count", "2024-02-01T09:00:00", "2024-02-01T09:30:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierHeartRate", 60, "count/min", "2024-01-15T08:05:00", "2024-01-15T08:05:00", "Apple Watch", None),
+            ("HKQuantityTypeIdentifierHeartRate", 80, "count/min", "2024-01-15T08:35:00", "2024-01-15T08:35:00", "Apple Watch", None),
+        ]
+        db.insert_health_records(records)
+        db.compute_daily_summaries()
+        db.compute_rollup_summaries()
+
+    def test_hourly_rollup(self, db):
+        """Test hourly rollup sums steps and averages heart rate per hour."""
+        self._seed(db)
+
+        steps = db.get_metric_history("steps", date(2024, 1, 15), date(2024, 1, 15), "hour")
+        heart_rate = db.get_metric_history("heart_rate", date(2024, 1, 15), date(2024, 1, 15), "hour")
+
+        assert steps == [{"date": "2024-01-15T08:00:00", "value": 1500}]
+        assert heart_rate == [{"date": "2024-01-15T08:00:00", "value": 70}]
+
+    def test_weekly_rollup_includes_partial_first_week(self, db):
+        """Test weekly rollup averages days and keys buckets by Monday."""
+        self._seed(db)
+
+        history = db.get_metric_history("steps", date(2024, 1, 17), date(2024, 2, 29), "week")
+
+        assert history[0] == {"date": "2024-01-15", "value": 2250}
+        assert history[1] == {"date": "2024-01-29", "value": 6000}
+
+    def test_monthly_and_yearly_rollups(self, db):
+        """Test monthly and yearly rollups."""
+        self._seed(db)
+
+        monthly = db.get_summaries_in_range(date(2024, 1, 1), date(2024, 12, 31), "month")
+        yearly = db.get_summaries_in_range(date(2024, 6, 1), date(2024, 6, 30), "year")
+
+        assert [m["date"] for m in monthly] == ["2024-01-01", "2024-02-01"]
+        assert monthly[0]["days"] == 2
+        assert yearly[0]["date"] == "2024-01-01"
+        assert yearly[0]["steps"] == 3500
+
+    def test_choose_resolution(self, db):
+        """Test the coarsest resolution with enough points is chosen."""
+        assert db.choose_resolution(date(2020, 1, 1), date(2024, 12, 31), 200) == "week"
+        assert db.choose_resolution(date(2020, 1, 1), date(2024, 12, 31), 50) == "month"
+        assert db.choose_resolution(date(2024, 1, 1), date(2024, 1, 7), 50) == "hour"
+
+
+class TestMaintenance:
+    """Tests for ANALYZE and incremental vacuum."""
+
+    def test_optimize_creates_statistics(self, db):
+        """Test ANALYZE populates planner statistics."""
+        from app import maintenance
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 100, "count", "2024-01-14T08:00:00", "2024-01-14T09:00:00", "iPhone", None),
+        ])
+
+        maintenance.optimize_database()
+
+        conn = db.get_connection()
+        stats = conn.execute("SELECT idx FROM sqlite_stat1 WHERE tbl = 'health_records'").fetchall()
+        conn.close()
+        assert "idx_health_type_date" in {row[0] for row in stats}
+
+    def test_incremental_vacuum_releases_pages(self, db):
+        """Test freed pages are returned after deleting rows."""
+        from app import maintenance
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", i, "count", "2024-01-14T08:00:00", "2024-01-14T09:00:00", "iPhone", "x" * 200)
+            for i in range(2000)
+        ])
+        conn = db.get_connection()
+        conn.execute("DELETE FROM health_records")
+        conn.commit()
+        conn.close()
+
+        released = maintenance.incremental_vacuum()
+
+        assert released > 0
+        assert maintenance.get_storage_stats()["freelist_pages"] == 0
+
+    def test_maintenance_loop_runs_off_event_loop(self, db, monkeypatch):
+        """Test the loop prepares profiles and checks imports on worker threads."""
+        import asyncio
+        import threading
+        from app import maintenance, profiles
+        main_thread = threading.get_ident()
+        threads = []
+
+        class Stop(Exception):
+            pass
+
+        def record(name):
+            def call(*args):
+                threads.append((name, threading.get_ident()))
+                if name == "maintenance":
+                    raise Stop
+                return original[name](*args)
+            return call
+
+        original = {"ready": profiles.ensure_ready, "status": db.get_import_status}
+        monkeypatch.setattr(profiles, "list_profiles", lambda: ["default"])
+        monkeypatch.setattr(profiles, "ensure_ready", record("ready"))
+        monkeypatch.setattr(db, "get_import_status", record("status"))
+        monkeypatch.setattr(maintenance, "run_maintenance", record("maintenance"))
+
+        # A private loop, so the test client's current event loop is left alone
+        loop = asyncio.new_event_loop()
+        try:
+            with pytest.raises(Stop):
+                loop.run_until_complete(maintenance.maintenance_loop(interval=0))
+        finally:
+            loop.close()
+
+        assert [name for name, _ in threads] == ["ready", "status", "maintenance"]
+        assert main_thread not in {thread for _, thread in threads}
@@ -0,0 +1,32 @@
+import pytest
+from app.downsample import lttb
+
+
+class TestLTTB:
+    """Tests for Largest-Triangle-Three-Buckets downsampling."""
+
+    def test_returns_input_when_under_threshold(self):
+        """Test short series are returned unchanged."""
+        points = [(0, 1), (1, 2), (2, 3)]
+
+        assert lttb(points, 10) == points
+
+    def test_caps_point_count_and_keeps_endpoints(self):
+        """Test output size and first/last points."""
+        points = [(i, (i * 7) % 13) for i in range(1000)]
+
+        result = lttb(points, 50)
+
+        assert len(result) == 50
+        assert result[0] == points[0]
+        assert result[-1] == points[-1]
+        assert [p[0] for p in result] == sorted(p[0] for p in result)
+
+    def test_keeps_spike(self):
+        """Test a single outlier survives downsampling."""
+        points = [(i, 60.0) for i in range(500)]
+        points[250] = (250, 180.0)
+
+        result = lttb(points, 20)
+
+        assert (250, 180.0) in result
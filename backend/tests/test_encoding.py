@@ -0,0 +1,41 @@
+import msgpack
+
+from app.encoding import columnar_response, negotiate
+
+
+class TestColumnarResponse:
+    """Tests for building columnar responses."""
+
+    def test_msgpack_body(self):
+        """Test the msgpack format encodes the columns as MessagePack."""
+        payload = {"dates": ["2024-01-01", "2024-01-02"], "values": [1500, None]}
+
+        response = columnar_response(payload, "msgpack")
+
+        assert response.media_type == "application/msgpack"
+        assert msgpack.unpackb(response.body) == payload
+
+    def test_columnar_body(self):
+        """Test the columnar format is JSON with the columnar media type."""
+        response = columnar_response({"dates": [], "values": []}, "columnar")
+
+        assert response.media_type == "application/vnd.health.columnar+json"
+        assert response.body == b'{"dates":[],"values":[]}'
+
+
+class TestNegotiate:
+    """Tests for response format negotiation."""
+
+    def test_explicit_format_wins(self):
+        """Test an explicit format overrides Accept."""
+        assert negotiate("application/msgpack", "columnar") == "columnar"
+
+    def test_accept_header(self):
+        """Test Accept selects the first known media type."""
+        assert negotiate("text/html, application/x-msgpack;q=0.9") == "msgpack"
+        assert negotiate("application/vnd.health.columnar+json") == "columnar"
+
+    def test_default_json(self):
+        """Test unknown or missing Accept falls back to JSON."""
+        assert negotiate("*/*") == "json"
+        assert negotiate("") == "json"
@@ -0,0 +1,160 @@
+import math
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app import engine
+
+
+def _matrix(values, metrics=None):
+    values = np.asarray(values, dtype=float)
+    metrics = metrics or [f"m{i}" for i in range(values.shape[1])]
+    return engine.SummaryMatrix(list(range(len(values))), metrics, values)
+
+
+class TestCorrelationMatrix:
+    """Tests for the vectorized correlation matrix."""
+
+    def test_matches_pairwise_complete_corrcoef(self):
+        """Test each pair is correlated over the days both metrics have values."""
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(120, 4))
+        values[:, 1] += values[:, 0]
+        values[rng.random(values.shape) < 0.25] = np.nan
+
+        result = engine.correlation_matrix(_matrix(values))
+
+        for i in range(4):
+            for j in range(4):
+                both = ~np.isnan(values[:, i]) & ~np.isnan(values[:, j])
+                assert result["n"][i, j] == both.sum()
+                assert result["r"][i, j] == pytest.approx(np.corrcoef(values[both, i], values[both, j])[0, 1])
+
+    def test_constant_and_sparse_metrics_are_nan(self):
+        """Test pairs with a constant metric or under three shared days have no r."""
+        values = [[1, 5, 1], [2, 5, np.nan], [3, 5, np.nan], [4, 5, 2]]
+
+        result = engine.correlation_matrix(_matrix(values))
+
+        assert math.isnan(result["r"][0, 1])
+        assert math.isnan(result["r"][0, 2])
+        assert result["n"][0, 2] == 2
+
+    def test_pvalues(self):
+        """Test p-values match the Student's t distribution."""
+        p = engine.correlation_pvalues(np.array([0.5, 0.3, 0.0, 1.0]), np.array([10, 30, 20, 10]))
+
+        assert p == pytest.approx([0.14111, 0.10725, 1.0, 0.0], abs=1e-5)
+
+    def test_betainc(self):
+        """Test the regularized incomplete beta function on both sides of its swap point."""
+        assert engine.betainc(2, 3, 0.4) == pytest.approx(0.5248)
+        assert engine.betainc(5, 2, 0.2) == pytest.approx(0.0016)
+
+
+class TestTopCorrelations:
+    """Tests for ranking metric pairs."""
+
+    def test_top_k_by_strength(self):
+        """Test pairs are ranked by |r| and filtered by threshold and sample count."""
+        x = np.arange(20, dtype=float)
+        noise = np.tile([1.0, -1.0], 10)
+        values = np.column_stack([x, -x + noise, x + 5 * noise])
+
+        result = engine.correlation_matrix(_matrix(values, ["a", "b", "c"]))
+        top = engine.top_correlations(result, 2)
+
+        assert [(pair["metric1"], pair["metric2"]) for pair in top] == [("a", "b"), ("a", "c")]
+        assert abs(top[0]["correlation"]) >= abs(top[1]["correlation"]) > abs(result["r"][1, 2])
+        assert top[0]["correlation"] < -0.98
+        assert top[0]["samples"] == 20
+        assert isinstance(top[0]["p_value"], float)
+        assert engine.top_correlations(result, min_samples=21) == []
+
+    def test_from_summaries_maps_none_to_nan(self):
+        """Test summary dicts become a matrix with NaN for missing values."""
+        matrix = engine.SummaryMatrix.from_summaries(
+            [{"date": "2024-01-01", "steps": 100, "sleep_hours": None}], ["steps", "sleep"]
+        )
+
+        assert matrix.values[0, 0] == 100
+        assert math.isnan(matrix.values[0, 1])
+
+
+class TestLaggedCorrelations:
+    """Tests for cross-correlation across day lags."""
+
+    def _series(self, days=60):
+        rng = np.random.default_rng(1)
+        cause = rng.normal(size=days)
+        effect = np.concatenate([[0.0, 0.0], cause[:-2]]) + rng.normal(scale=0.1, size=days)
+        dates = [f"2024-{1 + day // 31:02d}-{1 + day % 31:02d}" for day in range(days)]
+        return dates, np.column_stack([cause, effect])
+
+    def test_finds_the_lag(self):
+        """Test a metric that follows another two days later peaks at lag 2."""
+        dates, values = self._series()
+        matrix = engine.SummaryMatrix(dates, ["cause", "effect"], values)
+
+        result = engine.lagged_correlations(matrix, max_lag=3)
+        top = engine.top_lagged_correlations(result, 1)
+
+        assert top[0]["metric1"] == "cause" and top[0]["metric2"] == "effect" and top[0]["lag"] == 2
+        assert top[0]["correlation"] > 0.95
+        lag = result["lags"].index(2)
+        assert result["r"][lag, 0, 1] == pytest.approx(result["r"][result["lags"].index(-2), 1, 0])
+
+    def test_missing_days_keep_alignment(self):
+        """Test days without a summary row are gaps rather than shifting the series."""
+        dates, values = self._series()
+        keep = [day for day in range(len(dates)) if day % 10 != 5]
+        matrix = engine.SummaryMatrix([dates[day] for day in keep], ["cause", "effect"], values[keep])
+
+        assert len(matrix.daily().dates) == len(dates)
+        top = engine.top_lagged_correlations(engine.lagged_correlations(matrix, max_lag=3), 1)
+        assert top[0]["lag"] == 2
+        assert top[0]["samples"] < len(dates) - 2
+
+
+class TestRollingSeries:
+    """Tests for the sliding-window series."""
+
+    def _naive(self, values, window, reduce):
+        result = []
+        for index in range(len(values)):
+            current = values[max(0, index - window + 1):index + 1]
+            current = current[~np.isnan(current)]
+            result.append(reduce(current) if len(current) else np.nan)
+        return np.array(result)
+
+    def test_rolling_mean_and_median_match_naive(self):
+        """Test the O(n) windows equal re-computing every window, with gaps and duplicates."""
+        rng = np.random.default_rng(2)
+        values = rng.integers(0, 5, size=200).astype(float)
+        values[rng.random(200) < 0.3] = np.nan
+
+        for window in (1, 2, 7, 30):
+            np.testing.assert_allclose(engine.rolling_mean(values, window), self._naive(values, window, np.mean))
+            np.testing.assert_array_equal(engine.rolling_median(values, window), self._naive(values, window, np.median))
+
+    def test_min_periods(self):
+        """Test windows with too few values are NaN."""
+        values = np.array([1.0, np.nan, np.nan, 4.0, 5.0])
+
+        assert np.isnan(engine.rolling_mean(values, 3, min_periods=2)[:4]).all()
+        assert engine.rolling_median(values, 3, min_periods=2)[4] == 4.5
+
+    def test_ewma(self):
+        """Test the EWMA recurrence carries the average over missing days."""
+        result = engine.ewma(np.array([np.nan, 2.0, np.nan, 4.0]), 0.5)
+
+        assert np.isnan(result[0])
+        assert result[1:].tolist() == [2.0, 2.0, 3.0]
+
+    def test_daily_series(self):
+        """Test values land on their day offsets."""
+        series = engine.daily_series(["2024-01-02", "2024-01-04"], [1, 3], date(2024, 1, 1), date(2024, 1, 5))
+
+        assert np.isnan(series[[0, 2, 4]]).all()
+        assert series[[1, 3]].tolist() == [1.0, 3.0]
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+
+from app import events
+from app.events import Broadcaster
+
+
+def _run(coro):
+    """Run a coroutine on a private loop, leaving the test client's loop alone."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _next(agen, timeout=1.0):
+    return asyncio.wait_for(agen.__anext__(), timeout)
+
+
+class TestBroadcaster:
+    """Tests for the in-process event broadcaster."""
+
+    def test_publish_from_thread(self):
+        """Test events published from a worker thread reach every subscriber."""
+        async def scenario():
+            broadcaster = Broadcaster()
+            first = broadcaster.subscribe()
+            second = broadcaster.subscribe()
+            await asyncio.to_thread(broadcaster.publish, {"status": "parsing"})
+            return await asyncio.wait_for(first.get(), 1), await asyncio.wait_for(second.get(), 1)
+
+        assert _run(scenario()) == ({"status": "parsing"}, {"status": "parsing"})
+
+    def test_topic_subscribers_only_get_their_topic(self):
+        """Test a topic subscriber skips other topics' events while an untopiced one gets all."""
+        async def scenario():
+            broadcaster = Broadcaster()
+            alice = broadcaster.subscribe("alice")
+            everyone = broadcaster.subscribe()
+            broadcaster.publish({"status": "parsing"}, topic="bob")
+            broadcaster.publish({"status": "complete"}, topic="alice")
+            await asyncio.sleep(0)
+            return [alice.get_nowait() for _ in range(alice.qsize())], everyone.qsize()
+
+        assert _run(scenario()) == ([{"status": "complete"}], 2)
+
+    def test_slow_subscriber_keeps_latest(self):
+        """Test a full queue drops its oldest events."""
+        async def scenario():
+            broadcaster = Broadcaster()
+            queue = broadcaster.subscribe()
+            for progress in range(events.QUEUE_SIZE + 5):
+                broadcaster.publish({"progress": progress})
+            await asyncio.sleep(0)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        received = _run(scenario())
+
+        assert len(received) == events.QUEUE_SIZE
+        assert received[-1] == {"progress": events.QUEUE_SIZE + 4}
+
+    def test_stream_messages(self):
+        """Test the SSE stream sends the initial status, events and keepalives."""
+        broadcaster = Broadcaster()
+
+        async def scenario():
+            stream = events.stream(broadcaster, {"status": "idle"}, keepalive=0.05)
+            messages = [await _next(stream), await _next(stream)]
+            broadcaster.publish({"status": "complete"})
+            messages.append(await _next(stream))
+            await stream.aclose()
+            return messages
+
+        initial, keepalive, update = _run(scenario())
+
+        assert initial == 'data: {"status":"idle"}\n\n'
+        assert keepalive == ": keepalive\n\n"
+        assert json.loads(update[len("data: "):]) == {"status": "complete"}
+        assert broadcaster.subscribers == 0
+
+    def test_import_status_published(self, db):
+        """Test update_import_status publishes to subscribers."""
+        async def scenario():
+            queue = events.import_events.subscribe()
+            try:
+                await asyncio.to_thread(db.update_import_status, "parsing", 42.0, 1000)
+                return await asyncio.wait_for(queue.get(), 1)
+            finally:
+                events.import_events.unsubscribe(queue)
+
+        event = _run(scenario())
+
+        assert event == {"status": "parsing", "progress": 42.0, "records_imported": 1000, "error_message": None}
+
+    def test_status_stream_endpoint(self, client):
+        """Test the stream endpoint opens with the current status."""
+        from app.routers.upload import stream_import_status
+
+        async def scenario():
+            response = await stream_import_status()
+            first = await _next(response.body_iterator)
+            await response.body_iterator.aclose()
+            return response, first
+
+        response, first = _run(scenario())
+
+        assert response.media_type == "text/event-stream"
+        assert json.loads(first[len("data: "):])["status"] == "idle"
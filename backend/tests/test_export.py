@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+from datetime import date
+
+from app import export, timeseries
+
+
+def _records():
+    return [
+        ("HKQuantityTypeIdentifierStepCount", 100 * i, "count",
+         f"2024-01-{10 + i:02d}T08:00:00+00:00", f"2024-01-{10 + i:02d}T09:00:00+00:00",
+         "iPhone" if i % 2 else "Watch", None)
+        for i in range(5)
+    ] + [
+        ("HKQuantityTypeIdentifierHeartRate", 70 + i, "count/min",
+         f"2024-01-12T08:00:0{i}+00:00", f"2024-01-12T08:00:0{i}+00:00", "Watch", None)
+        for i in range(3)
+    ]
+
+
+class TestExport:
+    """Tests for batched export iteration and encoding."""
+
+    def test_batches_cover_rows_and_blocks(self, db):
+        """Test raw rows and block-stored samples are both exported, in bounded batches."""
+        db.insert_health_records(_records())
+        timeseries.compact_records()
+
+        batches = list(export.iter_record_batches(batch_size=2))
+
+        assert all(len(batch) <= 2 for batch in batches)
+        rows = [row for batch in batches for row in batch]
+        assert len(rows) == 8
+        assert [row[1] for row in rows if row[0] == "HKQuantityTypeIdentifierHeartRate"] == [70, 71, 72]
+
+    def test_filters(self, db):
+        """Test type, date and source filters apply to rows and blocks."""
+        db.insert_health_records(_records())
+        timeseries.compact_records()
+
+        rows = [
+            row for batch in export.iter_record_batches(
+                start_date=date(2024, 1, 11), end_date=date(2024, 1, 12), source_name="Watch"
+            ) for row in batch
+        ]
+
+        assert sorted(row[1] for row in rows) == [70, 71, 72, 200]
+
+    def test_date_filter_uses_utc_for_rows_and_blocks(self, db):
+        """Test records with a non-UTC offset near the boundary are filtered by their UTC date."""
+        db.insert_health_records([
+            # 2024-01-11 04:00 UTC, inside the range despite the 10th local date
+            ("HKQuantityTypeIdentifierStepCount", 1, "count",
+             "2024-01-10T23:00:00-05:00", "2024-01-10T23:30:00-05:00", "iPhone", None),
+            # 2024-01-10 23:30 UTC, outside despite the 11th local date
+            ("HKQuantityTypeIdentifierStepCount", 2, "count",
+             "2024-01-11T08:30:00+09:00", "2024-01-11T08:45:00+09:00", "iPhone", None),
+            # 2024-01-13 03:00 UTC, outside despite the 12th local date
+            ("HKQuantityTypeIdentifierStepCount", 3, "count",
+             "2024-01-12T22:00:00-05:00", "2024-01-12T22:30:00-05:00", "iPhone", None),
+            ("HKQuantityTypeIdentifierHeartRate", 70, "count/min",
+             "2024-01-10T23:00:00-05:00", "2024-01-10T23:00:00-05:00", "Watch", None),
+            ("HKQuantityTypeIdentifierHeartRate", 71, "count/min",
+             "2024-01-12T22:00:00-05:00", "2024-01-12T22:00:00-05:00", "Watch", None),
+        ])
+        timeseries.compact_records()
+
+        rows = [
+            row for batch in export.iter_record_batches(start_date=date(2024, 1, 11), end_date=date(2024, 1, 12))
+            for row in batch
+        ]
+
+        assert sorted(row[1] for row in rows) == [1, 70]
+
+    def test_encode_csv_quotes_fields(self):
+        """Test CSV encoding escapes separators in values."""
+        encoded = export.encode_csv([("a,b", 1.5)], ("name", "value"))
+
+        assert list(csv.reader(io.StringIO(encoded.decode()))) == [["name", "value"], ["a,b", "1.5"]]
+
+
+class TestExportAPI:
+    """Tests for the export endpoints."""
+
+    def test_records_ndjson(self, client):
+        """Test records stream as one JSON object per line."""
+        from app import database
+        database.insert_health_records(_records())
+
+        response = client.get("/api/export/records.ndjson?type=HKQuantityTypeIdentifierStepCount&source=iPhone")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["value"] for line in lines] == [100, 300]
+        assert lines[0]["source_name"] == "iPhone"
+
+    def test_records_csv(self, client):
+        """Test records stream as CSV with a header row."""
+        from app import database
+        database.insert_health_records(_records())
+
+        response = client.get("/api/export/records.csv")
+
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == list(export.RECORD_FIELDS)
+        assert len(rows) == 9
+
+    def test_summaries_csv(self, client):
+        """Test daily summaries export as CSV."""
+        from app import database
+        database.insert_health_records(_records())
+        database.compute_daily_summaries()
+
+        response = client.get("/api/export/summaries.csv?start=2024-01-11&end=2024-01-12")
+
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [(row["date"], row["steps"]) for row in rows] == [("2024-01-11", "100"), ("2024-01-12", "200")]
+
+    def test_unknown_format(self, client):
+        """Test unsupported formats are rejected."""
+        response = client.get("/api/export/records.xml")
+
+        assert response.status_code == 422
@@ -0,0 +1,125 @@
+from app import goals
+
+
+class TestEncodeRuns:
+    """Tests for run-length encoding met days."""
+
+    def test_consecutive_days_form_runs(self):
+        """Test runs break on gaps, including across month ends."""
+        runs = goals.encode_runs(["2024-01-30", "2024-01-31", "2024-02-01", "2024-02-03"])
+
+        assert runs == [("2024-01-30", "2024-02-01", 3), ("2024-02-03", "2024-02-03", 1)]
+
+    def test_empty(self):
+        assert goals.encode_runs([]) == []
+
+
+class TestGoalStreaks:
+    """Tests for streaks maintained in the database."""
+
+    def test_progress(self, db, steps):
+        """Test totals, longest and current streak of a goal."""
+        db.insert_health_records(steps([12000, 11000, 3000, 10000, 10500, 12000, None, 15000, 16000]))
+        db.compute_daily_summaries()
+
+        goal = goals.get_goal(goals.save_goal("steps", 10000, "at_least", "10k steps"))
+
+        assert goal["tracked_days"] == 8
+        assert goal["met_days"] == 7
+        assert goal["completion_rate"] == 0.875
+        assert goal["longest_streak"] == 3
+        assert goal["longest_start"] == "2024-01-04"
+        assert goal["current_streak"] == 2
+        assert goal["last_met"] == "2024-01-09"
+        assert [s["days"] for s in goals.get_streaks(goal["id"], order="recent")] == [2, 3, 2]
+
+    def test_at_most_goal(self, db, steps):
+        """Test goals can cap a metric instead."""
+        db.insert_health_records(steps([12000, 3000, 4000]))
+        db.compute_daily_summaries()
+
+        goal = goals.get_goal(goals.save_goal("steps", 5000, "at_most", None))
+
+        assert goal["met_days"] == 2
+        assert goal["current_streak"] == 2
+
+    def test_reimport_rewrites_only_changed_runs(self, db, steps):
+        """Test a reimport with more days keeps earlier runs and extends the last one."""
+        db.insert_health_records(steps([12000, 3000, 12000, 12000]))
+        db.compute_daily_summaries()
+        goal_id = goals.save_goal("steps", 10000, "at_least", None)
+
+        db.clear_database(keep_derived=True)
+        db.insert_health_records(steps([12000, 3000, 12000, 12000, 12000, 3000]))
+        db.compute_daily_summaries()
+        conn = db.get_connection()
+        first_run = conn.execute("SELECT rowid FROM goal_streaks WHERE start_date = '2024-01-01'").fetchone()[0]
+        conn.close()
+        goals.update_all_goals()
+
+        goal = goals.get_goal(goal_id)
+        conn = db.get_connection()
+        assert conn.execute("SELECT rowid FROM goal_streaks WHERE start_date = '2024-01-01'").fetchone()[0] == first_run
+        conn.close()
+        assert goal["longest_streak"] == 3
+        assert goal["current_streak"] == 0
+        assert goal["tracked_days"] == 6
+
+    def test_current_streak_ignores_days_without_the_metric(self, db, steps):
+        """Test later days holding only other metrics do not end the current streak."""
+        db.insert_health_records(steps([12000, 12000]) + [
+            ("HKQuantityTypeIdentifierBodyMass", 75.0, "kg", "2024-01-05T07:00:00+00:00",
+             "2024-01-05T07:00:00+00:00", "Withings", None),
+        ])
+        db.compute_daily_summaries()
+
+        goal = goals.get_goal(goals.save_goal("steps", 10000, "at_least", None))
+
+        assert goal["current_streak"] == 2
+        assert goal["through"] == "2024-01-02"
+
+    def test_reimport_with_changed_history_rebuilds_runs(self, db, steps):
+        """Test runs before the last one are rebuilt when earlier days changed."""
+        db.insert_health_records(steps([12000, 3000, 12000, 12000]))
+        db.compute_daily_summaries()
+        goal_id = goals.save_goal("steps", 10000, "at_least", None)
+
+        db.clear_database(keep_derived=True)
+        db.insert_health_records(steps([12000, 12000, 12000, 12000, 12000]))
+        db.compute_daily_summaries()
+        goals.update_all_goals()
+
+        goal = goals.get_goal(goal_id)
+        assert [s["days"] for s in goals.get_streaks(goal_id)] == [5]
+        assert goal["met_days"] == 5
+        assert goal["current_streak"] == 5
+
+    def test_reimport_moving_met_days_rebuilds_runs(self, db, steps):
+        """Test earlier runs are rewritten when met days move but their count stays the same."""
+        db.insert_health_records(steps([12000, 3000, 12000, 12000, 3000, 12000, 12000]))
+        db.compute_daily_summaries()
+        goal_id = goals.save_goal("steps", 10000, "at_least", None)
+
+        db.clear_database(keep_derived=True)
+        db.insert_health_records(steps([3000, 12000, 12000, 12000, 3000, 12000, 12000]))
+        db.compute_daily_summaries()
+        goals.update_all_goals()
+
+        goal = goals.get_goal(goal_id)
+        assert [(s["start_date"], s["days"]) for s in goals.get_streaks(goal_id, order="recent")] == [
+            ("2024-01-06", 2), ("2024-01-02", 3),
+        ]
+        assert goal["longest_start"] == "2024-01-02"
+        assert goal["met_days"] == 5
+
+    def test_clear_keeps_goals(self, db, steps):
+        """Test clearing data resets progress but keeps the goals."""
+        db.insert_health_records(steps([12000]))
+        db.compute_daily_summaries()
+        goal_id = goals.save_goal("steps", 10000, "at_least", None)
+
+        db.clear_database()
+
+        goal = goals.get_goal(goal_id)
+        assert goal["met_days"] == 0
+        assert goals.get_streaks(goal_id) == []
@@ -0,0 +1,44 @@
+from app import heatmaps
+
+
+class TestHeatmapBuckets:
+    """Tests for quantile thresholds and per-day bucket digits."""
+
+    def test_thresholds_are_quartiles(self):
+        """Test the cut points split the values into four shares."""
+        assert heatmaps.thresholds([1, 2, 3, 4, 5, 6, 7, 8]) == [2.75, 4.5, 6.25]
+        assert heatmaps.thresholds([5]) == [5, 5, 5]
+
+    def test_encode_year(self):
+        """Test every day of the year gets a digit, 0 where there is no value."""
+        encoded = heatmaps.encode_year(2024, {"2024-01-01": 1, "2024-01-03": 7, "2024-12-31": 4.5}, [2.75, 4.5, 6.25])
+
+        assert len(encoded) == 366
+        assert encoded[:3] == "104"
+        assert encoded[-1] == "3"
+
+
+class TestBuildHeatmaps:
+    """Tests for heatmaps built from daily summaries."""
+
+    def test_one_row_per_metric_and_year(self, db):
+        """Test each year is bucketed against its own thresholds."""
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", steps, "count", f"{day}T12:00:00+00:00",
+             f"{day}T12:30:00+00:00", "iPhone", None)
+            for day, steps in [
+                ("2023-12-30", 100), ("2023-12-31", 200),
+                ("2024-01-01", 1000), ("2024-01-02", 2000), ("2024-01-03", 3000), ("2024-01-04", 4000),
+            ]
+        ])
+        db.compute_daily_summaries()
+
+        heatmaps.compute_heatmaps()
+
+        years = heatmaps.get_heatmaps("steps")
+        assert [(y["year"], y["days"]) for y in years] == [(2023, 2), (2024, 4)]
+        assert years[0]["buckets"][-2:] == [1, 4]
+        assert years[1]["thresholds"] == [1750, 2500, 3250]
+        assert years[1]["buckets"][:5] == [1, 2, 3, 4, 0]
+        assert heatmaps.get_heatmaps("steps", 2024) == years[1:]
+        assert heatmaps.get_heatmaps("weight") == []
@@ -0,0 +1,91 @@
+from app import metrics
+from app.metrics import Histogram, Registry, statement_label
+
+
+class TestMetrics:
+    """Tests for the metric types and text rendering."""
+
+    def test_histogram_render(self):
+        """Test histograms render cumulative buckets, sum and count."""
+        registry = Registry()
+        histogram = registry.register(Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0)))
+        histogram.observe(("/a",), 0.05)
+        histogram.observe(("/a",), 0.5)
+
+        lines = registry.render().splitlines()
+
+        assert "# TYPE latency_seconds histogram" in lines
+        assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+        assert 'latency_seconds_bucket{route="/a",le="+Inf"} 2' in lines
+        assert 'latency_seconds_count{route="/a"} 2' in lines
+
+    def test_statement_label(self):
+        """Test statements are reduced to verb and table."""
+        assert statement_label("\n  SELECT * FROM daily_summary WHERE date = ?") == "SELECT daily_summary"
+        assert statement_label("INSERT OR REPLACE INTO units VALUES (?, ?)") == "INSERT units"
+        assert statement_label("UPDATE import_status SET status = ?") == "UPDATE import_status"
+        assert statement_label("PRAGMA user_version") == "PRAGMA"
+
+    def test_instrumented_connection(self, db):
+        """Test statements through get_connection are timed and their rows counted."""
+        label = ("SELECT health_records",)
+        rows_before = metrics.QUERY_ROWS.value(label)
+        count_before = metrics.QUERY_SECONDS.count(label)
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", i, "count", "2024-01-14T08:00:00", "2024-01-14T09:00:00", "iPhone", None)
+            for i in range(3)
+        ])
+
+        conn = db.get_connection()
+        conn.execute("SELECT value FROM health_records").fetchall()
+        for _ in conn.execute("SELECT value FROM health_records"):
+            pass
+        conn.close()
+
+        assert metrics.QUERY_SECONDS.count(label) == count_before + 2
+        assert metrics.QUERY_ROWS.value(label) == rows_before + 6
+
+    def test_stage_timer(self):
+        """Test starting a stage records the previous one."""
+        timer = metrics.StageTimer()
+        timer.begin("test_a")
+        timer.begin("test_b")
+        timer.end()
+
+        assert metrics.IMPORT_STAGE_SECONDS.count(("test_a",)) >= 1
+        assert metrics.IMPORT_STAGE_SECONDS.count(("test_b",)) >= 1
+
+
+class TestMetricsAPI:
+    """Tests for request instrumentation and the /metrics endpoint."""
+
+    def test_route_template_label(self, client):
+        """Test requests are labelled by route template, not the concrete path."""
+        client.get("/api/units/steps")
+        client.get("/api/health/units/steps")
+
+        body = client.get("/metrics").text
+
+        assert 'route="/api/health/units/{metric}",status="200"' in body
+        assert 'route="unmatched",status="404"' in body
+        assert "sqlite_statement_duration_seconds_bucket" in body
+
+    def test_cache_hit_keeps_route(self, client):
+        """Test responses served from the cache are labelled with their route."""
+        client.get("/api/health/units/weight")
+        client.get("/api/health/units/weight")
+
+        body = client.get("/metrics").text
+
+        assert 'unmatched",status="200"' not in body
+
+    def test_import_stages(self, client, sample_xml_file):
+        """Test an import records each pipeline stage."""
+        from app.parser import parse_apple_health_export
+        parse_apple_health_export(str(sample_xml_file))
+
+        body = client.get("/metrics").text
+
+        for stage in ("parse", "daily_summaries", "compaction", "maintenance"):
+            assert f'import_last_stage_duration_seconds{{stage="{stage}"}}' in body
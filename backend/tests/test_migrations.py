@@ -0,0 +1,201 @@
+import pytest
+import sqlite3
+from datetime import date
+
+from app import migrations
+
+
+def _create_baseline_database(db):
+    """Create a database as it existed before schema versioning, with data."""
+    conn = db.get_connection()
+    migrations._baseline_schema(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    # Raw inserts: the baseline schema predates the record catalog that
+    # insert_health_records maintains
+    conn = db.get_connection()
+    conn.executemany("""
+        INSERT INTO health_records (type, value, unit, start_date, end_date, source_name, device)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        ("HKQuantityTypeIdentifierStepCount", 1000 * i, "count", f"2024-01-{i:02d}T08:00:00+00:00",
+         f"2024-01-{i:02d}T08:30:00+00:00", "iPhone", None)
+        for i in range(1, 11)
+    ] + [
+        ("HKQuantityTypeIdentifierHeartRate", 60 + i, "count/min", f"2024-01-{i:02d}T08:00:00+00:00",
+         f"2024-01-{i:02d}T08:00:00+00:00", "Apple Watch", None)
+        for i in range(1, 11)
+    ])
+    conn.execute("""
+        INSERT INTO sleep_records (sleep_type, start_date, end_date, source_name)
+        VALUES ('HKCategoryValueSleepAnalysisAsleepCore', '2024-01-09T23:00:00+00:00', '2024-01-10T06:00:00+00:00', 'Apple Watch')
+    """)
+    # Summaries as the baseline computed them, with sleep on the start date
+    conn.execute("""
+        INSERT INTO daily_summary (date, steps, resting_heart_rate)
+        SELECT DATE(start_date),
+            SUM(CASE WHEN type = 'HKQuantityTypeIdentifierStepCount' THEN value END),
+            AVG(CASE WHEN type = 'HKQuantityTypeIdentifierRestingHeartRate' THEN value END)
+        FROM health_records GROUP BY DATE(start_date)
+    """)
+    conn.execute("UPDATE daily_summary SET sleep_hours = 7 WHERE date = '2024-01-09'")
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def baseline_db(db):
+    """A version 0 database holding baseline tables and data."""
+    db.close_pools()
+    db.DATABASE_PATH.unlink()
+    _create_baseline_database(db)
+    return db
+
+
+class TestMigrations:
+    """Tests for schema versioning and backfills."""
+
+    def test_fresh_database_is_current(self, db):
+        """Test a new database is created at the latest version."""
+        conn = db.get_connection()
+        version = migrations.get_schema_version(conn)
+        conn.close()
+
+        assert version == migrations.SCHEMA_VERSION
+        assert migrations.pending_backfills() == []
+
+    def test_upgrade_from_baseline(self, baseline_db):
+        """Test upgrading a baseline database creates tables and queues backfills."""
+        baseline_db.init_database()
+
+        conn = baseline_db.get_connection()
+        assert migrations.get_schema_version(conn) == migrations.SCHEMA_VERSION
+        conn.close()
+        assert [b[0] for b in migrations.pending_backfills()] == [
+            "hourly_summary", "heart_rate_minutes", "compact_samples", "record_catalog",
+            "period_rollups", "block_catalog", "sleep_sessions", "anomalies", "heatmaps"
+        ]
+
+    def test_backfills_populate_new_tables(self, baseline_db):
+        """Test backfills build rollups and blocks for existing data."""
+        baseline_db.init_database()
+
+        migrations.run_backfills(batch_size=3)
+
+        assert migrations.pending_backfills() == []
+        hourly = baseline_db.get_metric_history("heart_rate", date(2024, 1, 1), date(2024, 1, 10), "hour")
+        assert [h["value"] for h in hourly] == [61 + i for i in range(10)]
+        monthly = baseline_db.get_metric_history("steps", date(2024, 1, 1), date(2024, 1, 31), "month")
+        assert monthly == [{"date": "2024-01-01", "value": 5500}]
+        assert len(baseline_db.get_heart_rate_minutes(0, 10 ** 9)) == 10
+        assert baseline_db.get_records_count() == 20
+        types = {t["type"]: t for t in baseline_db.get_record_types()}
+        assert types["HKQuantityTypeIdentifierHeartRate"]["records"] == 10
+        assert types["HKQuantityTypeIdentifierHeartRate"]["first_date"].startswith("2024-01-01T08:00:00")
+        assert types["HKQuantityTypeIdentifierStepCount"]["last_date"] == "2024-01-10T08:00:00+00:00"
+        conn = baseline_db.get_connection()
+        assert conn.execute("SELECT COUNT(*) FROM anomaly_scores WHERE metric = 'steps'").fetchone()[0] == 10
+        assert conn.execute("SELECT days FROM heatmaps WHERE metric = 'steps' AND year = 2024").fetchone()[0] == 10
+        assert [tuple(row) for row in conn.execute("SELECT date, sleep_hours FROM daily_summary WHERE sleep_hours IS NOT NULL")] == [
+            ("2024-01-10", 7.0)
+        ]
+        conn.close()
+
+    def test_backfill_resumes_after_failure(self, baseline_db, monkeypatch):
+        """Test a failed batch leaves earlier progress committed."""
+        baseline_db.init_database()
+        calls = []
+        original = migrations.BACKFILLS["hourly_summary"]
+
+        def flaky(conn, lo, hi):
+            calls.append(lo)
+            if len(calls) == 2:
+                raise sqlite3.OperationalError("interrupted")
+            original(conn, lo, hi)
+
+        monkeypatch.setitem(migrations.BACKFILLS, "hourly_summary", flaky)
+        with pytest.raises(sqlite3.OperationalError):
+            migrations.run_backfills(batch_size=5)
+
+        assert migrations.pending_backfills()[0][:2] == ("hourly_summary", 5)
+
+        monkeypatch.setitem(migrations.BACKFILLS, "hourly_summary", original)
+        migrations.run_backfills(batch_size=5)
+
+        hourly = baseline_db.get_metric_history("steps", date(2024, 1, 1), date(2024, 1, 10), "hour")
+        assert [h["value"] for h in hourly] == [1000 * i for i in range(1, 11)]
+
+    def test_clear_database_recreates_schema(self, db):
+        """Test clearing data rebuilds every table at the current version."""
+        db.clear_database()
+
+        conn = db.get_connection()
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        version = migrations.get_schema_version(conn)
+        conn.close()
+
+        assert {"health_records", "hourly_summary", "heart_rate_minutes", "sample_blocks"} <= tables
+        assert version == migrations.SCHEMA_VERSION
+
+    def test_current_database_skips_steps(self, db, monkeypatch):
+        """Test a database at the current version runs no migration step."""
+        def fail(cursor):
+            raise AssertionError("migration step ran")
+
+        monkeypatch.setattr(migrations, "MIGRATIONS", [fail] * migrations.SCHEMA_VERSION)
+
+        db.init_database()
+
+    def test_clear_database_does_not_replay_migrations(self, db, monkeypatch):
+        """Test clearing data recreates the dropped tables without rerunning migration steps."""
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 5000, "count", "2024-01-14T08:00:00+00:00", "2024-01-14T09:00:00+00:00", "iPhone", None),
+        ])
+
+        def replay(conn):
+            raise AssertionError("migrations replayed")
+
+        monkeypatch.setattr(migrations, "migrate", replay)
+        db.clear_database()
+
+        conn = db.get_connection()
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert {"idx_health_type_date", "idx_blocks_type_start", "idx_sleep_sessions_date"} <= indexes
+        assert db.get_records_count() == 0
+
+    def test_rebuilds_run_once(self, baseline_db, monkeypatch):
+        """Test whole-table rebuilds run once however small the backfill batches are."""
+        baseline_db.init_database()
+        calls = []
+        original = migrations.REBUILDS["heatmaps"]
+
+        def counted(conn):
+            calls.append(conn)
+            original(conn)
+
+        monkeypatch.setitem(migrations.REBUILDS, "heatmaps", counted)
+        migrations.run_backfills(batch_size=2)
+
+        assert len(calls) == 1
+        assert migrations.pending_backfills() == []
+
+    def test_sleep_session_column_renamed(self, db):
+        """Test upgrading from version 12 keeps the session span under its new name."""
+        conn = db.get_connection()
+        conn.execute("ALTER TABLE sleep_sessions RENAME COLUMN session_minutes TO in_bed_minutes")
+        conn.execute("""
+            INSERT INTO sleep_sessions (date, bedtime, wake_time, asleep_minutes, in_bed_minutes)
+            VALUES ('2024-01-15', '2024-01-14T23:00:00+00:00', '2024-01-15T07:00:00+00:00', 420, 480)
+        """)
+        conn.execute("PRAGMA user_version = 12")
+        conn.commit()
+        conn.close()
+
+        db.init_database()
+
+        conn = db.get_connection()
+        assert conn.execute("SELECT session_minutes FROM sleep_sessions").fetchone()[0] == 480
+        assert migrations.get_schema_version(conn) == migrations.SCHEMA_VERSION
+        conn.close()
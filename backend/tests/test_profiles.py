@@ -0,0 +1,125 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from app import database, profiles
+
+
+def _seed_steps(steps: int):
+    database.insert_health_records([
+        ("HKQuantityTypeIdentifierStepCount", steps, "count",
+         "2024-01-02T12:00:00+00:00", "2024-01-02T12:30:00+00:00", "iPhone", None)
+    ])
+    database.compute_daily_summaries()
+
+
+@pytest.fixture
+def alice(client):
+    """A second profile holding its own step data."""
+    profiles.ensure_ready("alice")
+    with profiles.use_profile("alice"):
+        _seed_steps(9000)
+    yield "alice"
+
+    database.close_pools()
+    profiles.forget()
+    shutil.rmtree(profiles.profiles_dir(), ignore_errors=True)
+
+
+class TestProfileRouting:
+    """Tests for selecting a profile per request."""
+
+    URL = "/api/health/metrics/steps?start=2024-01-01&end=2024-01-31"
+
+    def test_header_selects_profile(self, client, alice):
+        """Test the profile header reads another database and the default stays separate."""
+        _seed_steps(1500)
+
+        default = client.get(self.URL)
+        other = client.get(self.URL, headers={"X-Health-Profile": alice})
+
+        assert [point["value"] for point in default.json()["data"]] == [1500]
+        assert [point["value"] for point in other.json()["data"]] == [9000]
+        assert profiles.profile_path(alice).exists()
+
+    def test_path_prefix_selects_profile(self, client, alice):
+        """Test a /p/{profile} prefix routes like the header."""
+        response = client.get(f"/p/{alice}{self.URL}")
+
+        assert response.status_code == 200
+        assert [point["value"] for point in response.json()["data"]] == [9000]
+
+    def test_invalid_profile_rejected(self, client):
+        """Test profile names that are not safe file names are rejected."""
+        response = client.get("/api/health/summary", headers={"X-Health-Profile": "../health"})
+
+        assert response.status_code == 400
+
+    def test_new_profile_is_migrated_on_first_use(self, client):
+        """Test an unknown profile gets a fresh, empty database."""
+        try:
+            response = client.get("/api/status", headers={"X-Health-Profile": "bob"})
+
+            assert response.status_code == 200
+            assert response.json()["status"] == "idle"
+            assert client.get("/api/profiles").json()["profiles"] == ["bob", "default"]
+        finally:
+            database.close_pools()
+            profiles.forget()
+            shutil.rmtree(profiles.profiles_dir(), ignore_errors=True)
+
+
+class TestConnectionPool:
+    """Tests for pooled connections."""
+
+    def test_closed_connections_are_reused(self, db):
+        """Test close() returns a connection to the pool in a clean state."""
+        conn = db.get_connection()
+        conn.row_factory = None
+        cursor = conn.execute("SELECT 1 UNION ALL SELECT 2")
+        cursor.fetchone()
+        conn.execute("UPDATE import_status SET progress = 50 WHERE id = 1")
+        conn.close()
+
+        again = db.get_connection()
+
+        assert again is conn
+        assert again.row_factory is not None
+        assert again.execute("SELECT progress FROM import_status").fetchone()[0] == 0
+        with pytest.raises(sqlite3.ProgrammingError):
+            cursor.fetchone()
+        again.close()
+
+    def test_idle_pools_are_evicted(self, db, monkeypatch):
+        """Test pools unused past the idle timeout are closed."""
+        db.get_connection().close()
+        assert db.pool_stats()[0]["idle"] == 1
+
+        monkeypatch.setattr(db, "POOL_IDLE_SECONDS", -1)
+        db.evict_idle_pools()
+
+        assert db.pool_stats() == []
+
+    def test_checked_out_pools_are_kept(self, db, monkeypatch):
+        """Test a pool with a connection in use is not evicted."""
+        conn = db.get_connection()
+        monkeypatch.setattr(db, "POOL_IDLE_SECONDS", -1)
+        db.evict_idle_pools()
+
+        assert db.pool_stats()[0]["checked_out"] == 1
+        conn.close()
+
+    def test_with_block_releases_on_error(self, db, monkeypatch):
+        """Test a connection used in a with block is handed back when the block raises."""
+        with pytest.raises(sqlite3.OperationalError):
+            with db.get_connection() as conn:
+                conn.execute("UPDATE import_status SET progress = 50 WHERE id = 1")
+                conn.execute("SELECT * FROM missing_table")
+
+        assert db.pool_stats()[0]["checked_out"] == 0
+        with db.get_connection() as again:
+            assert again.execute("SELECT progress FROM import_status").fetchone()[0] == 0
+        monkeypatch.setattr(db, "POOL_IDLE_SECONDS", -1)
+        db.evict_idle_pools()
+        assert db.pool_stats() == []
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app import querylog
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    monkeypatch.setattr(querylog, "threshold", 0.0)
+    querylog.clear()
+    yield
+    querylog.clear()
+
+
+def _scan(db):
+    conn = db.get_connection()
+    conn.execute("SELECT * FROM health_records WHERE value > ?", (100,)).fetchall()
+    conn.close()
+
+
+class TestSlowQueryLog:
+    """Tests for slow statement capture."""
+
+    def test_captures_plan(self, db, log_everything):
+        """Test slow statements are logged with parameters and query plan."""
+        _scan(db)
+
+        entry = next(q for q in querylog.slow_queries() if "health_records" in q["sql"])
+
+        assert entry["parameters"] == [100]
+        assert entry["duration_ms"] >= 0
+        assert any(detail.startswith("SCAN health_records") for detail in entry["plan"])
+
+    def test_fast_statements_skipped(self, db, monkeypatch):
+        """Test statements under the threshold are not logged."""
+        monkeypatch.setattr(querylog, "threshold", 60.0)
+        querylog.clear()
+
+        _scan(db)
+
+        assert querylog.slow_queries() == []
+
+    def test_ring_buffer_bounded(self, db, log_everything):
+        """Test the log keeps only the newest entries."""
+        for _ in range(querylog.LOG_SIZE + 10):
+            _scan(db)
+
+        assert len(querylog.slow_queries()) == querylog.LOG_SIZE
+
+
+class TestPlanGuard:
+    """Tests for the strict query plan guard."""
+
+    def _request(self, db, path, query):
+        async def endpoint(scope, receive, send):
+            conn = db.get_connection()
+            conn.execute(query).fetchall()
+            conn.close()
+
+        middleware = querylog.PlanGuardMiddleware(endpoint)
+        scope = {"type": "http", "method": "GET", "path": path}
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(middleware(scope, None, None))
+        finally:
+            loop.close()
+
+    def test_full_scan_in_request(self, db, monkeypatch):
+        """Test a request that scans health_records is recorded."""
+        monkeypatch.setattr(querylog, "strict", True)
+        querylog.clear()
+
+        self._request(db, "/api/health/anything", "SELECT * FROM health_records WHERE value > 1")
+        self._request(db, "/api/health/anything", "SELECT * FROM health_records WHERE type = 'x'")
+        self._request(db, "/api/admin/storage", "SELECT * FROM health_records WHERE value > 1")
+        self._request(db, "/api/health/anything", "SELECT COUNT(*) FROM health_records /* full-scan-ok */")
+
+        violations = querylog.plan_violations()
+        querylog.clear()
+        assert [v["request"] for v in violations] == ["GET /api/health/anything"]
+
+
+class TestSlowQueryAPI:
+    """Tests for the slow-query admin endpoints."""
+
+    def test_threshold_and_clear(self, client):
+        """Test the threshold can be changed and the log emptied."""
+        original = querylog.threshold
+        try:
+            response = client.put("/api/admin/slow-queries?threshold_ms=0")
+            assert response.status_code == 200
+            client.get("/api/health/date-range")
+
+            data = client.get("/api/admin/slow-queries").json()
+            assert data["threshold_ms"] == 0
+            assert any("daily_summary" in q["sql"] for q in data["queries"])
+
+            client.delete("/api/admin/slow-queries")
+            assert client.get("/api/admin/slow-queries").json()["queries"] == []
+        finally:
+            querylog.threshold = original
@@ -0,0 +1,110 @@
+from datetime import date
+
+from app import sleep
+
+
+CORE = "HKCategoryValueSleepAnalysisAsleepCore"
+DEEP = "HKCategoryValueSleepAnalysisAsleepDeep"
+REM = "HKCategoryValueSleepAnalysisAsleepREM"
+AWAKE = "HKCategoryValueSleepAnalysisAwake"
+ASLEEP = "HKCategoryValueSleepAnalysisAsleep"
+IN_BED = "HKCategoryValueSleepAnalysisInBed"
+
+
+def _session(row: tuple) -> dict:
+    return dict(zip(sleep.SESSION_COLUMNS, row))
+
+
+class TestBuildSessions:
+    """Tests for merging sleep segments into sessions."""
+
+    def test_night_is_dated_by_wake_day(self):
+        """Test a night across midnight is one session on the UTC date it ends."""
+        sessions = sleep.build_sessions([
+            (CORE, "2024-01-14T23:00:00-05:00", "2024-01-15T02:00:00-05:00", "Apple Watch"),
+            (DEEP, "2024-01-15T02:00:00-05:00", "2024-01-15T04:00:00-05:00", "Apple Watch"),
+            (AWAKE, "2024-01-15T04:00:00-05:00", "2024-01-15T04:30:00-05:00", "Apple Watch"),
+            (REM, "2024-01-15T04:30:00-05:00", "2024-01-15T06:30:00-05:00", "Apple Watch"),
+        ])
+
+        assert len(sessions) == 1
+        session = _session(sessions[0])
+        assert session["date"] == "2024-01-15"
+        assert session["bedtime"] == "2024-01-14T23:00:00-05:00"
+        assert session["wake_time"] == "2024-01-15T06:30:00-05:00"
+        assert (session["core_minutes"], session["deep_minutes"], session["rem_minutes"]) == (180, 120, 120)
+        assert session["asleep_minutes"] == 420
+        assert session["awake_minutes"] == 30
+        assert session["efficiency"] == round(420 / 450, 3)
+
+    def test_overlapping_sources_count_once(self):
+        """Test a phone's asleep span under the Watch's stages is not added again."""
+        sessions = sleep.build_sessions([
+            (IN_BED, "2024-01-14T22:30:00+00:00", "2024-01-15T07:00:00+00:00", "iPhone"),
+            (ASLEEP, "2024-01-14T23:00:00+00:00", "2024-01-15T06:00:00+00:00", "iPhone"),
+            (CORE, "2024-01-14T23:00:00+00:00", "2024-01-15T03:00:00+00:00", "Apple Watch"),
+            (AWAKE, "2024-01-15T03:00:00+00:00", "2024-01-15T03:30:00+00:00", "Apple Watch"),
+            (DEEP, "2024-01-15T03:30:00+00:00", "2024-01-15T05:00:00+00:00", "Apple Watch"),
+        ])
+
+        session = _session(sessions[0])
+        assert session["asleep_minutes"] == 240 + 90 + 60
+        assert session["unstaged_minutes"] == 60
+        assert session["awake_minutes"] == 30
+        assert session["session_minutes"] == 510
+        assert session["sources"] == "Apple Watch, iPhone"
+        assert session["segments"] == 5
+
+    def test_wake_date_follows_utc_like_daily_summary(self):
+        """Test sessions use the UTC date, as DATE() does for the other summary columns."""
+        sessions = sleep.build_sessions([
+            (CORE, "2024-01-14T23:00:00+09:00", "2024-01-15T07:00:00+09:00", "Apple Watch"),
+        ])
+
+        assert _session(sessions[0])["date"] == "2024-01-14"
+
+    def test_bedtime_prefers_staged_sleep(self):
+        """Test bedtime comes from the Watch's stages rather than an earlier phone span."""
+        sessions = sleep.build_sessions([
+            (IN_BED, "2024-01-14T22:00:00+00:00", "2024-01-15T07:00:00+00:00", "iPhone"),
+            (ASLEEP, "2024-01-14T22:30:00+00:00", "2024-01-15T06:30:00+00:00", "iPhone"),
+            (CORE, "2024-01-14T23:10:00+00:00", "2024-01-15T06:00:00+00:00", "Apple Watch"),
+        ])
+        phone_only = sleep.build_sessions([
+            (IN_BED, "2024-01-14T22:00:00+00:00", "2024-01-15T07:00:00+00:00", "iPhone"),
+            (ASLEEP, "2024-01-14T22:30:00+00:00", "2024-01-15T06:30:00+00:00", "iPhone"),
+        ])
+
+        assert _session(sessions[0])["bedtime"] == "2024-01-14T23:10:00+00:00"
+        assert _session(sessions[0])["session_minutes"] == 540
+        assert _session(phone_only[0])["bedtime"] == "2024-01-14T22:30:00+00:00"
+
+    def test_gaps_split_sessions(self):
+        """Test a nap apart from the night is its own session and in-bed-only spans are dropped."""
+        sessions = sleep.build_sessions([
+            (CORE, "2024-01-15T14:00:00+00:00", "2024-01-15T14:40:00+00:00", "Apple Watch"),
+            (CORE, "2024-01-15T01:00:00+00:00", "2024-01-15T07:00:00+00:00", "Apple Watch"),
+            (IN_BED, "2024-01-15T22:00:00+00:00", "2024-01-15T23:00:00+00:00", "iPhone"),
+            ("HKCategoryValueSleepAnalysisUnknown", "2024-01-15T10:00:00+00:00", "2024-01-15T11:00:00+00:00", "x"),
+        ])
+
+        assert [(_session(s)["bedtime"][11:16], _session(s)["asleep_minutes"]) for s in sessions] == [
+            ("01:00", 360), ("14:00", 40)
+        ]
+
+
+class TestSleepSummaries:
+    """Tests for sleep_hours driven by sessions."""
+
+    def test_sleep_hours_by_wake_date(self, db):
+        """Test a night is counted once, on the day it ends."""
+        db.insert_sleep_records([
+            (CORE, "2024-01-14T23:00:00+00:00", "2024-01-15T03:00:00+00:00", "Apple Watch"),
+            (ASLEEP, "2024-01-14T23:30:00+00:00", "2024-01-15T06:00:00+00:00", "iPhone"),
+            (DEEP, "2024-01-15T03:00:00+00:00", "2024-01-15T05:00:00+00:00", "Apple Watch"),
+        ])
+
+        db.compute_daily_summaries()
+
+        assert db.get_daily_summary(date(2024, 1, 14)) is None
+        assert db.get_daily_summary(date(2024, 1, 15))["sleep_hours"] == 7
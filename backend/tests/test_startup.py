@@ -0,0 +1,27 @@
+import sys
+
+from app import startup
+
+
+class TestStartupTiming:
+    """Tests for startup instrumentation."""
+
+    def test_import_timer_records_modules(self, monkeypatch):
+        """Test modules imported while the timer is installed are recorded."""
+        monkeypatch.delitem(sys.modules, "json.tool", raising=False)
+        startup.install()
+        try:
+            import json.tool  # noqa: F401
+        finally:
+            startup.uninstall()
+
+        timings = {entry["module"]: entry for entry in startup.report(None)["modules"]}
+        assert "json.tool" in timings
+        assert timings["json.tool"]["cumulative_ms"] >= timings["json.tool"]["self_ms"] >= 0
+
+    def test_phase(self):
+        """Test phases are timed and reported."""
+        with startup.phase("test_phase"):
+            pass
+
+        assert "test_phase" in startup.report()["phases_ms"]
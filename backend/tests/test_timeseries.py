@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime, timezone
+
+from app import timeseries
+from app.timeseries import encode_block, decode_block, compact_records, read_samples
+
+
+def _heart_rate(i, offset="-05:00"):
+    stamp = f"2024-01-14T{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}{offset}"
+    return ("HKQuantityTypeIdentifierHeartRate", 60 + (i % 7) * 0.5, "count/min", stamp, stamp, "Apple Watch", None)
+
+
+class TestBlockEncoding:
+    """Tests for block encode/decode."""
+
+    def test_roundtrip(self):
+        """Test encoding is lossless for irregular samples."""
+        timestamps = [1705237200, 1705237205, 1705237210, 1705237300, 1705237299]
+        durations = [0, 0, 60, 0, 3600]
+        offsets = [-300, -300, -300, -240, -240]
+        values = [72.0, 72.0, 0.1234567, None, -3.5]
+
+        decoded = decode_block(encode_block(timestamps, durations, offsets, values))
+
+        assert decoded == (timestamps, durations, offsets, values)
+
+    def test_regular_series_compresses(self):
+        """Test a regular heart rate series packs into a few bytes per sample."""
+        count = 5000
+        timestamps = [1705237200 + i * 5 for i in range(count)]
+        values = [float(60 + i % 5) for i in range(count)]
+
+        blob = encode_block(timestamps, [0] * count, [-300] * count, values)
+
+        assert len(blob) < count
+
+
+class TestBlockStorage:
+    """Tests for compaction and range reads."""
+
+    def test_compact_moves_rows_into_blocks(self, db):
+        """Test compaction empties health_records for block types and keeps counts."""
+        db.insert_health_records([_heart_rate(i * 30) for i in range(100)])
+        db.insert_health_records([
+            ("HKQuantityTypeIdentifierStepCount", 5000, "count", "2024-01-14T08:00:00-05:00", "2024-01-14T09:00:00-05:00", "iPhone", None),
+        ])
+
+        compact_records()
+
+        conn = db.get_connection()
+        remaining = conn.execute("SELECT type FROM health_records").fetchall()
+        conn.close()
+        assert [row[0] for row in remaining] == ["HKQuantityTypeIdentifierStepCount"]
+        assert db.get_records_count() == 101
+
+    def test_read_samples_roundtrip(self, db):
+        """Test block-stored samples read back exactly as inserted."""
+        records = [_heart_rate(i * 30) for i in range(100)]
+        db.insert_health_records(records)
+        compact_records()
+
+        assert list(read_samples("HKQuantityTypeIdentifierHeartRate")) == records
+
+    def test_read_samples_only_decodes_overlapping_blocks(self, db, monkeypatch):
+        """Test a range read decodes only the chunks it covers."""
+        records = [
+            ("HKQuantityTypeIdentifierHeartRate", 70.0, "count/min", f"2024-01-{day:02d}T12:00:00+00:00",
+             f"2024-01-{day:02d}T12:00:00+00:00", "Apple Watch", None)
+            for day in range(1, 11)
+        ]
+        db.insert_health_records(records)
+        compact_records()
+
+        decoded = []
+        original = timeseries.decode_block
+        monkeypatch.setattr(timeseries, "decode_block", lambda blob: decoded.append(blob) or original(blob))
+
+        result = list(read_samples(
+            "HKQuantityTypeIdentifierHeartRate",
+            datetime(2024, 1, 4, tzinfo=timezone.utc),
+            datetime(2024, 1, 5, 23, 59, tzinfo=timezone.utc),
+        ))
+
+        assert [r[3] for r in result] == ["2024-01-04T12:00:00+00:00", "2024-01-05T12:00:00+00:00"]
+        assert len(decoded) == 2
+
+    def test_parser_keeps_summaries_after_compaction(self, sample_xml_file, db):
+        """Test summaries built from block types survive the import pipeline."""
+        from app.parser import parse_apple_health_export
+        from datetime import date
+
+        parse_apple_health_export(str(sample_xml_file))
+
+        summary = db.get_daily_summary(date(2024, 1, 14))
+        assert summary["active_calories"] == 450
+        assert summary["distance_km"] == 4.5
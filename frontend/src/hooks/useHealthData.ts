@@ -22,13 +22,32 @@ export function useImportStatus() {
     refresh();
   }, [refresh]);
 
-  // Poll while importing
+  // Follow progress pushed by the server while importing, falling back to
+  // polling if the event stream cannot be opened
+  const importing = status?.status === 'parsing' || status?.status === 'computing';
   useEffect(() => {
-    if (status?.status === 'parsing' || status?.status === 'computing') {
-      const interval = setInterval(refresh, 1000);
-      return () => clearInterval(interval);
-    }
-  }, [status?.status, refresh]);
+    if (!importing) return;
+
+    let interval: ReturnType<typeof setInterval> | undefined;
+    const source = api.streamStatus(
+      event => {
+        setStatus(prev => (prev ? { ...prev, ...event } : prev));
+        if (event.status === 'complete' || event.status === 'error') {
+          source.close();
+          refresh();
+        }
+      },
+      () => {
+        source.close();
+        interval = setInterval(refresh, 1000);
+      }
+    );
+
+    return () => {
+      source.close();
+      if (interval) clearInterval(interval);
+    };
+  }, [importing, refresh]);
 
   return { status, loading, error, refresh };
 }
@@ -17,6 +17,98 @@ export interface MetricData {
   value: number;
 }
 
+export interface MetricSeries {
+  metric: string;
+  dates: string[];
+  values: number[];
+  count: number;
+  resolution: string;
+}
+
+export interface RollingSeries {
+  metric: string;
+  method: 'sma' | 'ewma' | 'median';
+  window: number;
+  dates: string[];
+  values: (number | null)[];
+  raw: (number | null)[];
+}
+
+export interface Anomaly {
+  metric: string;
+  date: string;
+  value: number;
+  baseline: number;
+  spread: number;
+  score: number;
+  direction: 'high' | 'low';
+}
+
+export interface HeartRateSpike {
+  time: string;
+  date: string;
+  bpm: number;
+  max_bpm: number;
+  baseline: number;
+  spread: number;
+  score: number;
+  duration_minutes: number;
+}
+
+export interface Anomalies {
+  since: string;
+  anomalies: Anomaly[];
+  heart_rate_spikes: HeartRateSpike[];
+}
+
+export interface Goal {
+  id: number;
+  metric: string;
+  target: number;
+  comparison: 'at_least' | 'at_most';
+  name: string | null;
+  created_at: string;
+  tracked_days: number;
+  met_days: number;
+  current_streak: number;
+  longest_streak: number;
+  longest_start: string | null;
+  last_met: string | null;
+  through: string | null;
+  completion_rate: number | null;
+}
+
+export interface GoalStreak {
+  start_date: string;
+  end_date: string;
+  days: number;
+}
+
+export interface HeatmapYear {
+  year: number;
+  start: string;
+  thresholds: number[];
+  days: number;
+  buckets: number[];
+}
+
+export interface SleepSession {
+  id: number;
+  date: string;
+  bedtime: string;
+  wake_time: string;
+  asleep_minutes: number;
+  core_minutes: number;
+  deep_minutes: number;
+  rem_minutes: number;
+  unstaged_minutes: number;
+  awake_minutes: number;
+  session_minutes: number;
+  efficiency: number;
+  sources: string;
+  segments: number;
+}
+
 export interface TrendInsight {
   metric: string;
   current_avg: number;
@@ -31,6 +123,8 @@ export interface CorrelationInsight {
   correlation: number;
   description: string;
   strength: string;
+  p_value?: number;
+  samples?: number;
 }
 
 export interface PersonalRecord {
@@ -80,6 +174,22 @@ export interface WeeklySummary {
   days_with_data: number;
 }
 
+export interface DashboardWidget {
+  id: string;
+  type:
+    | 'summary'
+    | 'range'
+    | 'metric'
+    | 'workouts'
+    | 'date_range'
+    | 'units'
+    | 'trends'
+    | 'correlations'
+    | 'records'
+    | 'weekly_summary';
+  params?: Record<string, string | number>;
+}
+
 async function fetchJson<T>(url: string, options?: RequestInit): Promise<T> {
   const response = await fetch(url, options);
   if (!response.ok) {
@@ -93,6 +203,16 @@ export const api = {
   // Status
   getStatus: () => fetchJson<ImportStatus>(`${API_BASE}/status`),
 
+  streamStatus: (
+    onEvent: (event: Partial<ImportStatus>) => void,
+    onError: () => void
+  ) => {
+    const source = new EventSource(`${API_BASE}/status/stream`);
+    source.onmessage = message => onEvent(JSON.parse(message.data));
+    source.onerror = onError;
+    return source;
+  },
+
   getOverview: () => fetchJson<{
     import_status: string;
     last_import: string | null;
@@ -134,6 +254,16 @@ export const api = {
       `${API_BASE}/health/metrics/${metric}?days=${days}`
     ),
 
+  getMetricSeries: (metric: string, days = 30, resolution = 'day') =>
+    fetchJson<MetricSeries>(
+      `${API_BASE}/health/metrics/${metric}?days=${days}&resolution=${resolution}&format=columnar`
+    ),
+
+  getSleepSessions: (days = 30) =>
+    fetchJson<{ sessions: SleepSession[]; count: number }>(
+      `${API_BASE}/health/sleep/sessions?days=${days}`
+    ),
+
   getWorkouts: (days = 30) =>
     fetchJson<{ workouts: Workout[]; count: number }>(
       `${API_BASE}/health/workouts?days=${days}`
@@ -158,6 +288,36 @@ export const api = {
       `${API_BASE}/insights/trends?days=${days}`
     ),
 
+  getRollingSeries: (metric: string, method: RollingSeries['method'] = 'sma', window = 7) =>
+    fetchJson<RollingSeries>(
+      `${API_BASE}/insights/rolling/${metric}?method=${method}&window=${window}`
+    ),
+
+  getAnomalies: (since?: string) =>
+    fetchJson<Anomalies>(
+      `${API_BASE}/insights/anomalies${since ? `?since=${since}` : ''}`
+    ),
+
+  getGoals: () => fetchJson<{ goals: Goal[] }>(`${API_BASE}/goals`),
+
+  createGoal: (goal: Pick<Goal, 'metric' | 'target'> & Partial<Pick<Goal, 'comparison' | 'name'>>) =>
+    fetchJson<Goal>(`${API_BASE}/goals`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(goal),
+    }),
+
+  deleteGoal: (id: number) =>
+    fetchJson<{ message: string }>(`${API_BASE}/goals/${id}`, { method: 'DELETE' }),
+
+  getGoalStreaks: (id: number, order: 'longest' | 'recent' = 'longest') =>
+    fetchJson<{ goal_id: number; streaks: GoalStreak[] }>(`${API_BASE}/goals/${id}/streaks?order=${order}`),
+
+  getHeatmap: (metric: string, year?: number) =>
+    fetchJson<{ metric: string; years: HeatmapYear[] }>(
+      `${API_BASE}/insights/heatmap/${metric}${year ? `?year=${year}` : ''}`
+    ),
+
   getCorrelations: (days = 90) =>
     fetchJson<{ correlations: CorrelationInsight[] }>(
       `${API_BASE}/insights/correlations?days=${days}`
@@ -168,4 +328,15 @@ export const api = {
 
   getWeeklySummary: () =>
     fetchJson<WeeklySummary>(`${API_BASE}/insights/weekly-summary`),
+
+  // Batched widgets - each result has the shape of its standalone endpoint
+  getDashboard: (widgets: DashboardWidget[]) =>
+    fetchJson<{
+      widgets: Record<string, unknown>;
+      window: { start: string; end: string } | null;
+    }>(`${API_BASE}/dashboard`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ widgets }),
+    }),
 };